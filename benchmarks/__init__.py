@@ -0,0 +1,5 @@
+"""
+Benchmarks package for Autism Social Communication Support Application
+
+Run with: python3 -m benchmarks.run
+"""
@@ -0,0 +1,111 @@
+"""
+Benchmark Fixtures
+Synthetic frames, videos and transcripts, generated deterministically
+"""
+import os
+
+import cv2
+import numpy as np
+
+# (width, height) of the frames every frame benchmark runs at
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720)]
+
+# Transcript lengths (entries) the transcript benchmarks run at
+TRANSCRIPT_LENGTHS = [10, 100, 1000, 10000]
+
+_PHRASES = [
+    "Hi, how are you doing today?",
+    "I went to the park with my dog Biscuit this morning.",
+    "We played soccer after school and my team won.",
+    "Did you finish the science homework about volcanoes?",
+    "My favourite movie is the one with the robots.",
+    "I'm a bit tired, I didn't sleep very well.",
+    "That's so cool, I want to try it too!",
+    "What are you doing this weekend?"
+]
+
+
+def face_frame(width, height, seed=0):
+    """
+    Draw a frame with a simple frontal cartoon face
+
+    The face covers about half of the frame height, on a textured
+    background, so detectors have something face-like to find.
+
+    Args:
+        width: Frame width
+        height: Frame height
+        seed: Seed of the background texture
+
+    Returns:
+        numpy.ndarray: BGR frame
+    """
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (0, 0), 3)
+
+    center = (width // 2, height // 2)
+    face_h = height // 4
+    face_w = int(face_h * 0.78)
+    skin = (140, 170, 210)
+    cv2.ellipse(frame, center, (face_w, face_h), 0, 0, 360, skin, -1)
+
+    eye_y = center[1] - face_h // 4
+    eye_dx = face_w // 2
+    eye_r = max(2, face_h // 10)
+    for dx in (-eye_dx, eye_dx):
+        cv2.ellipse(frame, (center[0] + dx, eye_y - eye_r * 2), (eye_r * 2, eye_r // 2 + 1),
+                    0, 0, 360, (40, 50, 60), -1)
+        cv2.circle(frame, (center[0] + dx, eye_y), eye_r, (255, 255, 255), -1)
+        cv2.circle(frame, (center[0] + dx, eye_y), eye_r // 2 + 1, (30, 30, 30), -1)
+
+    cv2.line(frame, (center[0], eye_y), (center[0] - face_w // 8, center[1] + face_h // 5),
+             (100, 120, 160), max(1, face_h // 40))
+    cv2.ellipse(frame, (center[0], center[1] + face_h // 2), (face_w // 3, face_h // 8),
+                0, 0, 180, (60, 60, 150), max(2, face_h // 25))
+    return frame
+
+
+def noise_frame(width, height, seed=0):
+    """Uniform noise frame (BGR) with no face in it"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+
+def write_video(path, width, height, frames=60, fps=30):
+    """
+    Write a short synthetic video of a slightly moving face
+
+    Returns:
+        str: The video path
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    base = face_frame(width, height)
+    for i in range(frames):
+        writer.write(np.roll(base, i % 8, axis=1))
+    writer.release()
+    return path
+
+
+def transcript_entries(count, seed=0):
+    """
+    Build a fake transcript
+
+    Args:
+        count: Number of entries
+        seed: Seed for the phrase order
+
+    Returns:
+        list: Transcript entry dictionaries
+    """
+    rng = np.random.default_rng(seed)
+    entries = []
+    for i in range(count):
+        seconds = 10 * 3600 + 4 * i
+        entries.append({
+            "timestamp": f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}",
+            "speaker": "User" if i % 2 else "Partner",
+            "text": _PHRASES[int(rng.integers(len(_PHRASES)))]
+        })
+    return entries
@@ -0,0 +1,222 @@
+"""
+Local OpenAI-Compatible Stub
+Answers /v1/chat/completions so suggestions can be measured without the live API
+
+Latency, server errors and rate limiting (HTTP 429) are configurable, so
+benchmarks and load tests can reproduce slow or throttled API behaviour.
+Token counts are estimated at four characters per token.
+
+Prompt caching is simulated like OpenAI's: the longest run of leading
+messages seen in an earlier request counts as cached_tokens, once it
+reaches a minimum length (1024 tokens on OpenAI).
+"""
+import hashlib
+import json
+import random
+from collections import OrderedDict
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Replies cycled through by the stub
+REPLIES = [
+    "That sounds fun! What did you like most about it?",
+    "I'm sorry to hear that. Do you want to talk about it?",
+    "Wow, really? Tell me more!",
+    "Hi! How has your day been?",
+    "That's interesting. I like that too."
+]
+
+# Message prefixes remembered by the prompt cache simulation
+_PREFIX_CACHE_SIZE = 100000
+
+
+def estimate_tokens(text):
+    """Rough token count of a text (four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class LLMStub:
+    """A local chat completions server running on a background thread"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0,
+                 max_rps=0.0, retry_after=1.0, cache_min_tokens=1024, seed=None):
+        """
+        Initialize the stub
+
+        Args:
+            latency_ms: Base response time of every request
+            jitter_ms: Extra response time, drawn uniformly from [0, jitter_ms]
+            error_rate: Fraction of requests answered with HTTP 500
+            throttle_rate: Fraction of requests answered with HTTP 429
+            max_rps: Requests per second above which requests are throttled
+                     with HTTP 429 (0 = unlimited)
+            retry_after: Seconds sent in the Retry-After header of 429 responses
+            cache_min_tokens: Shortest prompt prefix reported as cached
+            seed: Random seed for reproducible error and latency patterns
+        """
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.cache_min_tokens = cache_min_tokens
+        self.random = random.Random(seed)
+        self.prefix_cache = OrderedDict()
+
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.stats = {"requests": 0, "completions": 0, "errors": 0, "throttled": 0,
+                      "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+        self.server = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        """Base URL to pass to the OpenAI client"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self, host="127.0.0.1", port=0):
+        """
+        Start serving on a background thread
+
+        Args:
+            host: Address to listen on
+            port: Port to listen on (0 picks a free port)
+
+        Returns:
+            LLMStub: self, so the stub can be started inline
+        """
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; Nagle would delay the body ~40 ms
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                status, headers, payload = stub.handle(self.path, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="llm-stub",
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def _over_rate_limit(self):
+        if not self.max_rps:
+            return False
+        now = time.monotonic()
+        if now - self.window_start >= 1.0:
+            self.window_start = now
+            self.window_requests = 0
+        self.window_requests += 1
+        return self.window_requests > self.max_rps
+
+    def _cached_tokens(self, messages):
+        """Tokens of the longest leading messages sent before; remembers this prompt's prefixes"""
+        digest = hashlib.sha256()
+        tokens = 0
+        cached = 0
+        with self.lock:
+            for message in messages:
+                digest.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+                tokens += estimate_tokens(str(message.get("content", "")))
+                key = digest.copy().hexdigest()
+                if key in self.prefix_cache:
+                    self.prefix_cache.move_to_end(key)
+                    if cached == tokens - estimate_tokens(str(message.get("content", ""))):
+                        cached = tokens
+                else:
+                    self.prefix_cache[key] = True
+            while len(self.prefix_cache) > _PREFIX_CACHE_SIZE:
+                self.prefix_cache.popitem(last=False)
+        return cached if cached >= self.cache_min_tokens else 0
+
+    def handle(self, path, body):
+        """
+        Answer one request
+
+        Returns:
+            tuple: (HTTP status, extra headers, JSON payload)
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            throttled = self._over_rate_limit() or self.random.random() < self.throttle_rate
+            failed = not throttled and self.random.random() < self.error_rate
+            delay = self.latency + self.random.uniform(0, self.jitter)
+
+        if not path.rstrip("/").endswith("/chat/completions"):
+            return 404, {}, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}}
+
+        if throttled:
+            with self.lock:
+                self.stats["throttled"] += 1
+            return 429, {"Retry-After": str(self.retry_after)}, {
+                "error": {"message": "Rate limit reached", "type": "rate_limit_error",
+                          "code": "rate_limit_exceeded"}}
+
+        time.sleep(delay)
+
+        if failed:
+            with self.lock:
+                self.stats["errors"] += 1
+            return 500, {}, {"error": {"message": "Stub server error", "type": "server_error"}}
+
+        messages = body.get("messages", [])
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+        cached_tokens = self._cached_tokens(messages)
+        choices = []
+        for index in range(body.get("n") or 1):
+            with self.lock:
+                reply = REPLIES[self.random.randrange(len(REPLIES))]
+            choices.append({"index": index, "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": reply}})
+        completion_tokens = sum(estimate_tokens(choice["message"]["content"]) for choice in choices)
+
+        with self.lock:
+            self.stats["completions"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["cached_tokens"] += cached_tokens
+            self.stats["completion_tokens"] += completion_tokens
+
+        return 200, {}, {
+            "id": f"chatcmpl-stub-{self.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": choices,
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens,
+                      "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+        }
+
+    def get_stats(self):
+        """Get request, error, throttling and token counters"""
+        with self.lock:
+            return dict(self.stats)
+
+    def stop(self):
+        """Stop serving"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,285 @@
+"""
+Suggestion Load Test
+Drives many simulated sessions through ResponseGenerator at once
+
+Each session is a thread with its own ResponseGenerator and a transcript
+that grows as the simulated conversation goes on. Sessions click "Suggest
+Response" at random (exponential) intervals, sometimes in quick bursts like
+an impatient user. Requests go to a local OpenAI-compatible stub with
+configurable latency, errors and throttling, or to --base-url.
+
+Usage:
+    python3 -m benchmarks.loadtest --sessions 50 --duration 60
+    python3 -m benchmarks.loadtest --sessions 100 --max-rps 20 --latency-ms 800
+    python3 -m benchmarks.loadtest --sessions 20 --store   # Recent + relevant turns only
+
+Reported: throughput, latency percentiles, retries and throttling, token
+volume with the share served from the (simulated) prompt cache and the
+share of prompt text repeating the previous request's prefix, and per time
+bucket the request count, tail latency and prompt size, so the cost of
+context growth shows up as the run goes on.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+
+from benchmarks import fixtures
+from benchmarks.llm_stub import LLMStub
+from modules.chatbot import ResponseGenerator, create_client
+from modules.transcription import TranscriptionService
+from modules.transcript_store import TranscriptStore
+
+EMOTIONS_SEEN = ["happiness", "neutral", "surprise", "sadness"]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list (0.0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class SimulatedSession:
+    """One user: a growing transcript and suggestion clicks"""
+
+    def __init__(self, index, client, args, store=None):
+        self.index = index
+        self.args = args
+        self.random = random.Random(args.seed * 1000 + index)
+        self.phrases = fixtures.transcript_entries(1000, seed=index)
+        self.results = []
+
+        session_id = store.start_session() if store is not None else None
+        self.transcription = TranscriptionService(store=store, session_id=session_id)
+        self.generator = ResponseGenerator(client=client, transcript_store=store,
+                                           session_id=session_id)
+
+    def run(self, started, deadline):
+        """Simulate the session until the deadline"""
+        args = self.args
+        next_utterance = time.monotonic() + self.random.expovariate(1 / args.utterance_interval)
+        next_click = time.monotonic() + self.random.expovariate(1 / args.click_interval)
+        spoken = 0
+
+        while True:
+            now = time.monotonic()
+            wake = min(next_utterance, next_click)
+            if wake >= deadline:
+                break
+            if wake > now:
+                time.sleep(wake - now)
+
+            if next_utterance <= next_click:
+                self.transcription.add_entry(self.phrases[spoken % len(self.phrases)])
+                spoken += 1
+                next_utterance += self.random.expovariate(1 / args.utterance_interval)
+                continue
+
+            self._suggest(started)
+            if self.random.random() < args.burst_probability:
+                # Impatient user: clicks again right after the answer arrives
+                next_click = time.monotonic() + self.random.uniform(0.2, 1.0)
+            else:
+                next_click = time.monotonic() + self.random.expovariate(1 / args.click_interval)
+
+    def _suggest(self, started):
+        if self.generator.transcript_store is not None:
+            transcript = self.generator.get_context_transcript()
+        else:
+            transcript = self.transcription.get_transcript()
+
+        before = self.generator.get_stats()
+        clicked = time.monotonic()
+        self.generator.generate_response(transcript, self.random.choice(EMOTIONS_SEEN))
+        latency = time.monotonic() - clicked
+        after = self.generator.get_stats()
+
+        self.results.append({
+            "session": self.index,
+            "time_s": clicked - started,
+            "latency_s": latency,
+            "ok": after["failures"] == before["failures"],
+            "retries": after["retries"] - before["retries"],
+            "throttled": after["throttled"] - before["throttled"],
+            "prompt_tokens": after["prompt_tokens"] - before["prompt_tokens"],
+            "cached_tokens": after["cached_tokens"] - before["cached_tokens"],
+            "prompt_chars": after["prompt_chars"] - before["prompt_chars"],
+            "reused_prefix_chars": after["reused_prefix_chars"] - before["reused_prefix_chars"],
+            "completion_tokens": after["completion_tokens"] - before["completion_tokens"],
+            "transcript_entries": len(self.transcription.transcript)
+        })
+
+
+def summarize(results, sessions, elapsed, bucket_seconds):
+    """
+    Aggregate the per-click results
+
+    Returns:
+        dict: Totals, latency percentiles, per-session token volume and
+              per-bucket time series
+    """
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency_s"] for r in ok]
+
+    buckets = []
+    for start in range(0, int(elapsed) + 1, bucket_seconds):
+        rows = [r for r in results if start <= r["time_s"] < start + bucket_seconds]
+        if not rows:
+            continue
+        bucket_latencies = [r["latency_s"] for r in rows if r["ok"]]
+        buckets.append({
+            "start_s": start,
+            "requests": len(rows),
+            "failures": sum(not r["ok"] for r in rows),
+            "retries": sum(r["retries"] for r in rows),
+            "throttled": sum(r["throttled"] for r in rows),
+            "p50_ms": 1000 * percentile(bucket_latencies, 0.50),
+            "p95_ms": 1000 * percentile(bucket_latencies, 0.95),
+            "mean_prompt_tokens": statistics.mean(r["prompt_tokens"] for r in rows),
+            "mean_cached_tokens": statistics.mean(r["cached_tokens"] for r in rows),
+            "mean_transcript_entries": statistics.mean(r["transcript_entries"] for r in rows)
+        })
+
+    per_session = {}
+    for r in results:
+        session = per_session.setdefault(r["session"], {"requests": 0, "prompt_tokens": 0,
+                                                        "completion_tokens": 0})
+        session["requests"] += 1
+        session["prompt_tokens"] += r["prompt_tokens"]
+        session["completion_tokens"] += r["completion_tokens"]
+    prompt_per_session = [s["prompt_tokens"] for s in per_session.values()]
+    prompt_tokens = sum(r["prompt_tokens"] for r in results)
+    prompt_chars = sum(r["prompt_chars"] for r in results)
+
+    return {
+        "sessions": sessions,
+        "duration_s": elapsed,
+        "requests": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": 1000 * percentile(latencies, 0.50),
+            "p95": 1000 * percentile(latencies, 0.95),
+            "p99": 1000 * percentile(latencies, 0.99),
+            "max": 1000 * max(latencies, default=0.0)
+        },
+        "retries": sum(r["retries"] for r in results),
+        "throttled": sum(r["throttled"] for r in results),
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": sum(r["cached_tokens"] for r in results),
+        "cached_token_ratio": (sum(r["cached_tokens"] for r in results) / prompt_tokens
+                               if prompt_tokens else 0.0),
+        "prefix_reuse_ratio": (sum(r["reused_prefix_chars"] for r in results) / prompt_chars
+                               if prompt_chars else 0.0),
+        "completion_tokens": sum(r["completion_tokens"] for r in results),
+        "prompt_tokens_per_session": {
+            "mean": statistics.mean(prompt_per_session) if prompt_per_session else 0.0,
+            "max": max(prompt_per_session, default=0)
+        },
+        "buckets": buckets
+    }
+
+
+def print_report(summary):
+    latency = summary["latency_ms"]
+    print(f"\nSessions: {summary['sessions']}   duration: {summary['duration_s']:.1f}s   "
+          f"requests: {summary['requests']} ({summary['failed']} failed)")
+    print(f"Throughput: {summary['throughput_rps']:.2f} suggestions/s   "
+          f"latency p50/p95/p99/max: {latency['p50']:.0f}/{latency['p95']:.0f}/"
+          f"{latency['p99']:.0f}/{latency['max']:.0f} ms")
+    print(f"Retries: {summary['retries']}   throttled attempts: {summary['throttled']}")
+    print(f"Tokens: {summary['prompt_tokens']} prompt, {summary['completion_tokens']} completion; "
+          f"prompt tokens per session mean {summary['prompt_tokens_per_session']['mean']:.0f}, "
+          f"max {summary['prompt_tokens_per_session']['max']}")
+    print(f"Prompt cache: {summary['cached_tokens']} cached tokens "
+          f"({summary['cached_token_ratio']:.1%} of prompt tokens); "
+          f"{summary['prefix_reuse_ratio']:.1%} of prompt text repeats the previous request's prefix")
+
+    print(f"\n{'time':>6} {'reqs':>5} {'fail':>5} {'retry':>6} {'429':>5} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'prompt tok':>11} {'cached':>7} {'entries':>8}")
+    for bucket in summary["buckets"]:
+        print(f"{bucket['start_s']:>5}s {bucket['requests']:>5} {bucket['failures']:>5} "
+              f"{bucket['retries']:>6} {bucket['throttled']:>5} {bucket['p50_ms']:>8.0f} "
+              f"{bucket['p95_ms']:>8.0f} {bucket['mean_prompt_tokens']:>11.0f} "
+              f"{bucket['mean_cached_tokens']:>7.0f} {bucket['mean_transcript_entries']:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the suggestion path")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent simulated sessions")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run")
+    parser.add_argument("--click-interval", type=float, default=8.0,
+                        help="mean seconds between suggestion clicks per session")
+    parser.add_argument("--burst-probability", type=float, default=0.2,
+                        help="chance that a click is followed by an immediate second click")
+    parser.add_argument("--utterance-interval", type=float, default=3.0,
+                        help="mean seconds between transcript entries per session")
+    parser.add_argument("--store", action="store_true",
+                        help="send recent + relevant turns from a transcript store instead of "
+                             "the full transcript")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint (default: a local stub)")
+    parser.add_argument("--latency-ms", type=float, default=300, help="stub: base latency")
+    parser.add_argument("--jitter-ms", type=float, default=200, help="stub: random extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="stub: fraction of HTTP 500s")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="stub: fraction of random HTTP 429s")
+    parser.add_argument("--max-rps", type=float, default=0,
+                        help="stub: requests per second before HTTP 429 (0 = unlimited)")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="stub: Retry-After seconds sent with HTTP 429")
+    parser.add_argument("--cache-min-tokens", type=int, default=1024,
+                        help="stub: shortest prompt prefix reported as cached (OpenAI: 1024)")
+    parser.add_argument("--bucket", type=int, default=10, help="seconds per report time bucket")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the full report to this JSON file")
+    args = parser.parse_args()
+
+    stub = None
+    base_url = args.base_url
+    if base_url is None:
+        stub = LLMStub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                       error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                       max_rps=args.max_rps, retry_after=args.retry_after,
+                       cache_min_tokens=args.cache_min_tokens, seed=args.seed).start()
+        base_url = stub.base_url
+
+    client = create_client(base_url=base_url, api_key="stub" if stub else None)
+    store = TranscriptStore(":memory:") if args.store else None
+    sessions = [SimulatedSession(i, client, args, store) for i in range(args.sessions)]
+
+    print(f"Running {args.sessions} sessions for {args.duration:.0f}s against {base_url}...")
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [threading.Thread(target=session.run, args=(started, deadline),
+                                name=f"session-{session.index}", daemon=True)
+               for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    results = sorted((r for session in sessions for r in session.results),
+                     key=lambda r: r["time_s"])
+    summary = summarize(results, args.sessions, elapsed, args.bucket)
+    if stub is not None:
+        summary["stub"] = stub.get_stats()
+        stub.stop()
+    if store is not None:
+        store.close()
+
+    print_report(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "summary": summary, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""
+Benchmark Runner
+Times the hot paths of every module and compares them to a committed baseline
+
+Usage:
+    python3 -m benchmarks.run                      # Run all, compare to baseline.json
+    python3 -m benchmarks.run --filter transcript  # Only matching benchmarks
+    python3 -m benchmarks.run --update-baseline    # Record the current numbers
+    xvfb-run python3 -m benchmarks.run             # Include the Tk preview benchmarks
+
+A benchmark regresses when its fastest repeat is slower than the baseline's
+fastest repeat by more than the threshold; the runner then exits with
+status 1. The minimum is compared rather than the median because scheduler
+and cache noise only ever add time, so it is the most repeatable figure.
+Baselines are machine-specific: record them on the machine that compares
+against them.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks import fixtures
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+# Registered benchmark groups, in run order
+BENCHMARKS = []
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark group that cannot run in this environment"""
+
+
+def benchmark(function):
+    """
+    Register a benchmark group: a generator yielding (name, callable) cases
+
+    Groups are called with a scratch directory and a selected(*names)
+    predicate, and skip the setup of cases whose names are not selected.
+    """
+    BENCHMARKS.append(function)
+    return function
+
+
+def measure(function, repeats=15, min_repeat_time=0.02):
+    """
+    Time a callable
+
+    The number of calls per repeat is calibrated so that each repeat takes
+    at least min_repeat_time, keeping timer resolution out of the result.
+
+    Returns:
+        dict: median_us and min_us per call, and the calls per repeat
+    """
+    function()  # Warm up caches and lazy initialization
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_repeat_time:
+            break
+        loops = loops * 10 if elapsed == 0 else max(loops * 2, int(loops * min_repeat_time / elapsed * 1.2))
+
+    times = [elapsed / loops]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        times.append((time.perf_counter() - started) / loops)
+
+    return {"median_us": statistics.median(times) * 1e6, "min_us": min(times) * 1e6,
+            "loops": loops}
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+@benchmark
+def video_capture_benchmarks(workdir, selected):
+    from modules.video_capture import VideoCapture, make_detection_frame, make_preview_frame
+
+    for width, height in fixtures.RESOLUTIONS:
+        if not selected(*(f"video_capture.{case}[{width}x{height}]" for case in
+                          ("get_frame", "get_detection_frame", "make_detection_frame",
+                           "make_preview_frame"))):
+            continue
+        path = fixtures.write_video(os.path.join(workdir, f"face_{width}x{height}.avi"),
+                                    width, height, frames=300)
+        capture = VideoCapture(source=path, realtime=True)
+        if not capture.start():
+            raise SkipBenchmark("OpenCV cannot read the synthetic video")
+        while capture.get_frame() is None and capture.is_running:
+            time.sleep(0.01)
+
+        frame = fixtures.face_frame(width, height)
+        try:
+            yield f"video_capture.get_frame[{width}x{height}]", capture.get_frame
+            yield f"video_capture.get_detection_frame[{width}x{height}]", capture.get_detection_frame
+            yield f"video_capture.make_detection_frame[{width}x{height}]", lambda: make_detection_frame(frame)
+            yield f"video_capture.make_preview_frame[{width}x{height}]", lambda: make_preview_frame(frame)
+        finally:
+            capture.stop()
+
+
+@benchmark
+def screen_capture_benchmarks(workdir, selected):
+    import numpy as np
+    from modules.screen_capture import frame_digest
+
+    for width, height in fixtures.RESOLUTIONS:
+        frame = fixtures.face_frame(width, height)
+        # Screen grabs arrive as BGRA bytes
+        pixels = np.dstack([frame, np.full(frame.shape[:2], 255, dtype=np.uint8)]).tobytes()
+        yield f"screen_capture.frame_digest[{width}x{height}]", lambda: frame_digest(pixels)
+
+
+@benchmark
+def facial_expression_benchmarks(workdir, selected):
+    if not selected(*(f"facial_expression.detect_emotion[{kind},{width}x{height}]"
+                      for width, height in fixtures.RESOLUTIONS
+                      for kind in ("face", "noise", "detection"))):
+        return
+    try:
+        from modules.facial_expression import FacialExpressionRecognizer
+    except ImportError as e:
+        raise SkipBenchmark(f"emotion model not installed ({e})")
+    from modules.video_capture import make_detection_frame
+
+    recognizer = FacialExpressionRecognizer()
+    if recognizer.classifier is None:
+        raise SkipBenchmark("emotion model could not be loaded")
+    for width, height in fixtures.RESOLUTIONS:
+        face = fixtures.face_frame(width, height)
+        noise = fixtures.noise_frame(width, height)
+        detection = make_detection_frame(face)
+        yield f"facial_expression.detect_emotion[face,{width}x{height}]", lambda: recognizer.detect_emotion(face)
+        yield f"facial_expression.detect_emotion[noise,{width}x{height}]", lambda: recognizer.detect_emotion(noise)
+        yield (f"facial_expression.detect_emotion[detection,{width}x{height}]",
+               lambda: recognizer.detect_emotion(detection))
+
+
+@benchmark
+def gui_benchmarks(workdir, selected):
+    if not selected(*(f"gui.{case}[{width}x{height}]" for width, height in fixtures.RESOLUTIONS
+                      for case in ("update_video_frame", "show_preview_image"))):
+        return
+    try:
+        import tkinter as tk
+        from modules.gui import ApplicationGUI
+        root = tk.Tk()
+    except Exception as e:
+        raise SkipBenchmark(f"no display for Tk; run under xvfb-run ({e})")
+    from modules.video_capture import make_preview_frame
+
+    # Keep the window offscreen; widgets still render into their images
+    root.withdraw()
+    gui = ApplicationGUI(root, on_suggest_callback=lambda: None,
+                         on_start_callback=lambda: None, on_stop_callback=lambda: None)
+    try:
+        for width, height in fixtures.RESOLUTIONS:
+            frame = fixtures.face_frame(width, height)
+            preview = make_preview_frame(frame)
+            yield f"gui.update_video_frame[{width}x{height}]", lambda: gui.update_video_frame(frame)
+            yield f"gui.show_preview_image[{width}x{height}]", lambda: gui.show_preview_image(preview)
+    finally:
+        root.destroy()
+
+
+@benchmark
+def transcription_benchmarks(workdir, selected):
+    from modules.transcription import TranscriptionService
+    from modules.transcript_store import TranscriptStore
+    from modules.chatbot import ResponseGenerator
+
+    for count in fixtures.TRANSCRIPT_LENGTHS:
+        entries = fixtures.transcript_entries(count)
+
+        service = TranscriptionService()
+        service.transcript = list(entries)
+        yield f"transcription.get_transcript[{count}]", service.get_transcript
+        yield f"transcription.get_recent_transcript[{count}]", service.get_recent_transcript
+
+        if not selected(f"transcription.get_transcript[store,{count}]",
+                        f"chatbot.get_context_transcript[store,{count}]"):
+            continue
+        store = TranscriptStore(":memory:")
+        session_id = store.start_session()
+        stored = TranscriptionService(store=store, session_id=session_id)
+        for entry in entries:
+            stored.add_entry(entry)
+        generator = ResponseGenerator(client=_NullClient(), transcript_store=store,
+                                      session_id=session_id)
+        try:
+            yield f"transcription.get_transcript[store,{count}]", stored.get_transcript
+            yield f"chatbot.get_context_transcript[store,{count}]", generator.get_context_transcript
+        finally:
+            store.close()
+
+
+class _NullClient:
+    """OpenAI client stand-in that answers instantly, isolating prompt building"""
+
+    class _Completions:
+        class _Response:
+            class _Choice:
+                class _Message:
+                    content = "That sounds fun! What did you like most about it?"
+                message = _Message()
+            choices = [_Choice()]
+            usage = None
+
+        def create(self, **kwargs):
+            return self._Response()
+
+    class _Chat:
+        pass
+
+    def __init__(self):
+        self.chat = self._Chat()
+        self.chat.completions = self._Completions()
+
+
+@benchmark
+def chatbot_benchmarks(workdir, selected):
+    from openai import OpenAI
+    from modules.chatbot import ResponseGenerator, rank_candidates
+    from modules.transcription import format_transcript
+    from benchmarks.llm_stub import LLMStub, REPLIES
+
+    yield "chatbot.rank_candidates[3]", lambda: rank_candidates(REPLIES[:3], "sadness")
+
+    if not selected(*(f"chatbot.generate_response[{label},{count}]"
+                      for label in ("null-client", "stub-http")
+                      for count in fixtures.TRANSCRIPT_LENGTHS[:3])):
+        return
+    stub = LLMStub().start()
+    clients = {
+        "null-client": _NullClient(),
+        "stub-http": OpenAI(base_url=stub.base_url, api_key="stub", max_retries=0)
+    }
+    try:
+        for count in fixtures.TRANSCRIPT_LENGTHS[:3]:
+            transcript = format_transcript(fixtures.transcript_entries(count))
+            for label, client in clients.items():
+                generator = ResponseGenerator(client=client)
+
+                def suggest(generator=generator, transcript=transcript):
+                    # Start from an empty history so every call builds the same prompt
+                    generator.conversation_history = []
+                    return generator.generate_response(transcript, "happiness")
+
+                yield f"chatbot.generate_response[{label},{count}]", suggest
+    finally:
+        stub.stop()
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def machine_info():
+    """Describe the machine the numbers were measured on"""
+    return {"platform": platform.platform(), "python": platform.python_version(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+
+def run_benchmarks(name_filter=None):
+    """
+    Run every registered benchmark
+
+    Args:
+        name_filter: Only run cases whose name contains this text
+
+    Returns:
+        tuple: (results by case name, skip reasons by group name)
+    """
+    def selected(*names):
+        return not name_filter or any(name_filter in name for name in names)
+
+    results = {}
+    skipped = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for group in BENCHMARKS:
+            try:
+                # Groups check selected() before building fixtures; cheap cases are filtered here
+                for name, function in group(workdir, selected):
+                    if not selected(name):
+                        continue
+                    results[name] = measure(function)
+                    print(f"  {name:<62} {results[name]['median_us']:>12.1f} us", flush=True)
+            except SkipBenchmark as e:
+                skipped[group.__name__] = str(e)
+                print(f"  {group.__name__:<62} skipped: {e}", flush=True)
+    return results, skipped
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results to a baseline by their fastest repeat (min_us)
+
+    Returns:
+        list: (name, baseline_us, current_us, ratio) of the regressed cases
+    """
+    regressions = []
+    print(f"\n{'benchmark (min us)':<62} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<62} {'-':>10} {result['min_us']:>10.1f} {'new':>8}")
+            continue
+        ratio = result["min_us"] / reference["min_us"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append((name, reference["min_us"], result["min_us"], ratio))
+        print(f"{name:<62} {reference['min_us']:>10.1f} {result['min_us']:>10.1f} "
+              f"{(ratio - 1) * 100:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare to")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"allowed slowdown before failing (default: baseline's, else {DEFAULT_THRESHOLD})")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="write the measured numbers to the baseline file")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    print(f"Running benchmarks on {machine_info()['platform']}...")
+    results, skipped = run_benchmarks(args.filter)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"machine": machine_info(), "results": results, "skipped": skipped}, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    threshold = args.threshold if args.threshold is not None else baseline.get("threshold", DEFAULT_THRESHOLD)
+
+    if args.update_baseline:
+        merged = dict(baseline.get("results", {}))
+        merged.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": machine_info(), "threshold": threshold,
+                       "results": dict(sorted(merged.items()))}, f, indent=2)
+            f.write("\n")
+        print(f"\n✓ Baseline updated ({len(results)} benchmarks) in {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline.get("results", {}), threshold)
+    if regressions:
+        print(f"\n✗ {len(regressions)} benchmarks regressed by more than {threshold:.0%}")
+        return 1
+    print(f"\n✓ No regressions above {threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,9 +10,60 @@ load_dotenv()
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4o-mini")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # Any OpenAI-compatible endpoint (default: api.openai.com)
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))  # Seconds per request attempt
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))  # Retries after rate limiting, timeouts and server errors
+OPENAI_RETRY_DELAY = float(os.getenv("OPENAI_RETRY_DELAY", "0.5"))  # First retry delay, doubled each retry (Retry-After wins)
+
+# Video capture settings (camera sources; 0 / empty keeps the driver default)
+CAPTURE_WIDTH = int(os.getenv("CAPTURE_WIDTH", "640"))
+CAPTURE_HEIGHT = int(os.getenv("CAPTURE_HEIGHT", "480"))
+CAPTURE_FPS = int(os.getenv("CAPTURE_FPS", "30"))
+CAPTURE_FOURCC = os.getenv("CAPTURE_FOURCC", "MJPG")  # MJPG avoids raw USB bandwidth limits
+CAPTURE_BUFFER_SIZE = int(os.getenv("CAPTURE_BUFFER_SIZE", "1"))  # Driver frame queue; 1 = lowest latency
+DETECTION_WIDTH = int(os.getenv("DETECTION_WIDTH", "480"))  # Width of the grayscale image used for face detection
+PREVIEW_WIDTH = 320
+PREVIEW_HEIGHT = 240
+
+# Screen capture (--source screen[:x,y,w,h] analyses the video-call window instead of a camera)
+SCREEN_CAPTURE_INTERVAL = float(os.getenv("SCREEN_CAPTURE_INTERVAL", "0"))  # Seconds between grabs, i.e. the preview rate (0 = EXPRESSION_UPDATE_INTERVAL)
+SCREEN_CAPTURE_MONITOR = int(os.getenv("SCREEN_CAPTURE_MONITOR", "1"))  # Monitor grabbed by "screen" without a region (1 = primary)
+
+# CPU thread budget (see modules/resources.py)
+RESOURCE_PROFILE = os.getenv("RESOURCE_PROFILE", "balanced")  # "balanced", "preview-first" or "inference-first"
+CPU_CORES = int(os.getenv("CPU_CORES", "0"))  # Cores the application may use (0 = all available)
+
+# Memory budget (see modules/resources.py)
+MEMORY_PROFILE = os.getenv("MEMORY_PROFILE", "standard")  # "standard" or "low-memory"
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", "0"))  # Resident memory at which optional work is shed (0 = the profile's budget)
+MEMORY_CHECK_INTERVAL = float(os.getenv("MEMORY_CHECK_INTERVAL", "5.0"))  # Seconds between memory measurements
 
 # Expression Recognition Settings
 EXPRESSION_UPDATE_INTERVAL = int(os.getenv("EXPRESSION_UPDATE_INTERVAL", "10"))
+MIN_FACE_SIZE = int(os.getenv("MIN_FACE_SIZE", "60"))  # Smaller faces (pixels, in the detection image) are not classified
+
+# Face detection: "haar", "dnn" (OpenCV SSD, needs the model files) or "auto"
+# ("auto" measures both once and keeps the most accurate one within the budget)
+FACE_DETECTOR = os.getenv("FACE_DETECTOR", "auto")
+FACE_DETECTOR_BUDGET_MS = float(os.getenv("FACE_DETECTOR_BUDGET_MS", "15"))  # Latency budget per detection
+FACE_DNN_INPUT_SIZE = int(os.getenv("FACE_DNN_INPUT_SIZE", "300"))  # SSD input size; smaller is faster, misses small faces
+FACE_DNN_CONFIDENCE = float(os.getenv("FACE_DNN_CONFIDENCE", "0.5"))
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "models")  # Downloaded models and calibration results
+
+# Cross-stream micro-batching of emotion inference (server mode)
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "8"))  # Largest batch sent to the classifier
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "15"))  # Longest a face waits for its batch to fill
+INFERENCE_LATENCY_MS = float(os.getenv("INFERENCE_LATENCY_MS", "250"))  # Default per-stream latency bound
+
+# Pre-inference gating: cheap checks that skip or defer emotion inference
+GATE_ENABLED = os.getenv("GATE_ENABLED", "true").lower() == "true"
+GATE_DOWNSCALE_WIDTH = int(os.getenv("GATE_DOWNSCALE_WIDTH", "160"))  # Width of the grayscale thumbnail
+GATE_MOTION_THRESHOLD = float(os.getenv("GATE_MOTION_THRESHOLD", "3.0"))  # Mean abs pixel change (0-255) below which the scene is unchanged
+GATE_BLUR_THRESHOLD = float(os.getenv("GATE_BLUR_THRESHOLD", "30.0"))  # Laplacian variance below which the frame is too blurred
+GATE_MIN_BRIGHTNESS = float(os.getenv("GATE_MIN_BRIGHTNESS", "40"))  # Mean luminance below which the frame is too dark
+GATE_MAX_BRIGHTNESS = float(os.getenv("GATE_MAX_BRIGHTNESS", "225"))  # Mean luminance above which the frame is overexposed
+GATE_MAX_SKIP_SECONDS = float(os.getenv("GATE_MAX_SKIP_SECONDS", "60"))  # Always re-run inference at least this often
+GATE_RETRY_INTERVAL = float(os.getenv("GATE_RETRY_INTERVAL", "1.0"))  # Retry delay after a blurred or badly exposed frame
 
 # Supported emotions (from Py-Feat)
 EMOTIONS = ["happiness", "sadness", "surprise", "anger", "disgust", "fear", "neutral"]
@@ -28,13 +79,59 @@ EMOTICON_MAP = {
     "neutral": "😐"
 }
 
+# Session recording (off by default; nothing is saved unless enabled)
+SESSION_RECORDING = os.getenv("SESSION_RECORDING", "false").lower() == "true"
+SESSION_RECORDING_DIR = os.getenv("SESSION_RECORDING_DIR", "recordings")
+RECORD_FRAMES = os.getenv("RECORD_FRAMES", "false").lower() == "true"  # Also store downscaled video frames
+RECORD_FRAME_INTERVAL = float(os.getenv("RECORD_FRAME_INTERVAL", "1.0"))  # Seconds between stored frames
+RECORD_FRAME_WIDTH = int(os.getenv("RECORD_FRAME_WIDTH", "160"))
+RECORD_JPEG_QUALITY = int(os.getenv("RECORD_JPEG_QUALITY", "70"))
+RECORD_QUEUE_SIZE = int(os.getenv("RECORD_QUEUE_SIZE", "32"))  # Frames are dropped when the writer falls this far behind
+
+# Batch analysis of recorded videos
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "0"))  # Worker processes (0 = one per CPU core)
+BATCH_FRAME_STRIDE = int(os.getenv("BATCH_FRAME_STRIDE", "5"))  # Analyze every Nth frame
+BATCH_SEGMENT_SECONDS = float(os.getenv("BATCH_SEGMENT_SECONDS", "60"))  # Videos are split into segments of this length
+
+# Multi-session server
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8765"))
+SERVER_MODEL_WORKERS = int(os.getenv("SERVER_MODEL_WORKERS", "0"))  # Shared recognizer workers (0 = from the CPU thread budget)
+SERVER_SUGGESTION_WORKERS = int(os.getenv("SERVER_SUGGESTION_WORKERS", "8"))  # Concurrent OpenAI / speech API calls
+SERVER_AUDIO_SAMPLE_RATE = int(os.getenv("SERVER_AUDIO_SAMPLE_RATE", "16000"))  # Rate of 16-bit mono PCM sent by clients
+SERVER_MICRO_BATCHING = os.getenv("SERVER_MICRO_BATCHING", "true").lower() == "true"  # Batch faces across sessions
+SERVER_MAX_FRAME_BYTES = int(os.getenv("SERVER_MAX_FRAME_BYTES", str(4 * 1024 * 1024)))
+
+# Transcript storage: entries are written through to a SQLite database with a full-text index
+TRANSCRIPT_STORE = os.getenv("TRANSCRIPT_STORE", "true").lower() == "true"
+TRANSCRIPT_DB_PATH = os.getenv("TRANSCRIPT_DB_PATH", ":memory:")  # A file path keeps transcripts after the session (e.g. transcripts/transcripts.db)
+TRANSCRIPT_RETENTION_DAYS = float(os.getenv("TRANSCRIPT_RETENTION_DAYS", "30"))  # Sessions in a database file older than this are deleted (0 = keep forever)
+TRANSCRIPT_MEMORY_ENTRIES = int(os.getenv("TRANSCRIPT_MEMORY_ENTRIES", "200"))  # Latest entries also kept in memory
+PROMPT_RECENT_TURNS = int(os.getenv("PROMPT_RECENT_TURNS", "10"))  # Latest transcript entries sent with each request
+PROMPT_RELEVANT_TURNS = int(os.getenv("PROMPT_RELEVANT_TURNS", "5"))  # Older entries added by relevance to the latest one
+
+# Profiling (off by default; also enabled with --profile)
+PROFILE_ENABLED = os.getenv("PROFILE", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10"))  # Stack sampling period
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))  # Stack depth per allocation (0 = no memory snapshots)
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "25"))  # Allocation sites listed in memory.txt
+PROFILE_GAUGE_INTERVAL = float(os.getenv("PROFILE_GAUGE_INTERVAL", "5.0"))  # Seconds between buffer size readings
+
 # GUI Settings
 WINDOW_TITLE = "Karitas"
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
+GUI_TRANSCRIPT_MAX_LINES = int(os.getenv("GUI_TRANSCRIPT_MAX_LINES", "1000"))  # Conversation lines kept on screen under a memory budget
 
 # Response generation settings
 MAX_RESPONSE_LENGTH = 50  # Keep responses short for children
+PROMPT_HISTORY_TURNS = int(os.getenv("PROMPT_HISTORY_TURNS", "10"))  # Earlier suggestions kept in the prompt (halved when exceeded)
+SUGGESTION_CANDIDATES = int(os.getenv("SUGGESTION_CANDIDATES", "3"))  # Suggestions per request, ranked locally; the GUI cycles through them
+
+# The system prompt only depends on the child's profile, so it is identical for
+# every request and the provider can cache it; per-request details such as the
+# facial expression go in the last user message instead
 SYSTEM_PROMPT_TEMPLATE = """You are a helpful assistant supporting an autistic child during a conversation.
 Based on the conversation context and the other person's facial expression, suggest an appropriate response
 for the child to say. Keep your suggestion to ONE sentence or just a few words to avoid overwhelming the child.
@@ -44,5 +141,6 @@ Child's Profile:
 - Autism Level: {autism_level}
 - Communication Capabilities: {communication_capabilities}
 
-Current facial expression of conversation partner: {expression}
+Each request gives the other person's current facial expression, with how confident the expression
+detector is when it is unsure, and the latest part of the conversation.
 """
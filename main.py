@@ -5,54 +5,94 @@ Main Controller - Coordinates all components
 
 A macOS application that helps autistic children improve their social communication
 skills during online conversations using computer vision and AI.
+
+Usage:
+    python3 main.py                                   # Desktop app
+    python3 main.py --headless --source video.mp4     # Pipeline only, no GUI
+    python3 main.py --source screen:100,80,640,480    # Analyse the video-call window on screen
+    python3 main.py --memory-profile low-memory       # Grayscale frames, capped buffers, 512 MB budget
+    python3 main.py --batch recordings/ --output out/ # Emotion timelines for many videos
+    python3 main.py --server                          # Multi-session WebSocket server
+    python3 main.py --download-models                 # Fetch the DNN face detector, build the emotion model cache
 """
 
-import tkinter as tk
-from tkinter import simpledialog, messagebox
+import argparse
+import json
+import signal
 import threading
 import time
 
-from modules.video_capture import VideoCapture
-from modules.facial_expression import FacialExpressionRecognizer
-from modules.transcription import TranscriptionService
-from modules.chatbot import ResponseGenerator
-from modules.gui import ApplicationGUI
-from config.settings import EXPRESSION_UPDATE_INTERVAL
+# Tk is only needed for the desktop app; headless installs may not ship it
+try:
+    import tkinter as tk
+    from tkinter import simpledialog, messagebox
+    from modules.gui import ApplicationGUI
+    GUI_AVAILABLE = True
+except ImportError:
+    GUI_AVAILABLE = False
+
+from modules.events import (
+    EMOTION_DETECTED, TRANSCRIPT_ENTRY, SUGGESTION_REQUESTED, SUGGESTION_READY, STREAM_ENDED,
+    MEMORY_STATUS
+)
+from modules.pipeline import PipelineEngine, DEFAULT_CHILD_PROFILE
+from modules.screen_capture import is_screen_source, parse_screen_source
+from modules.resources import (
+    PROFILES, MEMORY_PROFILES, MemoryBudget, ThreadBudget, apply_memory_budget,
+    apply_thread_budget, get_thread_budget, track_cpu
+)
+from config.settings import (
+    BATCH_WORKERS, BATCH_FRAME_STRIDE, SERVER_HOST, SERVER_PORT, PROFILE_ENABLED,
+    PROFILE_GAUGE_INTERVAL, RESOURCE_PROFILE, MEMORY_PROFILE, MEMORY_BUDGET_MB
+)
+
+# Seconds between checks for the end of a headless run
+HEADLESS_POLL_INTERVAL = 0.2
 
 
 class SocialSupportController:
-    """Main controller that coordinates all components"""
+    """Desktop controller: runs a PipelineEngine and shows its events in the GUI"""
+
+    def __init__(self, source=0, profiling=PROFILE_ENABLED):
+        """
+        Initialize the controller and the GUI
 
-    def __init__(self):
-        """Initialize the controller and all components"""
+        Args:
+            source: Video source (camera index, video file path or screen region)
+            profiling: Whether to write CPU/memory profiles of each session
+        """
         self.root = tk.Tk()
+        self.source = source
+        self.profiling = profiling
 
         # Components
-        self.video_capture = None
-        self.expression_recognizer = None
-        self.transcription_service = None
-        self.response_generator = None
+        self.engine = None
         self.gui = None
 
         # State
-        self.is_running = False
-        self.current_emotion = "neutral"
         self.child_profile = None
 
-        # Threads
-        self.expression_update_thread = None
-        self.video_update_thread = None
+        # Preview scheduling
+        self.video_update_job = None
+        self.last_preview = None
+        self.profile_gauge_job = None
 
         # Initialize GUI
         self._initialize_gui()
 
+    @property
+    def is_running(self):
+        """Whether a session is currently running (safe to read from any thread)"""
+        return self.engine is not None and self.engine.is_running
+
     def _initialize_gui(self):
         """Initialize the graphical user interface"""
         self.gui = ApplicationGUI(
             self.root,
             on_suggest_callback=self.on_suggest_response,
             on_start_callback=self.start_session,
-            on_stop_callback=self.stop_session
+            on_stop_callback=self.stop_session,
+            on_select_callback=self.on_select_suggestion
         )
 
     def start_session(self):
@@ -62,37 +102,35 @@ class SocialSupportController:
         print("="*50)
 
         # Use default profile for high-functioning autistic individuals
-        self.child_profile = {
-            "age": "teen/adult",
-            "autism_level": "Level 1 (high-functioning)",
-            "communication_capabilities": "Can communicate in full sentences"
-        }
+        self.child_profile = dict(DEFAULT_CHILD_PROFILE)
 
         print(f"\nDefault Profile:")
         print(f"  Target Users: High-functioning individuals with autism")
         print(f"  Communication: Full sentences\n")
 
+        self.engine = PipelineEngine(source=self.source, child_profile=self.child_profile,
+                                     profiling=self.profiling)
+        self.engine.subscribe(EMOTION_DETECTED, self._on_emotion_detected)
+        self.engine.subscribe(TRANSCRIPT_ENTRY, self._on_transcript_entry)
+        self.engine.subscribe(SUGGESTION_READY, self._on_suggestion_ready)
+        self.engine.subscribe(MEMORY_STATUS, self._on_memory_status)
+
         # Initialize components
-        if not self._initialize_components():
+        if not self.engine.initialize_components():
             messagebox.showerror("Initialization Error",
                                "Failed to initialize system components. Please check the console for errors.")
+            self.engine = None
             return False
 
-        # Start services
-        self.is_running = True
-
-        # Start video capture
-        if not self.video_capture.start():
+        # Start video capture, transcription and the pipeline stages
+        if not self.engine.start():
             messagebox.showerror("Camera Error", "Failed to start camera.")
             self.stop_session()
             return False
 
-        # Start transcription
-        self.transcription_service.start()
-
         # Check if transcription is actually available
-        print(f"Debug: is_available = {self.transcription_service.is_available}")
-        if not self.transcription_service.is_available:
+        print(f"Debug: is_available = {self.engine.transcription_service.is_available}")
+        if not self.engine.transcription_service.is_available:
             # Show message in transcript area that transcription is disabled
             print("Debug: Adding transcript message about disabled transcription")
             self.gui.add_transcript_entry("==================================")
@@ -117,8 +155,12 @@ class SocialSupportController:
             self.gui.add_transcript_entry("==================================")
             print("Debug: Finished adding transcript entries")
 
-        # Start update threads
-        self._start_update_threads()
+        # Start video preview on Tk's own event loop
+        self._schedule_video_update()
+
+        # Tk widgets can only be measured on the Tk thread, so push their sizes
+        if self.engine.profiler is not None:
+            self._record_text_sizes()
 
         print("✓ Session started successfully")
         return True
@@ -158,135 +200,84 @@ class SocialSupportController:
 
         return True
 
-    def _initialize_components(self):
-        """Initialize all system components"""
-        try:
-            # Video capture
-            self.video_capture = VideoCapture(source=0)
-
-            # Facial expression recognizer
-            self.expression_recognizer = FacialExpressionRecognizer()
-
-            # Transcription service
-            self.transcription_service = TranscriptionService()
-
-            # Response generator
-            self.response_generator = ResponseGenerator(self.child_profile)
-
-            return True
-
-        except Exception as e:
-            print(f"✗ Error initializing components: {e}")
-            return False
-
-    def _start_update_threads(self):
-        """Start background threads for updating GUI"""
-        # Start video updates using tkinter's after() for smoother performance
-        self._schedule_video_update()
-
-        # Expression update thread
-        self.expression_update_thread = threading.Thread(
-            target=self._expression_update_loop,
-            daemon=True
-        )
-        self.expression_update_thread.start()
-
-        # Transcript monitoring thread
-        transcript_thread = threading.Thread(
-            target=self._transcript_monitor_loop,
-            daemon=True
-        )
-        transcript_thread.start()
+    def _run_on_gui_thread(self, callback, *args):
+        """Schedule a GUI update on the Tk thread if the session is still running"""
+        def run():
+            if self.is_running:
+                callback(*args)
+        self.root.after(0, run)
 
     def _schedule_video_update(self):
         """Schedule video frame updates using tkinter's after() for smooth updates"""
+        self.video_update_job = None
         if self.is_running:
-            frame = self.video_capture.get_frame()
-            if frame is not None:
-                self.gui.update_video_frame(frame)
-            # Schedule next update (~30 fps)
-            self.root.after(33, self._schedule_video_update)
-
-    def _expression_update_loop(self):
-        """Periodically detect and update facial expressions"""
-        while self.is_running:
-            # Wait first to avoid initial detection rush
-            time.sleep(EXPRESSION_UPDATE_INTERVAL)
-
-            if not self.is_running:
-                break
-
-            frame = self.video_capture.get_frame()
-            if frame is not None:
-                # Detect emotion (FER library handles frame internally)
-                emotion = self.expression_recognizer.detect_emotion(frame)
-                self.current_emotion = emotion
-
-                # Get emoticon
-                emoticon = self.expression_recognizer.get_emoticon(emotion)
-
-                # Update GUI
-                self.gui.update_emotion(emotion, emoticon)
-
-    def _transcript_monitor_loop(self):
-        """Monitor and display transcript updates"""
-        while self.is_running:
-            try:
-                # Check for new transcript entries
-                entry = self.transcription_service.transcript_queue.get(timeout=1)
-                text = f"[{entry['timestamp']}] {entry['speaker']}: {entry['text']}"
-                self.gui.add_transcript_entry(text)
-            except:
-                continue
+            track_cpu("preview")
+            # The preview image is built once per captured frame; skip redrawing repeats
+            image = self.engine.get_preview_frame()
+            if image is not None and image is not self.last_preview:
+                self.last_preview = image
+                self.gui.show_preview_image(image)
+            # The refresh rate comes from the thread budget's profile
+            self.video_update_job = self.root.after(get_thread_budget().preview_interval_ms,
+                                                    self._schedule_video_update)
+
+    def _record_text_sizes(self):
+        """Record the text widget sizes with the session profiler"""
+        self.profile_gauge_job = None
+        if self.is_running and self.engine.profiler is not None:
+            for name, lines in self.gui.get_text_sizes().items():
+                self.engine.profiler.record(name, lines)
+            self.profile_gauge_job = self.root.after(int(PROFILE_GAUGE_INTERVAL * 1000),
+                                                     self._record_text_sizes)
+
+    def _on_emotion_detected(self, event):
+        """Show a newly detected emotion"""
+        self._run_on_gui_thread(self.gui.update_emotion,
+                                event.data["emotion"], event.data["emoticon"])
+
+    def _on_transcript_entry(self, event):
+        """Show a new transcript entry"""
+        entry = event.data["entry"]
+        text = f"[{entry['timestamp']}] {entry['speaker']}: {entry['text']}"
+        self._run_on_gui_thread(self.gui.add_transcript_entry, text)
+
+    def _on_suggestion_ready(self, event):
+        """Show the generated suggestions, best first"""
+        self._run_on_gui_thread(self.gui.show_suggestion_candidates, event.data["candidates"])
+
+    def _on_memory_status(self, event):
+        """Show the memory use and apply the governor's limit to the transcript display"""
+        data = event.data
+        self._run_on_gui_thread(self.gui.update_memory_status,
+                                data["rss_mb"], data["budget_mb"], data["level"])
+        self._run_on_gui_thread(self.gui.set_transcript_line_limit,
+                                data["limits"]["transcript_lines"])
 
     def on_suggest_response(self):
         """Handle request for response suggestion"""
-        # Run in separate thread to avoid blocking GUI
-        thread = threading.Thread(target=self._generate_suggestion, daemon=True)
-        thread.start()
-
-    def _generate_suggestion(self):
-        """Generate and display a response suggestion"""
-        try:
-            # Get conversation transcript
-            transcript = self.transcription_service.get_transcript()
+        if self.engine is not None:
+            self.engine.request_suggestion()
 
-            if not transcript:
-                transcript = "No conversation detected yet."
-
-            # Get current emotion
-            emotion = self.current_emotion
-
-            # Generate response
-            print(f"\nGenerating response suggestion...")
-            print(f"  Current emotion: {emotion}")
-            response = self.response_generator.generate_response(transcript, emotion)
-
-            print(f"  Suggested response: {response}\n")
-
-            # Display in GUI
-            self.gui.show_response_suggestion(response)
-
-        except Exception as e:
-            print(f"✗ Error generating suggestion: {e}")
-            self.gui.show_response_suggestion("Error generating suggestion.")
+    def on_select_suggestion(self, index):
+        """Keep the candidate the user switched to as the given suggestion"""
+        if self.engine is not None:
+            self.engine.select_suggestion(index)
 
     def stop_session(self):
         """Stop the current session"""
         print("\nStopping session...")
 
-        self.is_running = False
-
-        # Stop services
-        if self.video_capture:
-            self.video_capture.stop()
-
-        if self.transcription_service:
-            self.transcription_service.stop()
+        # Cancel the preview timer before shutting down the pipeline
+        if self.video_update_job is not None:
+            self.root.after_cancel(self.video_update_job)
+            self.video_update_job = None
+        if self.profile_gauge_job is not None:
+            self.root.after_cancel(self.profile_gauge_job)
+            self.profile_gauge_job = None
 
-        # Reset components
-        if self.response_generator:
-            self.response_generator.reset_conversation()
+        if self.engine is not None:
+            self.engine.stop()
+            self.engine = None
 
         if self.gui:
             self.gui.clear_transcript()
@@ -311,10 +302,156 @@ class SocialSupportController:
             self.stop_session()
 
 
+def parse_source(value):
+    """Interpret a --source value: digits select a camera, "screen[:x,y,w,h]" the screen, anything else is a file"""
+    return int(value) if value.isdigit() else value
+
+
+def run_headless(source, duration=None, suggest_interval=None, realtime=True,
+                 profiling=PROFILE_ENABLED):
+    """
+    Run the pipeline without a GUI, printing each event as a JSON line
+
+    Args:
+        source: Video source (camera index, video file path or screen region)
+        duration: Stop after this many seconds (None runs until the video ends)
+        suggest_interval: Request a suggestion every this many seconds (None disables)
+        realtime: Play video files back at their native frame rate
+        profiling: Write CPU/memory profiles of the run
+
+    Returns:
+        int: Process exit code
+    """
+    engine = PipelineEngine(source=source, realtime=realtime, profiling=profiling)
+
+    def print_event(event):
+        print(json.dumps({"event": event.type, "time": event.timestamp, **event.data}),
+              flush=True)
+
+    for event_type in (EMOTION_DETECTED, TRANSCRIPT_ENTRY, SUGGESTION_REQUESTED,
+                       SUGGESTION_READY, STREAM_ENDED, MEMORY_STATUS):
+        engine.subscribe(event_type, print_event, lane="output")
+
+    if not engine.initialize_components():
+        return 1
+    if not engine.start():
+        print(f"✗ Could not open video source {source}")
+        return 1
+
+    if suggest_interval:
+        engine.event_bus.call_every(suggest_interval, engine.request_suggestion)
+
+    # Let Ctrl+C / SIGTERM end the run cleanly
+    stop_requested = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_requested.set())
+
+    # Video files also end on their own; wait in short steps so SIGTERM is seen too
+    is_file = isinstance(source, str) and not is_screen_source(source)
+    deadline = None if duration is None else time.monotonic() + duration
+    try:
+        while not (is_file and engine.wait(timeout=0)):
+            step = HEADLESS_POLL_INTERVAL
+            if deadline is not None:
+                step = min(step, deadline - time.monotonic())
+                if step <= 0:
+                    break
+            if stop_requested.wait(timeout=step):
+                break
+    except KeyboardInterrupt:
+        print("\n\nHeadless run interrupted by user")
+    finally:
+        engine.stop(drain=True)
+
+    return 0
+
+
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Autism Social Communication Support Application")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the processing pipeline without the GUI")
+    parser.add_argument("--source", default="0",
+                        help="camera index, video file path, or screen[:x,y,w,h] to analyse "
+                             "a region of the screen such as the video-call window (default: 0)")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="headless: stop after this many seconds")
+    parser.add_argument("--suggest-interval", type=float, default=None,
+                        help="headless: request a response suggestion every N seconds")
+    parser.add_argument("--fast", action="store_true",
+                        help="headless: read video files as fast as possible instead of in real time")
+    parser.add_argument("--profile", action="store_true", default=PROFILE_ENABLED,
+                        help="write CPU and memory profiles of each session to profiles/")
+    parser.add_argument("--resource-profile", choices=list(PROFILES), default=RESOURCE_PROFILE,
+                        help=f"how CPU cores are split between inference and the preview "
+                             f"(default: {RESOURCE_PROFILE})")
+    parser.add_argument("--memory-profile", choices=list(MEMORY_PROFILES), default=MEMORY_PROFILE,
+                        help=f"low-memory keeps grayscale frames and caps buffers and histories "
+                             f"(default: {MEMORY_PROFILE})")
+    parser.add_argument("--memory-budget", type=int, metavar="MB", default=MEMORY_BUDGET_MB,
+                        help="resident memory at which optional work such as the preview size and "
+                             "the history kept is shed (default: the memory profile's)")
+    parser.add_argument("--batch", metavar="DIR",
+                        help="analyze every video in DIR and write emotion timelines")
+    parser.add_argument("--output", metavar="DIR", default="analysis",
+                        help="batch: output directory (default: analysis)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS,
+                        help="batch: worker processes (default: one per CPU core)")
+    parser.add_argument("--stride", type=int, default=BATCH_FRAME_STRIDE,
+                        help=f"batch: analyze every Nth frame (default: {BATCH_FRAME_STRIDE})")
+    parser.add_argument("--server", action="store_true",
+                        help="serve many thin clients over HTTP/WebSocket with a shared model pool")
+    parser.add_argument("--host", default=SERVER_HOST,
+                        help=f"server: address to listen on (default: {SERVER_HOST})")
+    parser.add_argument("--port", type=int, default=SERVER_PORT,
+                        help=f"server: port to listen on (default: {SERVER_PORT})")
+    parser.add_argument("--download-models", action="store_true",
+                        help="download the OpenCV DNN face detector model, build the emotion "
+                             "model cache and exit")
+    args = parser.parse_args()
+    source = parse_source(args.source)
+    if is_screen_source(source):
+        try:
+            parse_screen_source(source)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # Size the library thread pools and memory before any model is loaded
+    apply_thread_budget(ThreadBudget(args.resource_profile))
+    apply_memory_budget(MemoryBudget(args.memory_profile, args.memory_budget))
+
+    if args.download_models:
+        from modules.facial_expression import download_dnn_model
+        from modules.emotion_model import load_emotion_classifier
+        ok = download_dnn_model()
+        try:
+            load_emotion_classifier()
+            print("✓ Emotion model cache is ready")
+        except (ImportError, OSError) as e:
+            print(f"✗ Could not build the emotion model cache: {e}")
+            ok = False
+        raise SystemExit(0 if ok else 1)
+
+    if args.server:
+        from modules.server import SessionServer
+        SessionServer().run(host=args.host, port=args.port)
+        return
+
+    if args.batch:
+        from modules.batch_analysis import run_batch
+        summary = run_batch(args.batch, args.output, workers=args.workers, stride=args.stride)
+        raise SystemExit(0 if summary else 1)
+
+    if args.headless:
+        raise SystemExit(run_headless(source, duration=args.duration,
+                                      suggest_interval=args.suggest_interval,
+                                      realtime=not args.fast, profiling=args.profile))
+
+    if not GUI_AVAILABLE:
+        print("✗ Tkinter is not available; use --headless to run without the GUI")
+        raise SystemExit(1)
+
     try:
-        controller = SocialSupportController()
+        controller = SocialSupportController(source=source, profiling=args.profile)
         controller.run()
     except KeyboardInterrupt:
         print("\n\nApplication interrupted by user")
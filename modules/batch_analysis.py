@@ -0,0 +1,317 @@
+"""
+Batch Analysis Module
+Computes emotion timelines for recorded session videos using a process pool
+
+Each video is split into fixed-length segments so long recordings are
+spread across all workers. Every worker process owns one
+FacialExpressionRecognizer, built once when the worker starts.
+"""
+import json
+import multiprocessing
+import os
+import time
+
+import cv2
+import numpy as np
+
+from modules.resources import ThreadBudget, apply_thread_budget, get_thread_budget
+from modules.video_capture import make_detection_frame
+from config.settings import (
+    EMOTIONS, BATCH_WORKERS, BATCH_FRAME_STRIDE, BATCH_SEGMENT_SECONDS
+)
+
+# Parquet output is optional; timelines fall back to NumPy .npz columns
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".m4v", ".webm")
+
+# Recognizer owned by the current worker process
+_worker_recognizer = None
+
+
+def _init_worker():
+    """Build this worker's recognizer, limited to one thread so workers do not compete"""
+    global _worker_recognizer
+    apply_thread_budget(ThreadBudget(cores=1))
+
+    from modules.facial_expression import FacialExpressionRecognizer
+    _worker_recognizer = FacialExpressionRecognizer()
+
+
+def find_videos(input_dir, extensions=VIDEO_EXTENSIONS):
+    """
+    List the video files in a directory
+
+    Args:
+        input_dir: Directory to scan (not recursive)
+        extensions: File extensions treated as videos
+
+    Returns:
+        list: Sorted video file paths
+    """
+    return sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if name.lower().endswith(extensions)
+    )
+
+
+def probe_video(path):
+    """
+    Read the frame count and frame rate of a video
+
+    Returns:
+        tuple: (frame_count, fps); (0, 0.0) if the video cannot be opened
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        return 0, 0.0
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    capture.release()
+    return frame_count, fps
+
+
+def plan_segments(path, frame_count, fps, segment_seconds=BATCH_SEGMENT_SECONDS):
+    """
+    Split a video into (path, start_frame, end_frame, fps) work items
+
+    Returns:
+        list: Segments covering every frame of the video
+    """
+    segment_frames = max(1, int(segment_seconds * fps))
+    return [
+        (path, start, min(start + segment_frames, frame_count), fps)
+        for start in range(0, frame_count, segment_frames)
+    ]
+
+
+def _analyze_segment(task):
+    """
+    Worker: compute emotion scores for every stride-th frame of a segment
+
+    Args:
+        task: (path, start_frame, end_frame, fps, stride)
+
+    Returns:
+        dict: Segment columns and counters
+    """
+    path, start, end, fps, stride = task
+    frames, scores, faces = [], [], []
+
+    capture = cv2.VideoCapture(path)
+    if start > 0:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    # Keep the stride aligned to the video's global frame index across segments
+    index = start
+    while index < end:
+        if index % stride:
+            # grab() advances without the cost of retrieving the skipped frame
+            if not capture.grab():
+                break
+            index += 1
+            continue
+
+        ret, frame = capture.read()
+        if not ret:
+            break
+
+        try:
+            # Detect on the same downscaled grayscale image as live sessions
+            result = _worker_recognizer.detect_scores(make_detection_frame(frame))
+        except Exception as e:
+            print(f"Error analyzing {path} frame {index}: {e}")
+            result = None
+
+        frames.append(index)
+        faces.append(result is not None)
+        scores.append([result.get(emotion, 0.0) for emotion in EMOTIONS] if result
+                      else [np.nan] * len(EMOTIONS))
+        index += 1
+
+    capture.release()
+    return {
+        "path": path,
+        "start": start,
+        "fps": fps,
+        "frames": np.array(frames, dtype=np.int64),
+        "faces": np.array(faces, dtype=bool),
+        "scores": np.array(scores, dtype=np.float32).reshape(-1, len(EMOTIONS))
+    }
+
+
+def build_timeline(segments):
+    """
+    Merge the analyzed segments of one video into timeline columns
+
+    Args:
+        segments: Results of _analyze_segment for a single video
+
+    Returns:
+        dict: Column name -> NumPy array
+    """
+    segments = sorted(segments, key=lambda segment: segment["start"])
+    fps = segments[0]["fps"] if segments else 30.0
+    frames = np.concatenate([s["frames"] for s in segments]) if segments else np.empty(0, np.int64)
+    faces = np.concatenate([s["faces"] for s in segments]) if segments else np.empty(0, bool)
+    scores = (np.concatenate([s["scores"] for s in segments]) if segments
+              else np.empty((0, len(EMOTIONS)), np.float32))
+
+    # Dominant emotion index per frame (-1 when no face was found)
+    dominant = np.full(len(frames), -1, dtype=np.int8)
+    if faces.any():
+        dominant[faces] = np.argmax(scores[faces], axis=1)
+
+    columns = {
+        "frame": frames,
+        "time_s": frames / fps,
+        "face_detected": faces,
+        "emotion_index": dominant
+    }
+    for i, emotion in enumerate(EMOTIONS):
+        columns[emotion] = scores[:, i]
+    return columns
+
+
+def summarize_timeline(columns, frame_count, fps):
+    """
+    Compute summary statistics for a timeline
+
+    Returns:
+        dict: Counts, face coverage, dominant-emotion shares and mean scores
+    """
+    faces = columns["face_detected"]
+    analyzed = len(columns["frame"])
+    detected = int(faces.sum())
+
+    dominant_share = {}
+    mean_scores = {}
+    for i, emotion in enumerate(EMOTIONS):
+        dominant_share[emotion] = (float((columns["emotion_index"] == i).sum()) / detected
+                                   if detected else 0.0)
+        mean_scores[emotion] = float(np.nanmean(columns[emotion][faces])) if detected else 0.0
+
+    return {
+        "duration_s": frame_count / fps if fps else 0.0,
+        "frames_total": frame_count,
+        "frames_analyzed": analyzed,
+        "frames_with_face": detected,
+        "face_coverage": detected / analyzed if analyzed else 0.0,
+        "dominant_emotion": max(dominant_share, key=dominant_share.get) if detected else None,
+        "dominant_share": dominant_share,
+        "mean_scores": mean_scores
+    }
+
+
+def write_timeline(columns, output_base):
+    """
+    Write timeline columns in a columnar format
+
+    Args:
+        columns: Column name -> NumPy array
+        output_base: Output path without extension
+
+    Returns:
+        str: Path of the written file (.parquet, or .npz without pyarrow)
+    """
+    if PARQUET_AVAILABLE:
+        path = output_base + ".parquet"
+        table = pa.table(columns)
+        table = table.replace_schema_metadata({"emotions": ",".join(EMOTIONS)})
+        pq.write_table(table, path, compression="zstd")
+    else:
+        path = output_base + ".npz"
+        np.savez_compressed(path, emotions=np.array(EMOTIONS), **columns)
+    return path
+
+
+def run_batch(input_dir, output_dir, workers=BATCH_WORKERS, stride=BATCH_FRAME_STRIDE,
+              segment_seconds=BATCH_SEGMENT_SECONDS):
+    """
+    Analyze every video in a directory
+
+    Args:
+        input_dir: Directory containing the videos
+        output_dir: Directory for timelines and summary.json
+        workers: Number of worker processes (0 uses one per available core)
+        stride: Analyze every stride-th frame
+        segment_seconds: Length of the segments videos are split into
+
+    Returns:
+        dict: The batch summary written to summary.json
+    """
+    videos = find_videos(input_dir)
+    if not videos:
+        print(f"✗ No videos found in {input_dir}")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or get_thread_budget().batch_workers
+    stride = max(1, stride)
+
+    probes = {path: probe_video(path) for path in videos}
+    tasks = []
+    for path, (frame_count, fps) in probes.items():
+        if frame_count == 0:
+            print(f"⚠️  Skipping unreadable video {path}")
+            continue
+        tasks.extend(segment + (stride,)
+                     for segment in plan_segments(path, frame_count, fps, segment_seconds))
+
+    print(f"Analyzing {len(videos)} videos ({len(tasks)} segments) with {workers} workers...")
+    started = time.perf_counter()
+
+    # Spawn (not fork) so each worker initializes TensorFlow from a clean state
+    context = multiprocessing.get_context("spawn")
+    segments_by_video = {path: [] for path in videos}
+    with context.Pool(processes=workers, initializer=_init_worker) as pool:
+        for segment in pool.imap_unordered(_analyze_segment, tasks):
+            segments_by_video[segment["path"]].append(segment)
+
+    elapsed = time.perf_counter() - started
+
+    video_summaries = {}
+    frames_analyzed = 0
+    video_seconds = 0.0
+    for path, segments in segments_by_video.items():
+        frame_count, fps = probes[path]
+        if not segments:
+            continue
+        columns = build_timeline(segments)
+        # Keep the extension so session.mp4 and session.avi get separate outputs
+        name = os.path.relpath(path, input_dir)
+        summary = summarize_timeline(columns, frame_count, fps)
+        summary["timeline"] = os.path.basename(write_timeline(columns, os.path.join(output_dir, name)))
+        video_summaries[name] = summary
+        frames_analyzed += summary["frames_analyzed"]
+        video_seconds += summary["duration_s"]
+
+    batch_summary = {
+        "emotions": EMOTIONS,
+        "videos": video_summaries,
+        "throughput": {
+            "workers": workers,
+            "frame_stride": stride,
+            "videos": len(video_summaries),
+            "segments": len(tasks),
+            "frames_analyzed": frames_analyzed,
+            "video_seconds": video_seconds,
+            "wall_seconds": elapsed,
+            "frames_per_second": frames_analyzed / elapsed if elapsed else 0.0,
+            "realtime_factor": video_seconds / elapsed if elapsed else 0.0
+        }
+    }
+
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump(batch_summary, f, indent=2)
+
+    throughput = batch_summary["throughput"]
+    print(f"✓ Analyzed {throughput['videos']} videos in {elapsed:.1f}s: "
+          f"{throughput['frames_per_second']:.1f} frames/s, "
+          f"{throughput['realtime_factor']:.1f}x real time")
+    return batch_summary
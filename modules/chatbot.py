@@ -1,31 +1,258 @@
 """
 LLM-Based Chatbot Module
 Uses OpenAI's GPT models to generate appropriate conversation responses
+
+Requests are laid out for prompt caching: the system prompt depends only on
+the child's profile and is byte-identical across requests and sessions,
+earlier suggestions follow in append-only order, and everything that
+changes per request (expression, transcript) is in the last message. Each
+request therefore starts with the previous request's prompt, which the
+provider can serve from its prefix cache.
+
+Each request asks for SUGGESTION_CANDIDATES alternatives at once. They are
+ranked locally by length, reading level and fit with the expression, so
+when the best one does not suit, the next one is shown without another
+request. Only the candidate finally chosen is kept in the history.
 """
-from openai import OpenAI
-from config.settings import OPENAI_API_KEY, MODEL_NAME, SYSTEM_PROMPT_TEMPLATE
+import functools
+import random
+import re
+import threading
+import time
+
+from openai import (
+    OpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+)
+from config.settings import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_TIMEOUT, OPENAI_MAX_RETRIES, OPENAI_RETRY_DELAY,
+    MODEL_NAME, SYSTEM_PROMPT_TEMPLATE, PROMPT_RECENT_TURNS, PROMPT_RELEVANT_TURNS,
+    PROMPT_HISTORY_TURNS, SUGGESTION_CANDIDATES
+)
+from modules.transcription import format_transcript
+
+# Errors worth retrying; anything else (bad request, authentication) fails at once
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+# Longest wait between two attempts
+_MAX_RETRY_DELAY = 20.0
+
+# Request text of earlier turns kept in the history (their transcript is not repeated)
+SUGGESTION_REQUEST = "Suggest a brief, appropriate response for the child."
+
+# Alternative expressions below this score are not mentioned in the prompt
+_MIN_EXPRESSION_SCORE = 0.15
+
+# System prompts sent by this process, for measuring prefix reuse across sessions
+_sent_system_prompts = set()
+
+# Returned when no suggestion could be generated
+FALLBACK_RESPONSE = "I'm not sure what to say right now."
+
+# Words that suit, and words that clash with, a reply to each expression
+EMOTION_LEXICON = {
+    "happiness": ({"great", "fun", "awesome", "cool", "glad", "nice", "love", "happy", "yay"},
+                  {"sorry", "sad"}),
+    "sadness": ({"sorry", "okay", "ok", "help", "feel", "feeling", "here", "sad", "hug"},
+                {"great", "awesome", "fun", "yay", "cool", "funny"}),
+    "surprise": ({"wow", "really", "what", "happened", "whoa", "cool"}, set()),
+    "anger": ({"sorry", "understand", "okay", "ok", "calm", "upset", "fair"},
+              {"great", "awesome", "fun", "yay", "funny", "cool"}),
+    "disgust": ({"sorry", "okay", "ok", "different", "wrong"}, {"yum", "love", "awesome"}),
+    "fear": ({"okay", "ok", "safe", "help", "worried", "scared", "here", "alright"},
+             {"awesome", "fun", "yay", "funny"}),
+    "neutral": ({"how", "what", "hi", "hello"}, set())
+}
+
+# Suggestions longer than this many words, or above this reading grade, rank lower
+_TARGET_WORDS = 12
+_TARGET_GRADE = 5.0
+
+_WORD_PATTERN = re.compile(r"[a-z']+")
+_VOWELS_PATTERN = re.compile(r"[aeiouy]+")
+_SENTENCE_END_PATTERN = re.compile(r"[.!?]+")
+
+
+@functools.lru_cache(maxsize=4096)
+def _syllables(word):
+    """Rough syllable count: groups of vowels, without a silent final e"""
+    count = len(_VOWELS_PATTERN.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def _grade(text, words):
+    if not words:
+        return 0.0
+    sentences = max(1, len(_SENTENCE_END_PATTERN.findall(text)))
+    syllables = sum(_syllables(word) for word in words)
+    return 0.39 * len(words) / sentences + 11.8 * syllables / len(words) - 15.59
+
+
+def reading_grade(text):
+    """
+    Estimate the Flesch-Kincaid grade level of a text
+
+    Returns:
+        float: US school grade needed to read the text (0 for no words)
+    """
+    return _grade(text, _WORD_PATTERN.findall(text.lower()))
+
+
+def score_candidate(text, expression):
+    """
+    Score a suggestion: short, easy to say and fitting the partner's expression
+
+    Args:
+        text: Suggested response
+        expression: Current facial expression of the conversation partner
+
+    Returns:
+        float: Higher is better; 0 for a short, simple reply with no emotion cues
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    length_penalty = max(0, len(words) - _TARGET_WORDS) / _TARGET_WORDS
+    reading_penalty = max(0.0, _grade(text, words) - _TARGET_GRADE) / _TARGET_GRADE
+    fits, clashes = EMOTION_LEXICON.get(expression, (set(), set()))
+    present = set(words)
+    emotion_fit = 0.5 * min(len(present & fits), 2) - 0.5 * len(present & clashes)
+    return emotion_fit - length_penalty - reading_penalty
+
+
+def rank_candidates(candidates, expression):
+    """
+    Rank suggestion candidates for the child
+
+    Args:
+        candidates: Suggested responses in the order the API returned them
+        expression: Current facial expression of the conversation partner
+
+    Returns:
+        list: Distinct, non-empty candidates, best first (API order breaks ties)
+    """
+    distinct = list(dict.fromkeys(candidate.strip() for candidate in candidates
+                                  if candidate and candidate.strip()))
+    if len(distinct) < 2:
+        return distinct
+    return sorted(distinct, key=lambda candidate: -score_candidate(candidate, expression))
+
+
+def create_client(base_url=OPENAI_BASE_URL, api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT):
+    """
+    Create an OpenAI client for ResponseGenerator
+
+    The client's own retries are disabled because ResponseGenerator retries
+    itself, so that retries and throttling can be counted.
+
+    Args:
+        base_url: OpenAI-compatible endpoint (None for api.openai.com)
+        api_key: API key
+        timeout: Seconds per request attempt
+
+    Returns:
+        OpenAI: The client, safe to share between generators and threads
+    """
+    return OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+
+
+@functools.lru_cache(maxsize=32)
+def build_system_prompt(age, autism_level, communication_capabilities):
+    """
+    Build the system prompt for a child profile
+
+    Built once per profile, so every request and session with the same
+    profile sends exactly the same string.
+
+    Returns:
+        str: The system prompt
+    """
+    return SYSTEM_PROMPT_TEMPLATE.format(age=age, autism_level=autism_level,
+                                         communication_capabilities=communication_capabilities)
+
+
+def format_expression(expression, scores=None):
+    """
+    Describe the conversation partner's expression for a prompt
+
+    Args:
+        expression: Most likely expression
+        scores: Optional dictionary of expression scores (0-1)
+
+    Returns:
+        str: e.g. "happiness" or "happiness (happiness 55%, surprise 30%)"
+             when other expressions are also likely
+    """
+    if not scores:
+        return expression
+    likely = sorted(((score, name) for name, score in scores.items()
+                     if score >= _MIN_EXPRESSION_SCORE), reverse=True)[:3]
+    if len(likely) < 2:
+        return expression
+    return f"{expression} ({', '.join(f'{name} {score:.0%}' for score, name in likely)})"
+
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retrying: the server's Retry-After, else exponential backoff"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get("retry-after")), _MAX_RETRY_DELAY)
+        except (TypeError, ValueError):
+            pass
+    delay = OPENAI_RETRY_DELAY * 2 ** attempt
+    # Jitter keeps many throttled sessions from retrying in lockstep
+    return min(delay * random.uniform(0.5, 1.0), _MAX_RETRY_DELAY)
 
 
 class ResponseGenerator:
     """Generates socially appropriate responses using GPT-4o-mini"""
 
-    def __init__(self, child_profile=None):
+    def __init__(self, child_profile=None, client=None, transcript_store=None, session_id=None):
         """
         Initialize the chatbot
 
         Args:
             child_profile: Dictionary containing child's information
                           (age, autism_level, communication_capabilities)
+            client: Optional OpenAI client to share between generators
+            transcript_store: Optional TranscriptStore to build prompt context from
+            session_id: Session whose transcript is read from the store
         """
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = client or create_client()
         self.model = MODEL_NAME
+        self.max_retries = OPENAI_MAX_RETRIES
+        self.transcript_store = transcript_store
+        self.session_id = session_id
+        # Earlier turns: a short request and the suggestion given (no system prompt)
         self.conversation_history = []
+        self.history_turns = PROMPT_HISTORY_TURNS
+        self.last_messages = []
+        # Ranked candidates of the last request; the chosen one is in the history
+        self.num_candidates = SUGGESTION_CANDIDATES
+        self.candidates = []
         self.child_profile = child_profile or {
             "age": "not specified",
             "autism_level": "not specified",
             "communication_capabilities": "not specified"
         }
 
+        # API usage counters (see get_stats)
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+            "candidates": 0,
+            "prompt_chars": 0,
+            "reused_prefix_chars": 0,
+            "api_seconds": 0.0
+        }
+
         print(f"✓ Response generator initialized with model: {self.model}")
 
     def set_child_profile(self, age, autism_level, communication_capabilities):
@@ -43,70 +270,250 @@ class ResponseGenerator:
             "communication_capabilities": communication_capabilities
         }
 
-    def generate_response(self, transcript, current_expression):
+    def get_context_transcript(self, recent=PROMPT_RECENT_TURNS, relevant=PROMPT_RELEVANT_TURNS):
+        """
+        Build the transcript for a prompt from the transcript store
+
+        The latest entries are always included. Older entries are added only
+        when they are relevant to the latest utterance, so prompts stay small
+        in long sessions without losing names or topics mentioned earlier.
+
+        Args:
+            recent: Number of latest entries to include
+            relevant: Number of relevant older entries to include
+
+        Returns:
+            str: Formatted transcript ("" if nothing was transcribed yet)
+        """
+        if self.transcript_store is None:
+            return ""
+        earlier, latest = self.transcript_store.context(self.session_id, recent=recent,
+                                                        relevant=relevant)
+        if not earlier:
+            return format_transcript(latest)
+        return (f"(Earlier, relevant)\n{format_transcript(earlier)}\n"
+                f"(Most recent)\n{format_transcript(latest)}")
+
+    def build_messages(self, transcript, current_expression, emotion_scores=None):
+        """
+        Build the messages of a suggestion request
+
+        Args:
+            transcript: String containing the conversation transcript (can be empty)
+            current_expression: Current facial expression of the conversation partner
+            emotion_scores: Optional dictionary of expression scores (0-1)
+
+        Returns:
+            list: System prompt, earlier turns and the new request
+        """
+        system_prompt = build_system_prompt(self.child_profile["age"],
+                                            self.child_profile["autism_level"],
+                                            self.child_profile["communication_capabilities"])
+        expression = format_expression(current_expression, emotion_scores)
+
+        # Everything that changes between requests goes in this last message
+        if transcript and transcript.strip():
+            user_message = f"Conversation so far:\n{transcript}\n\nThe other person's current expression is: {expression}\n\n{SUGGESTION_REQUEST}"
+        else:
+            # No transcript available, focus on expression
+            user_message = f"The person the child is talking to has a {expression} expression on their face. Suggest a brief, appropriate response or conversation starter for the child."
+
+        return [{"role": "system", "content": system_prompt},
+                *self.conversation_history,
+                {"role": "user", "content": user_message}]
+
+    def generate_response(self, transcript, current_expression, emotion_scores=None):
         """
         Generate an appropriate response based on conversation context and facial expression
 
         Args:
             transcript: String containing the conversation transcript (can be empty)
             current_expression: Current facial expression of the conversation partner
+            emotion_scores: Optional dictionary of expression scores (0-1), so
+                            the prompt can mention likely alternatives
 
         Returns:
-            str: Suggested response for the child
+            str: Suggested response for the child (the best ranked candidate)
         """
-        try:
-            # Create system prompt with child's profile
-            system_prompt = SYSTEM_PROMPT_TEMPLATE.format(
-                age=self.child_profile["age"],
-                autism_level=self.child_profile["autism_level"],
-                communication_capabilities=self.child_profile["communication_capabilities"],
-                expression=current_expression
-            )
+        return self.generate_candidates(transcript, current_expression, emotion_scores)[0]
 
-            # For first request, start new conversation
-            if not self.conversation_history:
-                self.conversation_history = [
-                    {"role": "system", "content": system_prompt}
-                ]
+    def generate_candidates(self, transcript, current_expression, emotion_scores=None):
+        """
+        Generate several suggestions with one request and rank them
 
-            # Add user message with transcript and expression
-            if transcript and transcript.strip():
-                user_message = f"Conversation so far:\n{transcript}\n\nThe other person's current expression is: {current_expression}\n\nSuggest a brief, appropriate response for the child."
-            else:
-                # No transcript available, focus on expression
-                user_message = f"The person the child is talking to has a {current_expression} expression on their face. Suggest a brief, appropriate response or conversation starter for the child."
+        The best candidate goes into the history; select_candidate()
+        replaces it if another one is chosen.
 
-            self.conversation_history.append({
-                "role": "user",
-                "content": user_message
-            })
+        Args:
+            transcript: String containing the conversation transcript (can be empty)
+            current_expression: Current facial expression of the conversation partner
+            emotion_scores: Optional dictionary of expression scores (0-1)
 
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
+        Returns:
+            list: Suggested responses, best first (just FALLBACK_RESPONSE on errors)
+        """
+        try:
+            messages = self.build_messages(transcript, current_expression, emotion_scores)
+            self._measure_prefix(messages)
+
+            # One request for all candidates: the prompt is only sent and billed once
+            response = self._create_completion(
                 model=self.model,
-                messages=self.conversation_history,
+                messages=messages,
                 max_tokens=50,
-                temperature=0.7
+                temperature=0.7,
+                n=self.num_candidates
             )
 
-            # Extract the response
-            suggested_response = response.choices[0].message.content.strip()
-
-            # Add assistant's response to history
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": suggested_response
-            })
+            # Endpoints that ignore n return a single choice
+            candidates = rank_candidates([choice.message.content for choice in response.choices],
+                                         current_expression)
+            if not candidates:
+                raise ValueError("No suggestion in the response")
+            self._count(candidates=len(candidates))
 
-            return suggested_response
+            self.candidates = candidates
+            self._add_to_history(candidates[0])
+            return candidates
 
         except Exception as e:
             print(f"✗ Error generating response: {e}")
-            return "I'm not sure what to say right now."
+            self.candidates = []
+            return [FALLBACK_RESPONSE]
+
+    def select_candidate(self, index):
+        """
+        Choose another candidate of the last request
+
+        The chosen candidate replaces the one in the history, so the next
+        request builds on what the child was actually shown.
+
+        Args:
+            index: Position in the ranked candidates
+
+        Returns:
+            str: The chosen candidate, or None if there is no such candidate
+        """
+        if not 0 <= index < len(self.candidates):
+            return None
+        candidate = self.candidates[index]
+        if self.conversation_history and self.conversation_history[-1]["role"] == "assistant":
+            self.conversation_history[-1] = {"role": "assistant", "content": candidate}
+        return candidate
+
+    def _add_to_history(self, suggestion):
+        """Append a turn to the history, trimming it when it gets too long"""
+        self.conversation_history.append({"role": "user", "content": SUGGESTION_REQUEST})
+        self.conversation_history.append({"role": "assistant", "content": suggestion})
+
+        if len(self.conversation_history) > 2 * self.history_turns:
+            # Drop the older half at once, so the cached prefix breaks only
+            # every few requests instead of on every one
+            keep = 2 * (self.history_turns // 2)
+            del self.conversation_history[:len(self.conversation_history) - keep]
+
+    def limit_history(self, turns):
+        """
+        Change how many earlier suggestions are kept in the prompt
+
+        Like the rest of the history handling this is not thread-safe: call
+        it from the thread that requests suggestions.
+
+        Args:
+            turns: Turns to keep (None restores PROMPT_HISTORY_TURNS)
+        """
+        self.history_turns = turns or PROMPT_HISTORY_TURNS
+        history = self.conversation_history
+        if len(history) > 2 * self.history_turns:
+            del history[:len(history) - 2 * self.history_turns]
+        # Cut whole turns only, so the history still starts with a request
+        while history and history[0]["role"] != "user":
+            del history[0]
+
+    def _measure_prefix(self, messages):
+        """Count the prompt characters, and those the previous request also started with"""
+        reused = 0
+        for index, message in enumerate(messages):
+            if index < len(self.last_messages) and message == self.last_messages[index]:
+                reused += len(message["content"])
+            elif index == 0 and message["content"] in _sent_system_prompts:
+                reused += len(message["content"])
+            else:
+                break
+        _sent_system_prompts.add(messages[0]["content"])
+        self.last_messages = messages
+        self._count(prompt_chars=sum(len(message["content"]) for message in messages),
+                    reused_prefix_chars=reused)
+
+    def _create_completion(self, **request):
+        """
+        Call the chat completions API, retrying throttled and failed attempts
+
+        Raises:
+            openai.OpenAIError: If the last attempt failed
+        """
+        self._count(requests=1)
+        started = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                self._count(attempts=1)
+                try:
+                    response = self.client.chat.completions.create(**request)
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if isinstance(e, RateLimitError):
+                        self._count(throttled=1)
+                    if attempt >= self.max_retries:
+                        self._count(failures=1)
+                        raise
+                    time.sleep(_retry_delay(e, attempt))
+                    attempt += 1
+                    self._count(retries=1)
+                except Exception:
+                    self._count(failures=1)
+                    raise
+        finally:
+            self._count(api_seconds=time.perf_counter() - started)
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            self._count(prompt_tokens=usage.prompt_tokens or 0,
+                        cached_tokens=getattr(details, "cached_tokens", None) or 0,
+                        completion_tokens=usage.completion_tokens or 0)
+        return response
+
+    def _count(self, **increments):
+        with self.stats_lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+
+    def get_stats(self):
+        """
+        Get API usage counters
+
+        Returns:
+            dict: Requests, attempts, retries, throttled (HTTP 429) attempts,
+                  failed requests, token counts (cached_tokens as reported by
+                  the provider), candidates received, prompt characters and
+                  seconds spent in the API,
+                  plus prefix_reuse_ratio (share of prompt characters the
+                  previous request started with) and cached_token_ratio
+        """
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["prefix_reuse_ratio"] = (stats["reused_prefix_chars"] / stats["prompt_chars"]
+                                       if stats["prompt_chars"] else 0.0)
+        stats["cached_token_ratio"] = (stats["cached_tokens"] / stats["prompt_tokens"]
+                                       if stats["prompt_tokens"] else 0.0)
+        return stats
 
     def reset_conversation(self):
         """Reset the conversation history"""
         self.conversation_history = []
+        self.last_messages = []
+        self.candidates = []
         print("Conversation history cleared")
 
     def get_conversation_length(self):
@@ -0,0 +1,287 @@
+"""
+Emotion Model Module
+Loads FER's emotion classifier with cached knowledge about the model
+
+FER's TFLite emotion model is loaded in place with the lightest TFLite
+runtime installed (ai_edge_litert or tflite_runtime before TensorFlow),
+so neither FER nor Keras is imported. The first launch probes whether the
+model supports batched inference and times a warm-up run per batch size,
+and records both, with the model's checksum and input shape, in
+metadata.json. The model itself is not copied or converted: what the
+cache saves is the probing.
+
+The metadata is probed again whenever the FER version or the cache format
+changes, or FER's model no longer matches the checksum.
+"""
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from modules.resources import get_thread_budget
+from config.settings import MODEL_CACHE_DIR, INFERENCE_MAX_BATCH
+
+# FER's classifier output order
+FER_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+INPUT_SIZE = (64, 64)
+
+CACHE_VERSION = 3
+EMOTION_CACHE_DIR = os.path.join(MODEL_CACHE_DIR, "emotion")
+METADATA_FILE = "metadata.json"
+SOURCE_MODEL = os.path.join("data", "emotion_model_quantized.tflite")
+
+# Interpreters are sized to these batch sizes; larger batches are split
+BATCH_SIZES = tuple(size for size in (1, 2, 4, 8, 16, 32) if size <= max(1, INFERENCE_MAX_BATCH)) or (1,)
+
+# Largest difference between batched and single-face scores accepted by the probe
+_BATCH_TOLERANCE = 1e-3
+
+# Cached model bytes shared by every classifier in the process
+_content_lock = threading.Lock()
+_content = None
+
+
+def load_interpreter_class():
+    """
+    Find the lightest installed TFLite runtime
+
+    Returns:
+        tuple: (Interpreter class, runtime name)
+
+    Raises:
+        ImportError: If no TFLite runtime is installed
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter, "ai_edge_litert"
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter, "tflite_runtime"
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter, "tensorflow"
+
+
+def fer_model_path():
+    """Path of the TFLite model shipped with FER, found without importing FER"""
+    spec = importlib.util.find_spec("fer")
+    if spec is None or not spec.submodule_search_locations:
+        raise FileNotFoundError("FER is not installed")
+    path = os.path.join(list(spec.submodule_search_locations)[0], SOURCE_MODEL)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"FER does not ship a TFLite emotion model ({path})")
+    return path
+
+
+def _fer_version():
+    return importlib.metadata.version("fer")
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class EmotionClassifier:
+    """Batched TFLite inference for FER's emotion model"""
+
+    def __init__(self, model_content, interpreter_class, batching=True, num_threads=None):
+        """
+        Initialize the classifier
+
+        Interpreters are created lazily, one per batch size, so a classifier
+        must only be used from one thread at a time.
+
+        Args:
+            model_content: TFLite model bytes
+            interpreter_class: Interpreter class from load_interpreter_class()
+            batching: Whether the model accepts batches larger than one
+            num_threads: Threads per inference (defaults to the thread budget's
+                         inference threads)
+        """
+        self.model_content = model_content
+        self.interpreter_class = interpreter_class
+        self.num_threads = num_threads or get_thread_budget().inference_threads
+        self.batch_sizes = BATCH_SIZES if batching else (1,)
+        self.interpreters = {}
+
+    def _interpreter(self, batch_size):
+        """Get an interpreter whose input is sized for batch_size faces"""
+        entry = self.interpreters.get(batch_size)
+        if entry is None:
+            interpreter = self.interpreter_class(model_content=self.model_content,
+                                                 num_threads=self.num_threads)
+            input_details = interpreter.get_input_details()[0]
+            if batch_size != input_details["shape"][0]:
+                interpreter.resize_tensor_input(input_details["index"],
+                                                [batch_size, *INPUT_SIZE, 1], strict=False)
+            interpreter.allocate_tensors()
+            entry = (interpreter, interpreter.get_input_details()[0],
+                     interpreter.get_output_details()[0])
+            self.interpreters[batch_size] = entry
+        return entry
+
+    def _run(self, faces):
+        """Run one batch that fits an interpreter size exactly"""
+        interpreter, input_details, output_details = self._interpreter(len(faces))
+        tensor = faces[..., np.newaxis]
+        scale, zero_point = input_details.get("quantization", (0.0, 0))
+        if input_details["dtype"] != np.float32 and scale:
+            tensor = np.round(tensor / scale + zero_point)
+        interpreter.set_tensor(input_details["index"], tensor.astype(input_details["dtype"]))
+        interpreter.invoke()
+        output = interpreter.get_tensor(output_details["index"])
+        scale, zero_point = output_details.get("quantization", (0.0, 0))
+        if output_details["dtype"] != np.float32 and scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return np.asarray(output, dtype=np.float32)
+
+    def classify(self, faces):
+        """
+        Classify prepared faces
+
+        Args:
+            faces: float32 array of shape (n, 64, 64) scaled to [-1, 1]
+
+        Returns:
+            numpy.ndarray: Scores of shape (n, 7) ordered as FER_LABELS
+        """
+        faces = np.asarray(faces, dtype=np.float32)
+        scores = []
+        start = 0
+        largest = self.batch_sizes[-1]
+        while start < len(faces):
+            chunk = faces[start:start + largest]
+            # Pad to the next interpreter size; the padding rows are discarded
+            size = next(size for size in self.batch_sizes if size >= len(chunk))
+            if size > len(chunk):
+                padding = np.zeros((size - len(chunk), *INPUT_SIZE), dtype=np.float32)
+                scores.append(self._run(np.concatenate([chunk, padding]))[:len(chunk)])
+            else:
+                scores.append(self._run(chunk))
+            start += len(chunk)
+        if not scores:
+            return np.empty((0, len(FER_LABELS)), dtype=np.float32)
+        return np.concatenate(scores)
+
+    def warm_up(self):
+        """
+        Create and run every interpreter once
+
+        Returns:
+            dict: Milliseconds of the first run per batch size
+        """
+        timings = {}
+        for size in self.batch_sizes:
+            started = time.perf_counter()
+            self._run(np.zeros((size, *INPUT_SIZE), dtype=np.float32))
+            timings[str(size)] = 1000 * (time.perf_counter() - started)
+        return timings
+
+
+def _supports_batching(content, interpreter_class):
+    """Check that batched results match single-face results"""
+    rng = np.random.default_rng(0)
+    faces = rng.uniform(-1, 1, size=(max(BATCH_SIZES), *INPUT_SIZE)).astype(np.float32)
+    try:
+        batched = EmotionClassifier(content, interpreter_class, batching=True).classify(faces)
+    except Exception:
+        return False
+    single = EmotionClassifier(content, interpreter_class, batching=False).classify(faces)
+    return bool(np.allclose(batched, single, atol=_BATCH_TOLERANCE))
+
+
+def build_cache(content, cache_dir=EMOTION_CACHE_DIR):
+    """
+    Probe FER's model and record the results in the cache
+
+    Args:
+        content: Bytes of FER's TFLite model
+
+    Returns:
+        dict: The metadata written to metadata.json
+    """
+    interpreter_class, runtime = load_interpreter_class()
+    batching = _supports_batching(content, interpreter_class)
+    classifier = EmotionClassifier(content, interpreter_class, batching)
+    warm_up = classifier.warm_up()
+    input_details = classifier._interpreter(1)[1]
+
+    metadata = {
+        "cache_version": CACHE_VERSION,
+        "fer_version": _fer_version(),
+        "sha256": _sha256(content),
+        "input_shape": [int(size) for size in input_details["shape"][1:]],
+        "input_dtype": np.dtype(input_details["dtype"]).name,
+        "runtime": runtime,
+        "batching": batching,
+        "batch_sizes": list(classifier.batch_sizes),
+        "warm_up_ms": warm_up,
+        "created": time.time()
+    }
+
+    # Write-then-rename so concurrent launches never see a partial file
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, METADATA_FILE)
+    temporary = f"{path}.{os.getpid()}"
+    with open(temporary, "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(temporary, path)
+    return metadata
+
+
+def _load_metadata(cache_dir, content):
+    """Read the cached metadata if it describes this model, else None"""
+    try:
+        with open(os.path.join(cache_dir, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        if (metadata.get("cache_version") != CACHE_VERSION
+                or metadata.get("fer_version") != _fer_version()
+                or metadata.get("sha256") != _sha256(content)):
+            return None
+        return metadata
+    except (OSError, ValueError, importlib.metadata.PackageNotFoundError):
+        return None
+
+
+def load_emotion_classifier(cache_dir=EMOTION_CACHE_DIR):
+    """
+    Create an emotion classifier for FER's model, probing it if the cache is stale
+
+    Each call returns a new classifier with its own interpreters; the
+    model is read and checked against the cache once per process.
+
+    Returns:
+        EmotionClassifier: Warmed-up classifier
+
+    Raises:
+        FileNotFoundError: If FER or its TFLite model is not installed
+        ImportError: If no TFLite runtime is installed
+    """
+    global _content
+    interpreter_class, _ = load_interpreter_class()
+
+    with _content_lock:
+        if _content is None:
+            started = time.perf_counter()
+            with open(fer_model_path(), "rb") as f:
+                content = f.read()
+            metadata = _load_metadata(cache_dir, content)
+            if metadata is None:
+                metadata = build_cache(content, cache_dir)
+                print(f"✓ Emotion model cache built in {time.perf_counter() - started:.2f}s "
+                      f"({metadata['runtime']}, batching {'on' if metadata['batching'] else 'off'})")
+            _content = (content, metadata)
+        content, metadata = _content
+
+    classifier = EmotionClassifier(content, interpreter_class, metadata["batching"])
+    # Allocate the single-face interpreter now so the first frame is not slow
+    classifier.classify(np.zeros((1, *INPUT_SIZE), dtype=np.float32))
+    return classifier
@@ -0,0 +1,281 @@
+"""
+Event Bus Module
+Typed publish/subscribe events and timers that drive the processing pipeline
+"""
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+from modules.resources import track_cpu
+
+# Event types published by the pipeline stages
+FRAME_CAPTURED = "frame_captured"
+EMOTION_DETECTED = "emotion_detected"
+TRANSCRIPT_ENTRY = "transcript_entry"
+SUGGESTION_REQUESTED = "suggestion_requested"
+SUGGESTION_READY = "suggestion_ready"
+SUGGESTION_SELECTED = "suggestion_selected"
+STREAM_ENDED = "stream_ended"
+MEMORY_STATUS = "memory_status"
+
+EVENT_TYPES = (
+    FRAME_CAPTURED,
+    EMOTION_DETECTED,
+    TRANSCRIPT_ENTRY,
+    SUGGESTION_REQUESTED,
+    SUGGESTION_READY,
+    SUGGESTION_SELECTED,
+    STREAM_ENDED,
+    MEMORY_STATUS,
+)
+
+# Sentinel used to stop a lane's worker thread
+_STOP = object()
+
+
+class Event:
+    """A single event published on the bus"""
+
+    __slots__ = ("type", "data", "timestamp")
+
+    def __init__(self, event_type, data=None):
+        """
+        Create an event
+
+        Args:
+            event_type: One of EVENT_TYPES
+            data: Dictionary with the event payload
+        """
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event_type}")
+        self.type = event_type
+        self.data = data or {}
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        return f"Event({self.type!r}, {self.data!r})"
+
+
+class Timer:
+    """Handle for a timer scheduled on the bus"""
+
+    def __init__(self, callback, interval, repeat):
+        self.callback = callback
+        self.interval = interval
+        self.repeat = repeat
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancel the timer; it will not fire again"""
+        self.cancelled = True
+
+
+class _Lane:
+    """A worker thread that delivers events and fires timers in order"""
+
+    def __init__(self, name):
+        self.name = name
+        self.queue = queue.Queue()
+        self.timers = []  # heap of (deadline, sequence, Timer)
+        self.sequence = itertools.count()
+        self.thread = threading.Thread(target=self._run, name=f"bus-{name}", daemon=True)
+
+    def _run(self):
+        """Block until the next event or timer deadline, then handle it"""
+        track_cpu(self.name)
+        while True:
+            timeout = None
+            if self.timers:
+                timeout = max(0.0, self.timers[0][0] - time.monotonic())
+
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                break
+
+            if item is not None:
+                kind, payload = item
+                if kind == "event":
+                    callback, event = payload
+                    self._invoke(callback, event)
+                else:
+                    delay, timer = payload
+                    self._push_timer(time.monotonic() + delay, timer)
+
+            self._fire_due_timers()
+
+    def _push_timer(self, deadline, timer):
+        heapq.heappush(self.timers, (deadline, next(self.sequence), timer))
+
+    def _fire_due_timers(self):
+        now = time.monotonic()
+        while self.timers and self.timers[0][0] <= now:
+            deadline, _, timer = heapq.heappop(self.timers)
+            if timer.cancelled:
+                continue
+            self._invoke(timer.callback)
+            if timer.repeat and not timer.cancelled:
+                # Schedule from the previous deadline so the cadence does not drift
+                self._push_timer(max(deadline + timer.interval, time.monotonic()), timer)
+            now = time.monotonic()
+
+    def _invoke(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"✗ Error in '{self.name}' pipeline stage: {e}")
+        track_cpu(self.name)
+
+
+class EventBus:
+    """
+    Routes events between pipeline stages
+
+    Each subscriber and timer runs on a named lane. A lane is a single
+    thread, so handlers on the same lane never run concurrently, while a
+    slow stage (e.g. suggestion generation) can be given its own lane so
+    it does not delay the others. Lanes sleep until there is work to do.
+    """
+
+    def __init__(self):
+        """Initialize an empty bus"""
+        self.lanes = {}
+        self.subscribers = {event_type: [] for event_type in EVENT_TYPES}
+        self.lock = threading.Lock()
+        self.is_running = False
+
+    def _get_lane(self, name):
+        """Get a lane by name, creating (and starting) it if needed"""
+        lane = self.lanes.get(name)
+        if lane is None:
+            lane = _Lane(name)
+            self.lanes[name] = lane
+            if self.is_running:
+                lane.thread.start()
+        return lane
+
+    def start(self):
+        """Start delivering events"""
+        with self.lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            for lane in self.lanes.values():
+                lane.thread.start()
+
+    def subscribe(self, event_type, callback, lane="default"):
+        """
+        Subscribe to an event type
+
+        Args:
+            event_type: One of EVENT_TYPES
+            callback: Function called with the Event
+            lane: Name of the lane the callback runs on
+        """
+        if event_type not in self.subscribers:
+            raise ValueError(f"Unknown event type: {event_type}")
+        with self.lock:
+            self.subscribers[event_type].append((callback, self._get_lane(lane)))
+
+    def unsubscribe(self, event_type, callback):
+        """Remove a subscription added with subscribe()"""
+        with self.lock:
+            self.subscribers[event_type] = [
+                (cb, lane) for cb, lane in self.subscribers[event_type] if cb != callback
+            ]
+
+    def publish(self, event_type, **data):
+        """
+        Publish an event to all subscribers
+
+        Args:
+            event_type: One of EVENT_TYPES
+            **data: Event payload
+
+        Returns:
+            Event: The published event
+        """
+        event = Event(event_type, data)
+        with self.lock:
+            if not self.is_running:
+                return event
+            subscribers = list(self.subscribers[event_type])
+        for callback, lane in subscribers:
+            lane.queue.put(("event", (callback, event)))
+        return event
+
+    def call_every(self, interval, callback, lane="default", delay=None):
+        """
+        Run a callback periodically on a lane
+
+        Args:
+            interval: Seconds between calls
+            callback: Function called with no arguments
+            lane: Name of the lane the callback runs on
+            delay: Seconds before the first call (defaults to interval)
+
+        Returns:
+            Timer: Handle that can be cancelled
+        """
+        timer = Timer(callback, interval, repeat=True)
+        self._schedule(timer, interval if delay is None else delay, lane)
+        return timer
+
+    def call_later(self, delay, callback, lane="default"):
+        """
+        Run a callback once after a delay
+
+        Returns:
+            Timer: Handle that can be cancelled
+        """
+        timer = Timer(callback, delay, repeat=False)
+        self._schedule(timer, delay, lane)
+        return timer
+
+    def _schedule(self, timer, delay, lane_name):
+        with self.lock:
+            lane = self._get_lane(lane_name)
+        lane.queue.put(("timer", (delay, timer)))
+
+    def stop(self, timeout=2.0, drain=False):
+        """
+        Stop all lanes and wait for them to finish
+
+        A handler that is running is always allowed to finish.
+
+        Args:
+            timeout: Total seconds to wait for the lanes
+            drain: Deliver events that are already queued instead of dropping them
+
+        Returns:
+            bool: True if every lane shut down within the timeout
+        """
+        with self.lock:
+            if not self.is_running:
+                return True
+            self.is_running = False
+            lanes = list(self.lanes.values())
+            self.subscribers = {event_type: [] for event_type in EVENT_TYPES}
+
+        for lane in lanes:
+            # Unless draining, drop pending work so shutdown does not wait on a backlog
+            while not drain:
+                try:
+                    lane.queue.get_nowait()
+                except queue.Empty:
+                    break
+            lane.queue.put(_STOP)
+
+        clean = True
+        deadline = time.monotonic() + timeout
+        for lane in lanes:
+            lane.thread.join(timeout=max(0.0, deadline - time.monotonic()))
+            if lane.thread.is_alive():
+                print(f"⚠️  Pipeline stage '{lane.name}' still busy at shutdown")
+                clean = False
+        return clean
@@ -1,25 +1,548 @@
 """
 Facial Expression Recognition Component (FERC)
-Uses FER (Facial Expression Recognition) library to detect emotions from video frames
+Uses FER (Facial Expression Recognition) library's model to detect emotions from video frames
+
+Faces are found by a pluggable detector: FER's Haar cascade, or OpenCV's
+DNN SSD face detector, which also finds angled faces and whose cost does
+not grow with the frame size. With FACE_DETECTOR=auto both are timed once
+on this machine and the most accurate one within the latency budget is
+kept (the choice is cached in MODEL_CACHE_DIR).
+
+FER's emotion model is loaded by modules.emotion_model, so constructing a
+recognizer does not import FER, Keras or (with a standalone TFLite
+runtime) TensorFlow.
 """
+import hashlib
+import json
+import os
+import platform
+import statistics
+import threading
+import time
+import urllib.request
+
 import cv2
-from fer.fer import FER
-from config.settings import EMOTICON_MAP
+import numpy as np
+from modules.emotion_model import FER_LABELS, load_emotion_classifier
+from config.settings import (
+    EMOTICON_MAP, MIN_FACE_SIZE, EMOTIONS, FACE_DETECTOR, FACE_DETECTOR_BUDGET_MS,
+    FACE_DNN_INPUT_SIZE, FACE_DNN_CONFIDENCE, MODEL_CACHE_DIR, DETECTION_WIDTH
+)
+
+# Map FER emotion names to our standard names
+FER_EMOTION_MAP = {
+    'happy': 'happiness',
+    'sad': 'sadness',
+    'angry': 'anger',
+    'surprise': 'surprise',
+    'fear': 'fear',
+    'disgust': 'disgust',
+    'neutral': 'neutral'
+}
+
+# Our standard names in the order of FER's classifier outputs
+CLASSIFIER_EMOTIONS = [FER_EMOTION_MAP[name] for name in FER_LABELS]
+
+# FER's face crop preprocessing: border added to the frame, margin around
+# the box and classifier input size
+PADDING = 40
+FACE_OFFSETS = (10, 10)
+FACE_INPUT_SIZE = (64, 64)
+
+
+# OpenCV's ResNet-10 SSD face detector (fp16 weights, about 5 MB)
+DNN_MODEL_DIR = os.path.join(MODEL_CACHE_DIR, "face_detector")
+DNN_CONFIG_FILE = "deploy.prototxt"
+DNN_WEIGHTS_FILE = "res10_300x300_ssd_iter_140000_fp16.caffemodel"
+DNN_MODEL_URLS = {
+    DNN_CONFIG_FILE: "https://raw.githubusercontent.com/opencv/opencv/4.x/samples/dnn/face_detector/deploy.prototxt",
+    DNN_WEIGHTS_FILE: "https://raw.githubusercontent.com/opencv/opencv_3rdparty/"
+                      "dnn_samples_face_detector_20180205_fp16/res10_300x300_ssd_iter_140000_fp16.caffemodel"
+}
+# SHA-1 published with OpenCV's face detector sample (None: not checked)
+DNN_MODEL_SHA1 = {
+    DNN_CONFIG_FILE: None,
+    DNN_WEIGHTS_FILE: os.getenv("FACE_DNN_WEIGHTS_SHA1", "31fc22bfdd907567a04bb45b7cfad29966caddc1")
+}
+# Mean pixel the SSD was trained with (BGR)
+DNN_MEAN = (104.0, 177.0, 123.0)
+# The SSD was trained on colour images but is given the grayscale detection
+# image replicated to three channels, so detection needs no second, colour
+# copy of every frame (and the low-memory profile keeps none). The network
+# still finds faces, with somewhat lower confidence on some of them; the
+# calibration result records this input so it is re-run if it ever changes.
+DNN_INPUT = "grayscale"
+
+CALIBRATION_FILE = os.path.join(MODEL_CACHE_DIR, "face_detector_calibration.json")
+# Candidates from most to least accurate: (detector name, DNN input size)
+CALIBRATION_CANDIDATES = [("dnn", FACE_DNN_INPUT_SIZE), ("dnn", 224), ("dnn", 160), ("haar", None)]
+CALIBRATION_RUNS = 15
+
+
+class HaarFaceDetector:
+    """FER's Haar cascade face detector (frontal faces only)"""
+
+    name = "haar"
+
+    def __init__(self, min_face_size=MIN_FACE_SIZE, scale_factor=1.1, min_neighbors=5,
+                 cascade_file=None):
+        """
+        Load the cascade
+
+        Args:
+            min_face_size: Smallest face in pixels
+            scale_factor: Image pyramid step (FER's default)
+            min_neighbors: Overlapping detections needed to accept a face
+            cascade_file: Cascade XML (defaults to OpenCV's frontal face cascade)
+        """
+        self.cascade = cv2.CascadeClassifier(
+            cascade_file or cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+        self.min_face_size = min_face_size
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detect(self, gray):
+        """
+        Detect face bounding boxes
+
+        Args:
+            gray: Grayscale frame
+
+        Returns:
+            list: Face boxes as (x, y, w, h)
+        """
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            flags=cv2.CASCADE_SCALE_IMAGE, minSize=(self.min_face_size, self.min_face_size)
+        )
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class DnnFaceDetector:
+    """OpenCV DNN SSD face detector on the CPU backend"""
+
+    name = "dnn"
+
+    def __init__(self, model_dir=DNN_MODEL_DIR, input_size=FACE_DNN_INPUT_SIZE,
+                 confidence=FACE_DNN_CONFIDENCE, min_face_size=MIN_FACE_SIZE):
+        """
+        Load the network
+
+        Args:
+            model_dir: Directory with the prototxt and caffemodel files
+            input_size: Square network input size (300 is the trained size)
+            confidence: Minimum detection confidence
+            min_face_size: Smallest face in pixels
+
+        Raises:
+            FileNotFoundError: If the model files are missing (see download_dnn_model)
+        """
+        config = os.path.join(model_dir, DNN_CONFIG_FILE)
+        weights = os.path.join(model_dir, DNN_WEIGHTS_FILE)
+        for path in (config, weights):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"DNN face detector model missing: {path} "
+                                        f"(run python3 main.py --download-models)")
+
+        self.net = cv2.dnn.readNetFromCaffe(config, weights)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.confidence = confidence
+        self.min_face_size = min_face_size
+
+    def detect(self, gray):
+        """
+        Detect face bounding boxes, most confident first
+
+        Args:
+            gray: Grayscale frame (replicated to the three channels the SSD
+                  expects; see DNN_INPUT)
+
+        Returns:
+            list: Face boxes as (x, y, w, h)
+        """
+        height, width = gray.shape[:2]
+        image = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR) if gray.ndim == 2 else gray
+        blob = cv2.dnn.blobFromImage(image, 1.0, (self.input_size, self.input_size), DNN_MEAN)
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+
+        faces = []
+        for detection in detections[detections[:, 2] >= self.confidence]:
+            x1, y1, x2, y2 = (detection[3:7] * (width, height, width, height)).astype(int)
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2), min(height, y2)
+            if x2 - x1 >= self.min_face_size and y2 - y1 >= self.min_face_size:
+                faces.append((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+        return faces
+
+
+def _sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dnn_model_available(model_dir=DNN_MODEL_DIR):
+    """Whether the DNN face detector files are present (they are never fetched at runtime)"""
+    return all(os.path.exists(os.path.join(model_dir, name)) for name in DNN_MODEL_URLS)
+
+
+def download_dnn_model(model_dir=DNN_MODEL_DIR):
+    """
+    Download the DNN face detector files, verifying their checksums
+
+    Only run by python3 main.py --download-models; sessions never download.
+
+    Args:
+        model_dir: Directory to store the files in
+
+    Returns:
+        bool: True if both files are present and valid
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    for name, url in DNN_MODEL_URLS.items():
+        path = os.path.join(model_dir, name)
+        expected = DNN_MODEL_SHA1[name]
+        if os.path.exists(path) and (expected is None or _sha1(path) == expected):
+            continue
+        try:
+            print(f"Downloading {url}...")
+            urllib.request.urlretrieve(url, path + ".part")
+        except OSError as e:
+            print(f"✗ Could not download {name}: {e}")
+            return False
+        if expected is not None and _sha1(path + ".part") != expected:
+            os.remove(path + ".part")
+            print(f"✗ Checksum mismatch for {name}")
+            return False
+        os.replace(path + ".part", path)
+    print(f"✓ DNN face detector model in {model_dir}")
+    return True
+
+
+def create_face_detector(name, input_size=FACE_DNN_INPUT_SIZE):
+    """
+    Build a face detector by name
+
+    Args:
+        name: "haar" or "dnn"
+        input_size: DNN input size
+
+    Raises:
+        ValueError: For an unknown detector name
+        FileNotFoundError: If the DNN model files are missing
+    """
+    if name == "haar":
+        return HaarFaceDetector()
+    if name == "dnn":
+        return DnnFaceDetector(input_size=input_size)
+    raise ValueError(f"Unknown face detector: {name}")
+
+
+def _calibration_key():
+    """Identifies the machine and settings a calibration result is valid for"""
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "detection_width": DETECTION_WIDTH,
+        "budget_ms": FACE_DETECTOR_BUDGET_MS,
+        "dnn_available": dnn_model_available(),
+        "dnn_input": DNN_INPUT
+    }
+
+
+def _calibration_frame():
+    """Synthetic grayscale frame at the detection size"""
+    height = DETECTION_WIDTH * 3 // 4
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(height, DETECTION_WIDTH), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (0, 0), 2)
+    cv2.ellipse(frame, (DETECTION_WIDTH // 2, height // 2), (height // 5, height // 4),
+                0, 0, 360, 170, -1)
+    return frame
+
+
+def calibrate_face_detector(budget_ms=FACE_DETECTOR_BUDGET_MS):
+    """
+    Time every available detector and pick one
+
+    Returns:
+        dict: Chosen "detector" and "input_size", the median latency of every
+              candidate and the image format the DNN candidates were given
+              ("dnn_input", see DNN_INPUT)
+    """
+    frame = _calibration_frame()
+    timings = {}
+    choice = None
+    for name, input_size in CALIBRATION_CANDIDATES:
+        try:
+            detector = create_face_detector(name, input_size)
+        except FileNotFoundError:
+            continue
+        detector.detect(frame)  # Warm up
+        times = []
+        for _ in range(CALIBRATION_RUNS):
+            started = time.perf_counter()
+            detector.detect(frame)
+            times.append(time.perf_counter() - started)
+        latency = 1000 * statistics.median(times)
+        timings[name if input_size is None else f"{name}@{input_size}"] = latency
+        if choice is None and latency <= budget_ms:
+            choice = (name, input_size)
+
+    if choice is None:
+        # Nothing meets the budget: take the fastest
+        fastest = min(timings, key=timings.get)
+        name, _, size = fastest.partition("@")
+        choice = (name, int(size) if size else None)
+
+    return {"detector": choice[0], "input_size": choice[1], "latency_ms": timings,
+            "dnn_input": DNN_INPUT}
+
+
+_selection_lock = threading.Lock()
+_selection = None
+
+
+def select_face_detector():
+    """
+    Build the configured face detector
+
+    With FACE_DETECTOR=auto the detector is chosen by calibrate_face_detector()
+    the first time and the result is cached on disk; the calibration is
+    repeated when the machine, OpenCV version or settings change.
+
+    Returns:
+        HaarFaceDetector or DnnFaceDetector
+    """
+    global _selection
+    if FACE_DETECTOR != "auto":
+        try:
+            return create_face_detector(FACE_DETECTOR)
+        except FileNotFoundError as e:
+            print(f"⚠️  {e}; using the Haar cascade")
+            return HaarFaceDetector()
+
+    with _selection_lock:
+        if _selection is None:
+            key = _calibration_key()
+            try:
+                with open(CALIBRATION_FILE) as f:
+                    cached = json.load(f)
+                if cached.get("key") == key:
+                    _selection = cached
+            except (OSError, ValueError):
+                pass
+
+            if _selection is None:
+                _selection = dict(calibrate_face_detector(), key=key)
+                timings = ", ".join(f"{name} {ms:.1f} ms" for name, ms in _selection["latency_ms"].items())
+                print(f"✓ Face detector calibrated: {timings}")
+                try:
+                    # Write-then-rename: worker processes may calibrate at the same time
+                    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+                    temporary = f"{CALIBRATION_FILE}.{os.getpid()}"
+                    with open(temporary, "w") as f:
+                        json.dump(_selection, f, indent=2)
+                    os.replace(temporary, CALIBRATION_FILE)
+                except OSError as e:
+                    print(f"⚠️  Could not save face detector calibration: {e}")
+
+            if not key["dnn_available"]:
+                print(f"⚠️  DNN face detector unavailable: model files missing in {DNN_MODEL_DIR} "
+                      f"(run python3 main.py --download-models); using the Haar cascade")
+
+    try:
+        return create_face_detector(_selection["detector"], _selection["input_size"])
+    except FileNotFoundError as e:
+        # The files were removed after this process calibrated
+        print(f"⚠️  {e}; using the Haar cascade")
+        return HaarFaceDetector()
+
+
+def _pad(gray):
+    """Add FER's border, filled with the mean of the bottom rows"""
+    mean = cv2.mean(gray[-2:])[0]
+    return cv2.copyMakeBorder(gray, PADDING, PADDING, PADDING, PADDING,
+                              cv2.BORDER_CONSTANT, value=[mean, mean, mean])
+
+
+def _tosquare(box):
+    """Grow the shorter side of a box so it becomes square (as FER does)"""
+    x, y, w, h = box
+    if h > w:
+        x -= (h - w) // 2
+        w = h
+    elif w > h:
+        y -= (w - h) // 2
+        h = w
+    return x, y, w, h
+
+
+class _FerClassifier:
+    """FER's own classifier, used when the model cache cannot be built"""
+
+    def __init__(self):
+        from fer import FER
+        self.fer = FER(mtcnn=False, min_face_size=MIN_FACE_SIZE)
+
+    def classify(self, faces):
+        """
+        Classify prepared faces through FER's public detect_emotions()
+
+        The faces are laid side by side in one image, each with a box that
+        FER's crop offsets widen back to exactly that face, so FER's crop
+        and resize leave them unchanged. FER rounds its scores to two
+        decimals.
+        """
+        faces = np.asarray(faces, dtype=np.float32)
+        if not len(faces):
+            return np.empty((0, len(FER_LABELS)), dtype=np.float32)
+        size = FACE_INPUT_SIZE[0]
+        strip = np.round((np.hstack(list(faces)) + 1.0) * 127.5).clip(0, 255).astype(np.uint8)
+        boxes = [(index * size + FACE_OFFSETS[0], FACE_OFFSETS[1],
+                  size - 2 * FACE_OFFSETS[0], size - 2 * FACE_OFFSETS[1])
+                 for index in range(len(faces))]
+        results = self.fer.detect_emotions(cv2.cvtColor(strip, cv2.COLOR_GRAY2BGR),
+                                           face_rectangles=boxes)
+        return np.array([[result["emotions"][label] for label in FER_LABELS] for result in results],
+                        dtype=np.float32)
+
+
+def create_emotion_classifier():
+    """
+    Load the emotion classifier, falling back to FER itself without a model cache
+
+    Returns:
+        Object whose classify(faces) maps prepared faces to scores ordered
+        as FER_LABELS
+    """
+    try:
+        return load_emotion_classifier()
+    except (ImportError, OSError) as e:
+        print(f"⚠️  Emotion model cache unavailable ({e}); loading FER directly")
+        return _FerClassifier()
 
 
 class FacialExpressionRecognizer:
     """Recognizes facial expressions using FER library"""
 
-    def __init__(self):
-        """Initialize the FER detector"""
+    def __init__(self, scheduler=None, stream_id=None, face_detector=None):
+        """
+        Initialize the FER detector
+
+        Args:
+            scheduler: Optional InferenceScheduler that batches face crops with
+                       other streams instead of classifying them here (the
+                       recognizer then only detects faces and loads no model)
+            stream_id: Identifies this recognizer's stream to the scheduler
+            face_detector: Face detector to use (defaults to select_face_detector())
+        """
+        self.scheduler = scheduler
+        self.stream_id = stream_id
+        self.classifier = None
         try:
-            # Initialize FER detector with Haar Cascade (faster than MTCNN, less CPU-intensive)
-            self.detector = FER(mtcnn=False)
+            # FER's model classifies the faces; they are found by our own face detector
+            # (faces smaller than MIN_FACE_SIZE are too small to classify reliably)
+            if scheduler is None:
+                self.classifier = create_emotion_classifier()
+            self.face_detector = face_detector or select_face_detector()
             self.last_emotion = "neutral"
+            self.last_scores = None
             print("✓ Facial expression recognizer initialized")
         except Exception as e:
             print(f"✗ Error initializing facial expression recognizer: {e}")
-            self.detector = None
+            self.classifier = None
+            self.face_detector = None
+            self.last_emotion = "neutral"
+            self.last_scores = None
+
+    def find_faces(self, gray):
+        """
+        Detect face bounding boxes
+
+        Args:
+            gray: Grayscale frame
+
+        Returns:
+            list: Face boxes as (x, y, w, h)
+        """
+        return self.face_detector.detect(gray)
+
+    def prepare_faces(self, gray, boxes):
+        """
+        Crop and normalize faces the way FER does before classification
+
+        Args:
+            gray: Grayscale frame the boxes refer to
+            boxes: Face boxes as (x, y, w, h)
+
+        Returns:
+            numpy.ndarray: float32 array of shape (n, 64, 64) scaled to [-1, 1]
+        """
+        padded = _pad(gray)
+        crops = []
+        for box in boxes:
+            x, y, w, h = _tosquare(box)
+            x1 = max(0, x - FACE_OFFSETS[0] + PADDING)
+            y1 = max(0, y - FACE_OFFSETS[1] + PADDING)
+            x2 = x + w + FACE_OFFSETS[0] + PADDING
+            y2 = y + h + FACE_OFFSETS[1] + PADDING
+            crop = padded[y1:y2, x1:x2]
+            if crop.size:
+                crops.append(cv2.resize(crop, FACE_INPUT_SIZE))
+
+        faces = np.array(crops, dtype=np.float32).reshape(-1, *FACE_INPUT_SIZE)
+        return (faces / 255.0 - 0.5) * 2.0
+
+    def classify_faces(self, faces):
+        """
+        Classify a batch of prepared faces
+
+        Args:
+            faces: Array from prepare_faces(), possibly from several frames
+
+        Returns:
+            numpy.ndarray: Scores of shape (n, 7) ordered as CLASSIFIER_EMOTIONS
+        """
+        return self.classifier.classify(faces)
+
+    def detect_scores(self, frame):
+        """
+        Detect the emotion scores of the first face in a frame
+
+        Args:
+            frame: OpenCV frame (BGR or grayscale)
+
+        Returns:
+            dict: Scores keyed by our standard emotion names, or None if no
+                  face was detected
+        """
+        if self.face_detector is None:
+            return None
+
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        boxes = self.find_faces(gray)
+        if not boxes:
+            return None
+
+        # Only the first face is reported, so only it is classified
+        faces = self.prepare_faces(gray, boxes[:1])
+        if not len(faces):
+            return None
+
+        if self.scheduler is not None:
+            scores = self.scheduler.classify(faces[0], stream_id=self.stream_id)
+        else:
+            scores = self.classify_faces(faces)[0]
+        return dict(zip(CLASSIFIER_EMOTIONS, (float(score) for score in scores)))
 
     def detect_emotion(self, frame):
         """
@@ -31,39 +554,19 @@ class FacialExpressionRecognizer:
         Returns:
             str: Detected emotion (e.g., "happy", "sad", etc.)
         """
-        if self.detector is None:
+        if self.face_detector is None:
             return self.last_emotion
 
         try:
-            # FER works with BGR format (OpenCV default)
-            # Detect emotions
-            result = self.detector.detect_emotions(frame)
-
-            if result and len(result) > 0:
-                # Get emotions for the first detected face
-                emotions = result[0]['emotions']
-
-                # Find the emotion with highest score
-                max_emotion = max(emotions, key=emotions.get)
-
-                # Map FER emotion names to our standard names
-                emotion_map = {
-                    'happy': 'happiness',
-                    'sad': 'sadness',
-                    'angry': 'anger',
-                    'surprise': 'surprise',
-                    'fear': 'fear',
-                    'disgust': 'disgust',
-                    'neutral': 'neutral'
-                }
-
-                # Update last known emotion
-                self.last_emotion = emotion_map.get(max_emotion, 'neutral')
-
-                return self.last_emotion
-            else:
-                # No face detected, return last known emotion
-                return self.last_emotion
+            scores = self.detect_scores(frame)
+
+            if scores:
+                # Update last known emotion (highest score) and its score distribution
+                self.last_emotion = max(scores, key=scores.get)
+                self.last_scores = scores
+
+            # No face detected: keep the last known emotion
+            return self.last_emotion
 
         except Exception as e:
             print(f"Error detecting emotion: {e}")
@@ -84,3 +587,15 @@ class FacialExpressionRecognizer:
     def get_last_emotion(self):
         """Get the last detected emotion"""
         return self.last_emotion
+
+    def get_last_scores(self):
+        """
+        Get the score distribution of the last detected face
+
+        Returns:
+            list: Scores ordered as config.settings.EMOTIONS, or None if no face
+                  has been detected yet
+        """
+        if self.last_scores is None:
+            return None
+        return [self.last_scores.get(emotion, 0.0) for emotion in EMOTIONS]
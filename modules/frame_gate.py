@@ -0,0 +1,115 @@
+"""
+Frame Gating Module
+Cheap checks that decide whether a frame is worth running emotion inference on
+"""
+import time
+import cv2
+from config.settings import (
+    GATE_DOWNSCALE_WIDTH, GATE_MOTION_THRESHOLD, GATE_BLUR_THRESHOLD,
+    GATE_MIN_BRIGHTNESS, GATE_MAX_BRIGHTNESS, GATE_MAX_SKIP_SECONDS
+)
+
+# Gate decisions
+INFER = "infer"  # Run inference on this frame
+SKIP = "skip"    # Nothing has changed since the last inference
+DEFER = "defer"  # Frame is unreliable (blurred, too dark or bright); try again soon
+
+
+class FrameGate:
+    """
+    Gates emotion inference using metrics computed on a small grayscale thumbnail
+
+    The thumbnail is compared against the one from the last frame that was
+    sent to inference, so slow drift eventually triggers a new inference.
+    """
+
+    def __init__(self, downscale_width=GATE_DOWNSCALE_WIDTH,
+                 motion_threshold=GATE_MOTION_THRESHOLD,
+                 blur_threshold=GATE_BLUR_THRESHOLD,
+                 min_brightness=GATE_MIN_BRIGHTNESS,
+                 max_brightness=GATE_MAX_BRIGHTNESS,
+                 max_skip_seconds=GATE_MAX_SKIP_SECONDS):
+        """
+        Initialize the gate
+
+        Args:
+            downscale_width: Width of the grayscale thumbnail used for the metrics
+            motion_threshold: Mean absolute pixel change below which the scene is unchanged
+            blur_threshold: Laplacian variance below which the frame is too blurred
+            min_brightness: Mean luminance below which the frame is too dark
+            max_brightness: Mean luminance above which the frame is overexposed
+            max_skip_seconds: Maximum time an unchanged scene may go without inference
+        """
+        self.downscale_width = downscale_width
+        self.motion_threshold = motion_threshold
+        self.blur_threshold = blur_threshold
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_skip_seconds = max_skip_seconds
+
+        self.reference = None
+        self.last_inference_time = 0.0
+        self.last_metrics = {}
+        self.stats = {INFER: 0, SKIP: 0, DEFER: 0}
+
+    def _thumbnail(self, frame):
+        """Downscale first, then convert, so the color conversion touches few pixels"""
+        height, width = frame.shape[:2]
+        if width > self.downscale_width:
+            size = (self.downscale_width, max(1, int(height * self.downscale_width / width)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def check(self, frame):
+        """
+        Decide whether to run emotion inference on a frame
+
+        Args:
+            frame: OpenCV frame (BGR or grayscale)
+
+        Returns:
+            tuple: (decision, reason) where decision is INFER, SKIP or DEFER
+        """
+        small = self._thumbnail(frame)
+
+        brightness = float(small.mean())
+        sharpness = float(cv2.Laplacian(small, cv2.CV_64F).var())
+        motion = None
+        if self.reference is not None and self.reference.shape == small.shape:
+            motion = float(cv2.absdiff(small, self.reference).mean())
+
+        self.last_metrics = {
+            "brightness": brightness,
+            "sharpness": sharpness,
+            "motion": motion
+        }
+
+        if brightness < self.min_brightness:
+            return self._decide(DEFER, "too dark")
+        if brightness > self.max_brightness:
+            return self._decide(DEFER, "overexposed")
+        if sharpness < self.blur_threshold:
+            return self._decide(DEFER, "blurred")
+
+        stale = time.monotonic() - self.last_inference_time >= self.max_skip_seconds
+        if motion is not None and motion < self.motion_threshold and not stale:
+            return self._decide(SKIP, "unchanged")
+
+        self.reference = small
+        self.last_inference_time = time.monotonic()
+        return self._decide(INFER, "changed" if motion is not None else "first frame")
+
+    def _decide(self, decision, reason):
+        self.stats[decision] += 1
+        return decision, reason
+
+    def reset(self):
+        """Forget the reference frame so the next usable frame is always inferred"""
+        self.reference = None
+        self.last_inference_time = 0.0
+
+    def get_stats(self):
+        """Get counts of each gate decision"""
+        return dict(self.stats)
@@ -4,8 +4,8 @@ Main user interface for the application
 """
 import tkinter as tk
 from tkinter import ttk, scrolledtext
-import cv2
 from PIL import Image, ImageTk
+from modules.video_capture import make_preview_frame
 from config.settings import WINDOW_TITLE, WINDOW_WIDTH, WINDOW_HEIGHT
 
 
@@ -28,7 +28,8 @@ class ApplicationGUI:
         'accent': '#FFD54F'             # Yellow accent
     }
 
-    def __init__(self, master, on_suggest_callback, on_start_callback, on_stop_callback):
+    def __init__(self, master, on_suggest_callback, on_start_callback, on_stop_callback,
+                 on_select_callback=None):
         """
         Initialize the GUI
 
@@ -37,6 +38,8 @@ class ApplicationGUI:
             on_suggest_callback: Callback function for "Suggest Response" button
             on_start_callback: Callback function for starting session
             on_stop_callback: Callback function for stopping session
+            on_select_callback: Optional callback called with the candidate's
+                                index when "Another Suggestion" shows it
         """
         self.master = master
         self.master.title(WINDOW_TITLE)
@@ -46,8 +49,14 @@ class ApplicationGUI:
         self.on_suggest_callback = on_suggest_callback
         self.on_start_callback = on_start_callback
         self.on_stop_callback = on_stop_callback
+        self.on_select_callback = on_select_callback
 
         self.is_session_active = False
+        self.max_transcript_lines = None  # Set by a memory budget
+
+        # Ranked suggestions of the last request and the one shown
+        self.candidates = []
+        self.candidate_index = 0
 
         # Configure ttk style for autism-friendly colors
         self._configure_style()
@@ -123,6 +132,10 @@ class ApplicationGUI:
                                          command=self._on_suggest_clicked, state=tk.DISABLED)
         self.suggest_button.grid(row=2, column=0, pady=5, sticky=(tk.W, tk.E))
 
+        self.another_button = ttk.Button(controls_frame, text="Another Suggestion",
+                                         command=self._on_another_clicked, state=tk.DISABLED)
+        self.another_button.grid(row=3, column=0, pady=5, sticky=(tk.W, tk.E))
+
         # --- Middle Section: Current Emotion Display ---
         emotion_frame = ttk.LabelFrame(main_frame, text="Current Emotion", padding="10")
         emotion_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -158,12 +171,12 @@ class ApplicationGUI:
         self.transcript_text.config(state=tk.DISABLED)
 
         # Response suggestions display
-        response_frame = ttk.LabelFrame(bottom_frame, text="Suggested Response", padding="5")
-        response_frame.grid(row=0, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(5, 0))
-        response_frame.rowconfigure(0, weight=1)
-        response_frame.columnconfigure(0, weight=1)
+        self.response_frame = ttk.LabelFrame(bottom_frame, text="Suggested Response", padding="5")
+        self.response_frame.grid(row=0, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(5, 0))
+        self.response_frame.rowconfigure(0, weight=1)
+        self.response_frame.columnconfigure(0, weight=1)
 
-        self.response_text = scrolledtext.ScrolledText(response_frame, wrap=tk.WORD,
+        self.response_text = scrolledtext.ScrolledText(self.response_frame, wrap=tk.WORD,
                                                        width=30, height=10,
                                                        font=("Arial", 15, "bold"),
                                                        bg=self.COLORS['bg_response'],
@@ -174,9 +187,16 @@ class ApplicationGUI:
         self.response_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         self.response_text.config(state=tk.DISABLED)
 
-        # Status bar
-        self.status_label = ttk.Label(main_frame, text="Ready to start", relief=tk.SUNKEN)
-        self.status_label.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        # Status bar: messages on the left, memory use on the right
+        status_frame = ttk.Frame(main_frame, style='Main.TFrame')
+        status_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        status_frame.columnconfigure(0, weight=1)
+
+        self.status_label = ttk.Label(status_frame, text="Ready to start", relief=tk.SUNKEN)
+        self.status_label.grid(row=0, column=0, sticky=(tk.W, tk.E))
+
+        self.memory_label = ttk.Label(status_frame, text="", relief=tk.SUNKEN)
+        self.memory_label.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 0))
 
     def _on_start_clicked(self):
         """Handle start button click"""
@@ -205,6 +225,14 @@ class ApplicationGUI:
             self.update_status("Generating suggestion...")
             self.on_suggest_callback()
 
+    def _on_another_clicked(self):
+        """Show the next candidate of the last suggestion, without a new request"""
+        if len(self.candidates) > 1:
+            self.candidate_index = (self.candidate_index + 1) % len(self.candidates)
+            self._show_candidate()
+            if self.on_select_callback:
+                self.on_select_callback(self.candidate_index)
+
     def update_video_frame(self, frame):
         """
         Update the video preview with a new frame
@@ -214,16 +242,22 @@ class ApplicationGUI:
         """
         if frame is not None:
             try:
-                # Convert BGR to RGB
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                self.show_preview_image(make_preview_frame(frame))
+            except Exception as e:
+                # Silently handle any frame update errors to prevent flickering
+                pass
 
-                # Resize for display
-                display_width = 320
-                display_height = 240
-                frame_resized = cv2.resize(frame_rgb, (display_width, display_height))
+    def show_preview_image(self, image):
+        """
+        Show an image that is already at preview size
 
+        Args:
+            image: RGB image, e.g. from VideoCapture.get_preview_frame()
+        """
+        if image is not None:
+            try:
                 # Convert to PIL Image
-                img = Image.fromarray(frame_resized)
+                img = Image.fromarray(image)
                 imgtk = ImageTk.PhotoImage(image=img)
 
                 # Update label - keep reference to prevent garbage collection
@@ -252,15 +286,49 @@ class ApplicationGUI:
         """
         self.transcript_text.config(state=tk.NORMAL)
         self.transcript_text.insert(tk.END, text + "\n")
+        self._trim_transcript()
         self.transcript_text.see(tk.END)
         self.transcript_text.config(state=tk.DISABLED)
 
+    def _trim_transcript(self):
+        """Delete the oldest transcript lines beyond max_transcript_lines"""
+        if self.max_transcript_lines:
+            # The widget always ends with an empty line after the last newline
+            lines = int(self.transcript_text.index("end-1c").split(".")[0]) - 1
+            excess = lines - self.max_transcript_lines
+            if excess > 0:
+                self.transcript_text.delete("1.0", f"{excess + 1}.0")
+
+    def set_transcript_line_limit(self, lines):
+        """
+        Limit the lines kept in the transcript display, deleting older ones now
+
+        Args:
+            lines: Lines to keep (None keeps all of them)
+        """
+        self.max_transcript_lines = lines
+        self.transcript_text.config(state=tk.NORMAL)
+        self._trim_transcript()
+        self.transcript_text.config(state=tk.DISABLED)
+
     def clear_transcript(self):
         """Clear the transcript display"""
         self.transcript_text.config(state=tk.NORMAL)
         self.transcript_text.delete(1.0, tk.END)
         self.transcript_text.config(state=tk.DISABLED)
 
+    def get_text_sizes(self):
+        """
+        Get the number of lines held by the text widgets (call on the Tk thread)
+
+        Returns:
+            dict: Line counts of the transcript and response widgets
+        """
+        return {
+            "transcript_text_lines": int(self.transcript_text.index("end-1c").split(".")[0]),
+            "response_text_lines": int(self.response_text.index("end-1c").split(".")[0])
+        }
+
     def show_response_suggestion(self, response):
         """
         Display a response suggestion
@@ -268,11 +336,51 @@ class ApplicationGUI:
         Args:
             response: Suggested response text
         """
+        self.show_suggestion_candidates([response] if response else [])
+
+    def show_suggestion_candidates(self, candidates):
+        """
+        Display the best of several ranked suggestions
+
+        "Another Suggestion" then cycles through the others.
+
+        Args:
+            candidates: Suggested responses, best first
+        """
+        self.candidates = list(candidates)
+        self.candidate_index = 0
+        self._show_candidate()
+        self.update_status("Suggestion ready")
+
+    def _show_candidate(self):
+        """Show the current candidate and its position among the candidates"""
+        response = self.candidates[self.candidate_index] if self.candidates else ""
         self.response_text.config(state=tk.NORMAL)
         self.response_text.delete(1.0, tk.END)
         self.response_text.insert(tk.END, response)
         self.response_text.config(state=tk.DISABLED)
-        self.update_status("Suggestion ready")
+
+        title = "Suggested Response"
+        if len(self.candidates) > 1:
+            title += f" ({self.candidate_index + 1} of {len(self.candidates)})"
+        self.response_frame.config(text=title)
+        self.another_button.config(state=tk.NORMAL if len(self.candidates) > 1 else tk.DISABLED)
+
+    def update_memory_status(self, rss_mb, budget_mb=0, level="normal"):
+        """
+        Show the memory use in the status bar
+
+        Args:
+            rss_mb: Resident memory of the process in MB
+            budget_mb: Memory budget in MB (0 = none)
+            level: Shedding level of the memory governor
+        """
+        text = f"Memory {rss_mb:.0f} MB"
+        if budget_mb:
+            text = f"Memory {rss_mb:.0f} / {budget_mb} MB"
+        if level != "normal":
+            text += f" ({level})"
+        self.memory_label.config(text=text)
 
     def update_status(self, message):
         """
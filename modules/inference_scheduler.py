@@ -0,0 +1,247 @@
+"""
+Inference Scheduler Module
+Batches face crops from many streams into single emotion classifier calls
+
+Requests wait until a batch is full, the oldest request has waited
+max_wait_ms, or waiting longer would break the tightest per-stream latency
+bound (given the measured batch run time), whichever comes first. Batches
+are filled earliest-deadline-first.
+"""
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import numpy as np
+
+from modules.resources import track_cpu
+from config.settings import INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS, INFERENCE_LATENCY_MS
+
+# Weight of the newest batch in the moving average of batch run time
+_EWMA_WEIGHT = 0.2
+
+
+class _Request:
+    """One face crop waiting to be classified"""
+
+    __slots__ = ("face", "stream_id", "submitted", "deadline", "future")
+
+    def __init__(self, face, stream_id, latency):
+        self.face = face
+        self.stream_id = stream_id
+        self.submitted = time.monotonic()
+        self.deadline = self.submitted + latency
+        self.future = Future()
+
+
+class InferenceScheduler:
+    """Dynamic micro-batching in front of an emotion classifier"""
+
+    def __init__(self, classify_batch, max_batch_size=INFERENCE_MAX_BATCH,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS, latency_ms=INFERENCE_LATENCY_MS):
+        """
+        Initialize the scheduler
+
+        Args:
+            classify_batch: Function mapping an (n, 64, 64) array of prepared
+                            faces to an (n, 7) array of scores, e.g.
+                            FacialExpressionRecognizer.classify_faces
+            max_batch_size: Largest batch sent to the classifier
+            max_wait_ms: Longest a request waits for its batch to fill
+            latency_ms: Default latency bound per request, submit to result
+        """
+        self.classify_batch = classify_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.default_latency = latency_ms / 1000.0
+        self.stream_latency = {}
+
+        self.pending = []
+        self.condition = threading.Condition()
+        self.is_running = False
+        self.thread = None
+
+        # Moving average of batch run time, used to start batches early enough
+        self.batch_seconds = 0.0
+
+        # Statistics are shared with the dispatcher thread; guarded by condition
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "latency_violations": 0,
+            "total_wait_s": 0.0
+        }
+        self.stream_stats = {}
+
+    def start(self):
+        """Start the dispatcher thread"""
+        with self.condition:
+            if self.is_running:
+                return
+            self.is_running = True
+        self.thread = threading.Thread(target=self._dispatch_loop, name="inference-scheduler",
+                                       daemon=True)
+        self.thread.start()
+
+    def set_stream_latency(self, stream_id, latency_ms):
+        """
+        Set the latency bound of one stream
+
+        Args:
+            stream_id: Stream identifier used with submit()
+            latency_ms: Maximum milliseconds from submit to result
+        """
+        with self.condition:
+            self.stream_latency[stream_id] = latency_ms / 1000.0
+
+    def remove_stream(self, stream_id):
+        """Forget a stream's latency bound and statistics"""
+        with self.condition:
+            self.stream_latency.pop(stream_id, None)
+            self.stream_stats.pop(stream_id, None)
+
+    def submit(self, face, stream_id=None):
+        """
+        Queue a prepared face for classification
+
+        Args:
+            face: float32 array of shape (64, 64) from prepare_faces()
+            stream_id: Stream the face came from
+
+        Returns:
+            Future: Resolves to the face's scores (array of length 7)
+        """
+        request = _Request(face, stream_id,
+                           self.stream_latency.get(stream_id, self.default_latency))
+        with self.condition:
+            if not self.is_running:
+                request.future.set_exception(RuntimeError("Inference scheduler is not running"))
+                return request.future
+            self.stream_stats.setdefault(stream_id,
+                                         {"requests": 0, "late": 0, "max_latency_ms": 0.0})
+            self.pending.append(request)
+            self.condition.notify()
+        return request.future
+
+    def classify(self, face, stream_id=None):
+        """
+        Classify a prepared face, blocking until its batch has run
+
+        Raises:
+            TimeoutError: If no result arrives within twice the stream's
+                          latency bound
+        """
+        latency = self.stream_latency.get(stream_id, self.default_latency)
+        future = self.submit(face, stream_id)
+        try:
+            return future.result(timeout=2 * latency)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Emotion inference missed its {latency * 1000:.0f} ms bound")
+
+    def _dispatch_at(self):
+        """When the current pending batch must be dispatched"""
+        oldest = min(request.submitted for request in self.pending)
+        tightest = min(request.deadline for request in self.pending)
+        return min(oldest + self.max_wait, tightest - self.batch_seconds)
+
+    def _dispatch_loop(self):
+        while True:
+            track_cpu("inference")
+            with self.condition:
+                while self.is_running and not self.pending:
+                    self.condition.wait()
+                if not self.is_running:
+                    break
+
+                # Wait for a fuller batch while no limit forces dispatch
+                while self.is_running and len(self.pending) < self.max_batch_size:
+                    now = time.monotonic()
+                    dispatch_at = self._dispatch_at()
+                    if now >= dispatch_at:
+                        break
+                    self.condition.wait(dispatch_at - now)
+
+                # Earliest deadline first; cancelled requests are dropped
+                self.pending.sort(key=lambda request: request.deadline)
+                batch = []
+                while self.pending and len(batch) < self.max_batch_size:
+                    request = self.pending.pop(0)
+                    if request.future.set_running_or_notify_cancel():
+                        batch.append(request)
+
+            if batch:
+                self._run_batch(batch)
+
+        # Fail anything still waiting at shutdown
+        with self.condition:
+            pending, self.pending = self.pending, []
+        for request in pending:
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(RuntimeError("Inference scheduler stopped"))
+
+    def _run_batch(self, batch):
+        started = time.monotonic()
+        try:
+            scores = self.classify_batch(np.stack([request.face for request in batch]))
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        finished = time.monotonic()
+        elapsed = finished - started
+        if self.batch_seconds:
+            self.batch_seconds += _EWMA_WEIGHT * (elapsed - self.batch_seconds)
+        else:
+            self.batch_seconds = elapsed
+
+        for request, row in zip(batch, scores):
+            request.future.set_result(row)
+
+        with self.condition:
+            self.stats["batches"] += 1
+            for request in batch:
+                self.stats["requests"] += 1
+                self.stats["total_wait_s"] += started - request.submitted
+                late = finished > request.deadline
+                if late:
+                    self.stats["latency_violations"] += 1
+
+                # Streams removed while their requests were in flight stay removed
+                stream = self.stream_stats.get(request.stream_id)
+                if stream is None:
+                    continue
+                stream["requests"] += 1
+                stream["late"] += int(late)
+                stream["max_latency_ms"] = max(stream["max_latency_ms"],
+                                               1000 * (finished - request.submitted))
+
+    def get_stats(self):
+        """
+        Get batching statistics
+
+        Returns:
+            dict: Request and batch counts, mean batch size, mean queue wait,
+                  latency violations and per-stream figures
+        """
+        with self.condition:
+            stats = dict(self.stats)
+            streams = {str(key): dict(value) for key, value in self.stream_stats.items()}
+        requests = stats.pop("requests")
+        total_wait = stats.pop("total_wait_s")
+        stats.update({
+            "requests": requests,
+            "mean_batch_size": requests / stats["batches"] if stats["batches"] else 0.0,
+            "mean_wait_ms": 1000 * total_wait / requests if requests else 0.0,
+            "mean_batch_ms": 1000 * self.batch_seconds,
+            "streams": streams
+        })
+        return stats
+
+    def stop(self):
+        """Stop dispatching; requests still queued fail with RuntimeError"""
+        with self.condition:
+            self.is_running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
@@ -0,0 +1,469 @@
+"""
+Pipeline Engine Module
+Runs capture -> emotion -> transcript -> suggestion without any GUI
+
+The engine publishes every result on its event bus. The desktop GUI, the
+headless command line runner and the session recorder are all just
+subscribers, so the same pipeline can be driven on a server, in CI or in
+batch jobs.
+"""
+import threading
+
+from modules.events import (
+    EventBus, EMOTION_DETECTED, TRANSCRIPT_ENTRY, SUGGESTION_REQUESTED,
+    SUGGESTION_READY, SUGGESTION_SELECTED, STREAM_ENDED, MEMORY_STATUS
+)
+from modules.video_capture import VideoCapture
+from modules.screen_capture import ScreenCapture, is_screen_source, parse_screen_source
+from modules.facial_expression import FacialExpressionRecognizer
+from modules.frame_gate import FrameGate, INFER, DEFER
+from modules.transcription import TranscriptionService
+from modules.transcript_store import TranscriptStore
+from modules.chatbot import ResponseGenerator
+from modules.session_recorder import SessionRecorder, new_session_path
+from modules.profiler import SessionProfiler, new_profile_dir
+from modules.resources import (
+    STAGE_CPU, MEMORY_NORMAL, MemoryGovernor, apply_memory_budget, apply_thread_budget,
+    format_cpu_report, release_memory
+)
+from config.settings import (
+    EMOTIONS, EXPRESSION_UPDATE_INTERVAL, GATE_ENABLED, GATE_RETRY_INTERVAL,
+    SESSION_RECORDING, RECORD_FRAMES, RECORD_FRAME_INTERVAL, PROFILE_ENABLED, TRANSCRIPT_STORE,
+    MEMORY_CHECK_INTERVAL
+)
+
+# Default profile for high-functioning autistic individuals
+DEFAULT_CHILD_PROFILE = {
+    "age": "teen/adult",
+    "autism_level": "Level 1 (high-functioning)",
+    "communication_capabilities": "Can communicate in full sentences"
+}
+
+
+class PipelineEngine:
+    """Coordinates the processing components of one session"""
+
+    def __init__(self, source=0, child_profile=None, realtime=True,
+                 recording=SESSION_RECORDING, profiling=PROFILE_ENABLED):
+        """
+        Initialize the engine
+
+        Args:
+            source: Video source (camera index, video file path or
+                    "screen[:x,y,w,h]" for a region of the screen)
+            child_profile: Dictionary with the child's profile
+                           (defaults to DEFAULT_CHILD_PROFILE)
+            realtime: Play video files back at their native frame rate
+            recording: Whether to record the session to disk
+            profiling: Whether to write CPU/memory profiles of each session
+        """
+        self.source = source
+        self.child_profile = child_profile or dict(DEFAULT_CHILD_PROFILE)
+        self.realtime = realtime
+        self.recording = recording
+        self.profiling = profiling
+
+        # Components
+        self.video_capture = None
+        self.expression_recognizer = None
+        self.frame_gate = None
+        self.transcription_service = None
+        self.transcript_store = None
+        self.session_id = None
+        self.response_generator = None
+        self.session_recorder = None
+        self.profiler = None
+        self.memory_governor = None
+        self.cpu_report = None
+
+        # State
+        self.session_active = threading.Event()
+        self.stream_ended = threading.Event()
+        self.current_emotion = "neutral"
+        self.current_scores = None
+
+        # Pipeline scheduling
+        self.event_bus = None
+        self.gate_retry_timer = None
+        self.subscriptions = []
+
+    @property
+    def is_running(self):
+        """Whether the pipeline is currently running (safe to read from any thread)"""
+        return self.session_active.is_set()
+
+    def subscribe(self, event_type, callback, lane="default"):
+        """
+        Subscribe to pipeline events
+
+        Subscriptions made before start() are kept for every session the
+        engine runs.
+
+        Args:
+            event_type: One of the event types in modules.events
+            callback: Function called with the Event
+            lane: Name of the event bus lane the callback runs on
+        """
+        self.subscriptions.append((event_type, callback, lane))
+        if self.event_bus is not None:
+            self.event_bus.subscribe(event_type, callback, lane=lane)
+
+    def initialize_components(self):
+        """Initialize all system components"""
+        try:
+            # Size the OpenCV / TensorFlow thread pools before any model is loaded
+            apply_thread_budget()
+            memory_budget = apply_memory_budget()
+            self.memory_governor = MemoryGovernor(memory_budget)
+
+            # Video capture (a camera, a video file or a region of the screen)
+            if is_screen_source(self.source):
+                self.video_capture = ScreenCapture(parse_screen_source(self.source),
+                                                   on_end=self._on_stream_end,
+                                                   grayscale=memory_budget.grayscale)
+            else:
+                self.video_capture = VideoCapture(source=self.source, realtime=self.realtime,
+                                                  on_end=self._on_stream_end,
+                                                  grayscale=memory_budget.grayscale,
+                                                  capture_size=memory_budget.capture_size)
+
+            # Facial expression recognizer
+            self.expression_recognizer = FacialExpressionRecognizer()
+            self.frame_gate = FrameGate() if GATE_ENABLED else None
+
+            # Transcript store (entries are written through, keyed by session)
+            if TRANSCRIPT_STORE:
+                self.transcript_store = TranscriptStore()
+                self.session_id = self.transcript_store.start_session()
+
+            # Transcription service (publishes entries on the event bus)
+            self.transcription_service = TranscriptionService(
+                on_entry=self._publish_transcript_entry,
+                store=self.transcript_store,
+                session_id=self.session_id
+            )
+
+            # Response generator
+            self.response_generator = ResponseGenerator(self.child_profile,
+                                                        transcript_store=self.transcript_store,
+                                                        session_id=self.session_id)
+
+            # Session recorder (opt-in)
+            if self.recording:
+                self.session_recorder = SessionRecorder(new_session_path(),
+                                                        record_frames=RECORD_FRAMES)
+
+            return True
+
+        except Exception as e:
+            print(f"✗ Error initializing components: {e}")
+            return False
+
+    def start(self):
+        """
+        Start capture, transcription and the pipeline stages
+
+        initialize_components() must have succeeded first.
+
+        Returns:
+            bool: True if the video source could be opened
+        """
+        self.session_active.set()
+        self.stream_ended.clear()
+        STAGE_CPU.reset()
+
+        # Profile from the very start so capture and model warm-up are included
+        if self.profiling:
+            self._start_profiler()
+
+        # Start video capture
+        if not self.video_capture.start():
+            self.stop()
+            return False
+
+        # Start transcription
+        self.transcription_service.start()
+
+        # The low-memory profile caps the buffers from the start
+        self._apply_memory_limits(self.memory_governor.budget.limits())
+
+        self._start_stages()
+        return True
+
+    def _start_profiler(self):
+        """Start sampling the session and track the buffers that grow with it"""
+        self.profiler = SessionProfiler(new_profile_dir())
+        transcription = self.transcription_service
+        responses = self.response_generator
+        self.profiler.add_gauge("transcript_entries", lambda: len(transcription.transcript))
+        self.profiler.add_gauge("transcript_chars",
+                                lambda: sum(len(entry["text"]) for entry in list(transcription.transcript)))
+        self.profiler.add_gauge("conversation_messages",
+                                lambda: len(responses.conversation_history))
+        self.profiler.add_gauge("conversation_chars",
+                                lambda: sum(len(message["content"])
+                                            for message in list(responses.conversation_history)))
+        self.profiler.start()
+
+    def _start_stages(self):
+        """Wire the pipeline stages to the event bus and start it"""
+        self.event_bus = EventBus()
+
+        for event_type, callback, lane in self.subscriptions:
+            self.event_bus.subscribe(event_type, callback, lane=lane)
+
+        # Suggestion stage gets its own lane so API latency never delays other events
+        self.event_bus.subscribe(SUGGESTION_REQUESTED, self._generate_suggestion,
+                                 lane="suggestion")
+        self.event_bus.subscribe(SUGGESTION_SELECTED, self._on_suggestion_selected,
+                                 lane="suggestion")
+
+        # Emotion stage runs on its own lane at a fixed cadence
+        self.event_bus.call_every(EXPRESSION_UPDATE_INTERVAL, self._on_expression_tick,
+                                  lane="emotion")
+
+        if self.session_recorder is not None and self.session_recorder.start():
+            self._subscribe_recorder()
+
+        # Memory stage measures the process and sheds optional work near the budget
+        self.event_bus.call_every(MEMORY_CHECK_INTERVAL, self._check_memory, lane="memory",
+                                  delay=0)
+
+        self.event_bus.start()
+
+    def _subscribe_recorder(self):
+        """Record pipeline events on a dedicated lane"""
+        recorder = self.session_recorder
+        bus = self.event_bus
+
+        bus.subscribe(EMOTION_DETECTED,
+                      lambda event: recorder.record_emotion(event.data["emotion"],
+                                                            event.data["scores"],
+                                                            event.timestamp),
+                      lane="recorder")
+        bus.subscribe(TRANSCRIPT_ENTRY,
+                      lambda event: recorder.record_transcript(event.data["entry"],
+                                                               event.timestamp),
+                      lane="recorder")
+        bus.subscribe(SUGGESTION_REQUESTED,
+                      lambda event: recorder.record_suggestion("requested", event.timestamp),
+                      lane="recorder")
+        bus.subscribe(SUGGESTION_READY,
+                      lambda event: recorder.record_suggestion("ready", event.timestamp,
+                                                               **event.data),
+                      lane="recorder")
+        bus.subscribe(SUGGESTION_SELECTED,
+                      lambda event: recorder.record_suggestion("selected", event.timestamp,
+                                                               **event.data),
+                      lane="recorder")
+
+        if RECORD_FRAMES:
+            def record_frame():
+                frame = self.video_capture.get_frame()
+                if frame is not None:
+                    recorder.record_frame(frame)
+            bus.call_every(RECORD_FRAME_INTERVAL, record_frame, lane="recorder", delay=0)
+
+    def _publish_transcript_entry(self, entry):
+        """Forward a transcript entry from the transcription thread to the bus"""
+        if self.event_bus is not None:
+            self.event_bus.publish(TRANSCRIPT_ENTRY, entry=entry)
+
+    def _on_stream_end(self):
+        """Called from the capture thread when a video file runs out"""
+        if self.event_bus is not None:
+            self.event_bus.publish(STREAM_ENDED, source=self.source)
+        self.stream_ended.set()
+
+    def get_frame(self):
+        """Get the latest video frame (None if not available)"""
+        if self.video_capture is None:
+            return None
+        return self.video_capture.get_frame()
+
+    def get_preview_frame(self):
+        """Get the RGB preview image of the latest frame (None if not available)"""
+        if self.video_capture is None:
+            return None
+        return self.video_capture.get_preview_frame()
+
+    def _on_expression_tick(self):
+        """Regular emotion update; supersedes any pending gate retry"""
+        if self.gate_retry_timer is not None:
+            self.gate_retry_timer.cancel()
+            self.gate_retry_timer = None
+        self._update_expression()
+
+    def _on_gate_retry(self):
+        """Retry an emotion update that the gate deferred"""
+        self.gate_retry_timer = None
+        self._update_expression()
+
+    def _update_expression(self):
+        """Emotion stage: detect the current facial expression and publish it"""
+        bus = self.event_bus
+        # Detection and gate work on the small grayscale image, never the full frame
+        frame = self.video_capture.get_detection_frame()
+        if bus is None or frame is None:
+            return
+
+        # Skip inference when the scene is unchanged, defer it when the frame is unreliable
+        if self.frame_gate is not None:
+            decision, reason = self.frame_gate.check(frame)
+            if decision != INFER:
+                if decision == DEFER and self.gate_retry_timer is None:
+                    self.gate_retry_timer = bus.call_later(GATE_RETRY_INTERVAL,
+                                                           self._on_gate_retry, lane="emotion")
+                return
+
+        # Detect emotion on the grayscale detection image
+        emotion = self.expression_recognizer.detect_emotion(frame)
+        scores = self.expression_recognizer.get_last_scores()
+        self.current_emotion = emotion
+        self.current_scores = dict(zip(EMOTIONS, scores)) if scores is not None else None
+
+        emoticon = self.expression_recognizer.get_emoticon(emotion)
+        bus.publish(EMOTION_DETECTED, emotion=emotion, emoticon=emoticon, scores=scores)
+
+    def _check_memory(self):
+        """Memory stage: measure the process, shed or restore optional work and publish the status"""
+        governor = self.memory_governor
+        if governor.check():
+            print(f"⚠️  Memory at {governor.rss_mb:.0f} of {governor.budget.budget_mb} MB: "
+                  f"{governor.level} mode")
+            self._apply_memory_limits(governor.budget.limits(governor.level))
+            if governor.level != MEMORY_NORMAL:
+                release_memory()
+        if self.event_bus is not None and governor.rss_mb is not None:
+            self.event_bus.publish(MEMORY_STATUS, **governor.status())
+
+    def _apply_memory_limits(self, limits):
+        """Resize the buffers and the preview to a MemoryBudget's limits"""
+        self.transcription_service.limit_memory(limits["transcript_entries"])
+        # The suggestion stage owns the history, so it is trimmed on that lane
+        # rather than in the middle of a request
+        self.event_bus.call_later(0, lambda: self.response_generator.limit_history(
+            limits["history_turns"]), lane="suggestion")
+        self.video_capture.preview_scale = limits["preview_scale"]
+
+    def request_suggestion(self):
+        """Ask the suggestion stage for a new response suggestion"""
+        if self.event_bus is not None:
+            self.event_bus.publish(SUGGESTION_REQUESTED)
+
+    def _generate_suggestion(self, event=None):
+        """Suggestion stage: generate a response suggestion and publish it"""
+        bus = self.event_bus
+        try:
+            # Get conversation transcript (recent and relevant turns when stored)
+            if self.transcript_store is not None:
+                transcript = self.response_generator.get_context_transcript()
+            else:
+                transcript = self.transcription_service.get_transcript()
+
+            if not transcript:
+                transcript = "No conversation detected yet."
+
+            # Get current emotion
+            emotion = self.current_emotion
+
+            # Generate ranked candidates with one request
+            print(f"\nGenerating response suggestion...")
+            print(f"  Current emotion: {emotion}")
+            candidates = self.response_generator.generate_candidates(transcript, emotion,
+                                                                     self.current_scores)
+
+            print(f"  Suggested response: {candidates[0]}")
+            for alternative in candidates[1:]:
+                print(f"  Alternative: {alternative}")
+            print()
+
+        except Exception as e:
+            print(f"✗ Error generating suggestion: {e}")
+            candidates = ["Error generating suggestion."]
+
+        if bus is not None:
+            bus.publish(SUGGESTION_READY, response=candidates[0], candidates=candidates,
+                        emotion=self.current_emotion)
+
+    def select_suggestion(self, index):
+        """
+        Choose another candidate of the last suggestion
+
+        Args:
+            index: Position in the SUGGESTION_READY event's candidates
+        """
+        if self.event_bus is not None:
+            self.event_bus.publish(SUGGESTION_SELECTED, index=index)
+
+    def _on_suggestion_selected(self, event):
+        """Suggestion stage: keep the chosen candidate in the conversation history"""
+        self.response_generator.select_candidate(event.data["index"])
+
+    def wait(self, timeout=None):
+        """
+        Block until a video file has been fully processed
+
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            bool: True if the stream ended, False on timeout
+        """
+        return self.stream_ended.wait(timeout)
+
+    def stop(self, drain=False):
+        """
+        Stop the pipeline and release all components
+
+        Args:
+            drain: Deliver events that are already queued before stopping
+        """
+        self.session_active.clear()
+
+        # Shut down the pipeline stages before releasing what they use
+        if self.event_bus is not None:
+            self.event_bus.stop(drain=drain)
+            self.event_bus = None
+            self.gate_retry_timer = None
+
+        if self.frame_gate is not None:
+            stats = self.frame_gate.get_stats()
+            print(f"  Emotion gate: {stats['infer']} inferred, {stats['skip']} skipped, "
+                  f"{stats['defer']} deferred")
+
+        self.cpu_report = STAGE_CPU.report()
+        for line in format_cpu_report(self.cpu_report):
+            print(f"  {line}")
+
+        if self.memory_governor is not None and self.memory_governor.peak_mb:
+            budget_mb = self.memory_governor.budget.budget_mb
+            print(f"  Memory: {self.memory_governor.peak_mb:.0f} MB peak"
+                  + (f" (budget {budget_mb} MB)" if budget_mb else ""))
+
+        # Stop services
+        if self.video_capture:
+            self.video_capture.stop()
+
+        if self.transcription_service:
+            self.transcription_service.stop()
+
+        if self.session_recorder:
+            self.session_recorder.stop()
+            self.session_recorder = None
+
+        if self.transcript_store is not None:
+            self.transcript_store.close()
+            self.transcript_store = None
+
+        # Write the profile before the buffers it measures are reset
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler = None
+
+        # Reset components
+        if self.response_generator:
+            self.response_generator.reset_conversation()
+
+        self.current_emotion = "neutral"
+        self.current_scores = None
@@ -0,0 +1,319 @@
+"""
+Session Profiler Module
+Opt-in CPU and memory profiling of a running session
+
+A background thread samples the Python stack of every thread at a fixed
+interval (sys._current_frames), so no pipeline code has to be edited or
+wrapped. Samples are attributed to the pipeline stage whose function is on
+the stack. tracemalloc snapshots taken at session start and stop show which
+source lines grew, and gauges track the size of long-lived buffers over
+time.
+
+Artifacts written to the session's profile directory:
+    cpu.folded   collapsed stacks ("thread;file:function;... count"), readable
+                 by flamegraph.pl and speedscope
+    cpu.txt      samples per thread and stage, top functions
+    memory.txt   top allocation sites by growth between start and stop
+    gauges.csv   time, gauge, value
+    summary.json all of the above in condensed form
+"""
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from config.settings import (
+    PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_TRACEMALLOC_FRAMES,
+    PROFILE_TOP_ALLOCATIONS, PROFILE_GAUGE_INTERVAL
+)
+
+# Functions that mark a pipeline stage when found on a sampled stack
+STAGE_FUNCTIONS = {
+    "_update_expression": "emotion",
+    "_transcription_loop": "transcription",
+    "update_video_frame": "preview",
+    "show_preview_image": "preview",
+    "generate_response": "suggestion",
+    "generate_candidates": "suggestion"
+}
+
+# Leaf frames in these modules mean the thread is blocked, not using CPU
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py", "socket.py", "ssl.py")
+
+# Number of functions listed in cpu.txt
+_TOP_FUNCTIONS = 30
+
+
+def new_profile_dir(directory=PROFILE_DIR):
+    """
+    Build a timestamped directory for one session's profile artifacts
+
+    Args:
+        directory: Parent directory (created if missing)
+
+    Returns:
+        str: Path of the new, empty directory
+    """
+    path = os.path.join(directory, datetime.now().strftime("session-%Y%m%d-%H%M%S"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SessionProfiler:
+    """Samples stacks, memory and gauges for one session"""
+
+    def __init__(self, output_dir, interval_ms=PROFILE_SAMPLE_INTERVAL_MS,
+                 tracemalloc_frames=PROFILE_TRACEMALLOC_FRAMES,
+                 top_allocations=PROFILE_TOP_ALLOCATIONS, gauge_interval=PROFILE_GAUGE_INTERVAL):
+        """
+        Initialize the profiler
+
+        Args:
+            output_dir: Directory the artifacts are written to
+            interval_ms: Milliseconds between stack samples
+            tracemalloc_frames: Stack depth stored per allocation (0 disables
+                                memory snapshots)
+            top_allocations: Number of allocation sites listed in memory.txt
+            gauge_interval: Seconds between gauge readings
+        """
+        self.output_dir = output_dir
+        self.interval = interval_ms / 1000.0
+        self.tracemalloc_frames = tracemalloc_frames
+        self.top_allocations = top_allocations
+        self.gauge_interval = gauge_interval
+
+        self.gauges = {}
+        self.gauge_rows = []
+        self.lock = threading.Lock()
+
+        self.stacks = Counter()
+        self.thread_samples = Counter()
+        self.thread_active = Counter()
+        self.stage_samples = Counter()
+        self.stage_active = Counter()
+        self.self_samples = Counter()
+        self.total_samples = Counter()
+        self.samples = 0
+
+        self.started_tracemalloc = False
+        self.start_snapshot = None
+        self.started = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def add_gauge(self, name, read):
+        """
+        Track a value over the session
+
+        Args:
+            name: Gauge name
+            read: Function returning the current value; it is called from
+                  the sampling thread, so it must be thread-safe
+        """
+        self.gauges[name] = read
+
+    def record(self, name, value):
+        """
+        Record one gauge reading pushed from another thread
+
+        Use this for values that can only be read on a specific thread,
+        such as Tk widget sizes.
+        """
+        if self.started is None:
+            return
+        with self.lock:
+            self.gauge_rows.append((time.time() - self.started, name, value))
+
+    def start(self):
+        """Take the starting memory snapshot and start sampling"""
+        if self.thread is not None:
+            return
+
+        if self.tracemalloc_frames:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.tracemalloc_frames)
+                self.started_tracemalloc = True
+            self.start_snapshot = self._snapshot()
+
+        self.started = time.time()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self.thread.start()
+        print(f"✓ Profiling session to {self.output_dir}")
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")
+        ))
+
+    def _sample_loop(self):
+        next_gauges = time.monotonic()
+        own_ident = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            self._sample(own_ident)
+            if time.monotonic() >= next_gauges:
+                self._read_gauges()
+                next_gauges = time.monotonic() + self.gauge_interval
+        self._read_gauges()
+
+    def _sample(self, own_ident):
+        """Record the current stack of every thread except the profiler's"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        self.samples += 1
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+
+            leaf = frame
+            labels = []
+            stage = None
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                if stage is None:
+                    stage = STAGE_FUNCTIONS.get(frame.f_code.co_name)
+                frame = frame.f_back
+
+            thread_name = names.get(ident, str(ident))
+            active = not leaf.f_code.co_filename.endswith(_IDLE_MODULES)
+
+            labels.reverse()
+            self.stacks[";".join([thread_name] + labels)] += 1
+            self.thread_samples[thread_name] += 1
+            self.thread_active[thread_name] += active
+            if stage is not None:
+                self.stage_samples[stage] += 1
+                self.stage_active[stage] += active
+            if active:
+                self.self_samples[labels[-1]] += 1
+                for label in set(labels):
+                    self.total_samples[label] += 1
+
+    def _read_gauges(self):
+        elapsed = time.time() - self.started
+        for name, read in self.gauges.items():
+            try:
+                value = read()
+            except Exception:
+                continue
+            with self.lock:
+                self.gauge_rows.append((elapsed, name, value))
+
+    def stop(self):
+        """
+        Stop sampling, take the final memory snapshot and write the artifacts
+
+        Returns:
+            dict: The profile summary written to summary.json
+        """
+        if self.thread is None:
+            return None
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        duration = time.time() - self.started
+
+        memory = self._write_memory() if self.start_snapshot is not None else None
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+        summary = {
+            "duration_s": duration,
+            "sample_interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "threads": {name: {"samples": count, "active": self.thread_active[name]}
+                        for name, count in self.thread_samples.items()},
+            "stages": {name: {"samples": count, "active": self.stage_active[name]}
+                       for name, count in self.stage_samples.items()},
+            "top_functions": [{"function": label, "self": count,
+                               "total": self.total_samples[label]}
+                              for label, count in self.self_samples.most_common(_TOP_FUNCTIONS)],
+            "memory": memory,
+            "gauges": self._write_gauges()
+        }
+        self._write_cpu()
+
+        with open(os.path.join(self.output_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"✓ Profile saved to {self.output_dir} ({self.samples} samples)")
+        return summary
+
+    def _write_cpu(self):
+        with open(os.path.join(self.output_dir, "cpu.folded"), "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        interval_ms = self.interval * 1000
+        with open(os.path.join(self.output_dir, "cpu.txt"), "w") as f:
+            f.write(f"{self.samples} samples every {interval_ms:.0f} ms "
+                    f"(active = not blocked in threading/queue/socket code)\n\n")
+
+            f.write("Threads                                  samples   active\n")
+            for name, count in self.thread_samples.most_common():
+                f.write(f"  {name:<38} {count:>7} {self.thread_active[name]:>8}\n")
+
+            f.write("\nStages                                   samples   active\n")
+            for name, count in self.stage_samples.most_common():
+                f.write(f"  {name:<38} {count:>7} {self.stage_active[name]:>8}\n")
+
+            f.write("\nTop functions (active samples)              self    total\n")
+            for label, count in self.self_samples.most_common(_TOP_FUNCTIONS):
+                f.write(f"  {label:<42} {count:>6} {self.total_samples[label]:>8}\n")
+
+    def _write_memory(self):
+        """Write the allocation sites that grew the most; return a summary"""
+        end_snapshot = self._snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        diffs = end_snapshot.compare_to(self.start_snapshot, "lineno")[:self.top_allocations]
+
+        with open(os.path.join(self.output_dir, "memory.txt"), "w") as f:
+            f.write(f"Traced memory: {current / 1e6:.1f} MB current, {peak / 1e6:.1f} MB peak\n\n")
+            f.write(f"Top {len(diffs)} allocation sites by growth since session start:\n")
+            for diff in diffs:
+                f.write(f"  {diff}\n")
+
+            # Full call stacks for the largest growth, to find who is allocating
+            f.write("\nLargest growth by call stack:\n")
+            for diff in end_snapshot.compare_to(self.start_snapshot, "traceback")[:5]:
+                f.write(f"\n  {diff.size_diff / 1024:+.1f} KiB, {diff.count_diff:+d} blocks\n")
+                for line in diff.traceback.format():
+                    f.write(f"    {line}\n")
+
+        return {
+            "current_mb": current / 1e6,
+            "peak_mb": peak / 1e6,
+            "top_growth": [{"site": str(diff.traceback), "size_diff_kb": diff.size_diff / 1024,
+                            "count_diff": diff.count_diff} for diff in diffs[:10]]
+        }
+
+    def _write_gauges(self):
+        """Write the gauge time series; return first/last/max per gauge"""
+        with self.lock:
+            rows = sorted(self.gauge_rows)
+
+        with open(os.path.join(self.output_dir, "gauges.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time_s", "gauge", "value"])
+            writer.writerows((f"{elapsed:.3f}", name, value) for elapsed, name, value in rows)
+
+        summary = {}
+        for elapsed, name, value in rows:
+            gauge = summary.setdefault(name, {"first": value, "last": value, "max": value})
+            gauge["last"] = value
+            gauge["max"] = max(gauge["max"], value)
+        for gauge in summary.values():
+            gauge["growth"] = gauge["last"] - gauge["first"]
+        return summary
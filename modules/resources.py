@@ -0,0 +1,560 @@
+"""
+Resources Module
+Splits the CPU between libraries and pipeline stages, reports what each stage
+uses and keeps the process within a memory budget
+
+Left alone, OpenCV, TensorFlow / TFLite and the worker pools each size
+their thread pools to the whole machine, which oversubscribes small
+laptops and makes the preview stutter. A ThreadBudget derived from a
+profile gives each of them a share of the cores instead:
+
+    balanced         half the cores for inference, preview at ~30 fps
+    preview-first    a quarter of the cores for inference, and the emotion,
+                     inference and recorder threads run at a lower priority
+    inference-first  all cores but one for inference, preview at ~15 fps
+
+Priorities are Linux thread nice values and can only be lowered without
+privileges, so profiles deprioritize stages rather than boost them.
+
+Stage threads call track_cpu() from their loops, so the CPU time of each
+stage is measured with time.thread_time() on every platform.
+
+A MemoryBudget does the same for memory. The low-memory profile keeps
+captured frames as grayscale uint8 (the format inference uses), requests a
+smaller camera mode, limits the heap arenas glibc keeps for the process's
+threads, stops TensorFlow from reserving GPU memory up front and caps the buffers and histories that grow during a session. Under any profile with a budget, a MemoryGovernor measures the
+resident memory periodically and, as it approaches the budget, sheds
+optional work in two steps:
+
+    reduced   preview at half size, buffers and histories capped at half
+    critical  preview at quarter size, caps at a quarter, freed heap
+              returned to the OS
+
+and relaxes again once memory has dropped well below the budget.
+"""
+import ctypes
+import gc
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+from config.settings import (
+    RESOURCE_PROFILE, CPU_CORES, MEMORY_PROFILE, MEMORY_BUDGET_MB, TRANSCRIPT_MEMORY_ENTRIES,
+    PROMPT_HISTORY_TURNS, GUI_TRANSCRIPT_MAX_LINES
+)
+
+# psutil measures current memory on every platform; without it Linux reads
+# /proc and other platforms fall back to the peak from getrusage()
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# inference_share: fraction of the cores for OpenCV and the emotion model
+# preview_interval_ms: delay between preview refreshes in the desktop app
+# nice: niceness added to the threads of each stage (Linux only)
+PROFILES = {
+    "balanced": {
+        "inference_share": 0.5,
+        "preview_interval_ms": 33,
+        "nice": {}
+    },
+    "preview-first": {
+        "inference_share": 0.25,
+        "preview_interval_ms": 33,
+        "nice": {"emotion": 5, "inference": 5, "recorder": 10}
+    },
+    "inference-first": {
+        "inference_share": 1.0,
+        "preview_interval_ms": 66,
+        "nice": {"recorder": 5}
+    }
+}
+
+
+def available_cores():
+    """Number of cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class ThreadBudget:
+    """Thread counts for each library and worker pool, derived from a profile"""
+
+    def __init__(self, profile=RESOURCE_PROFILE, cores=CPU_CORES):
+        """
+        Initialize the budget
+
+        Args:
+            profile: One of PROFILES
+            cores: Cores the application may use (0 = all available)
+
+        Raises:
+            ValueError: If the profile is unknown
+        """
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown resource profile: {profile} "
+                             f"(expected one of {', '.join(PROFILES)})")
+        settings = PROFILES[profile]
+        self.profile = profile
+        self.cores = max(1, cores or available_cores())
+
+        # One core always stays free for capture, the GUI and the other stages
+        share = round(self.cores * settings["inference_share"])
+        self.inference_threads = max(1, min(self.cores - 1, share))
+
+        # OpenCV, TFLite and TensorFlow intra-op pools all get inference_threads;
+        # a single small model gains nothing from running graph ops in parallel
+        self.inter_op_threads = 1
+
+        self.model_workers = self.inference_threads  # Server recognizer workers
+        self.batch_workers = self.cores  # Batch analysis has no preview to protect
+        self.preview_interval_ms = settings["preview_interval_ms"]
+        self.nice = dict(settings["nice"])
+
+    def for_workers(self, workers):
+        """
+        Split the inference threads between parallel workers
+
+        Args:
+            workers: Number of workers running inference at the same time
+
+        Returns:
+            ThreadBudget: Copy whose inference threads are per worker
+        """
+        budget = ThreadBudget(self.profile, self.cores)
+        budget.inference_threads = max(1, self.inference_threads // max(1, workers))
+        return budget
+
+    def as_dict(self):
+        """Describe the budget (for logs and reports)"""
+        return {
+            "profile": self.profile,
+            "cores": self.cores,
+            "inference_threads": self.inference_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "model_workers": self.model_workers,
+            "batch_workers": self.batch_workers,
+            "preview_interval_ms": self.preview_interval_ms,
+            "nice": self.nice
+        }
+
+
+# Budget applied to this process by apply_thread_budget()
+_applied_budget = None
+
+
+def get_thread_budget():
+    """Get the budget applied to this process (the configured one if none was applied)"""
+    return _applied_budget or ThreadBudget()
+
+
+def apply_thread_budget(budget=None):
+    """
+    Size the thread pools of OpenCV and TensorFlow
+
+    TensorFlow reads its pool sizes when it starts, so this should run
+    before the emotion model is loaded. Thread counts already set in the
+    environment are kept.
+
+    Args:
+        budget: ThreadBudget to apply (defaults to get_thread_budget())
+
+    Returns:
+        ThreadBudget: The applied budget
+    """
+    global _applied_budget
+    budget = budget or get_thread_budget()
+
+    cv2.setNumThreads(budget.inference_threads)
+    os.environ.setdefault("TF_NUM_INTRAOP_THREADS", str(budget.inference_threads))
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", str(budget.inter_op_threads))
+    os.environ.setdefault("OMP_NUM_THREADS", str(budget.inference_threads))
+
+    tf = sys.modules.get("tensorflow")
+    if tf is not None:
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(budget.inference_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(budget.inter_op_threads)
+        except (RuntimeError, AttributeError):
+            # The runtime has already started; its pools keep their size
+            pass
+
+    _applied_budget = budget
+    return budget
+
+
+def _renice(stage):
+    """Lower the calling thread's priority as the budget asks for its stage"""
+    nice = get_thread_budget().nice.get(stage)
+    # Threads created later inherit the main thread's niceness, so it is never changed
+    if not nice or not sys.platform.startswith("linux") \
+            or threading.current_thread() is threading.main_thread():
+        return
+    try:
+        # Relative to the process, so renicing a thread again does not add up
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(),
+                       os.getpriority(os.PRIO_PROCESS, os.getpid()) + nice)
+    except OSError:
+        pass
+
+
+class StageCpuMeter:
+    """CPU time used by each pipeline stage, reported by the stages' threads"""
+
+    def __init__(self):
+        """Initialize the meter"""
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new measurement period"""
+        with self.lock:
+            self.threads = {}  # thread ident -> [stage, first cpu time, last cpu time]
+            self.finished = {}  # stage -> CPU seconds of threads that have been replaced
+            self.started = (time.monotonic(), time.process_time())
+
+    def track(self, stage):
+        """
+        Record the calling thread's CPU time under a stage
+
+        Args:
+            stage: Name of the pipeline stage the thread belongs to
+        """
+        now = time.thread_time()
+        ident = threading.get_ident()
+        entry = self.threads.get(ident)
+        if entry is not None and entry[0] == stage and now >= entry[2]:
+            entry[2] = now
+            return
+
+        with self.lock:
+            if entry is not None:
+                # Another stage on this thread, or a new thread reusing the ident
+                self.finished[entry[0]] = self.finished.get(entry[0], 0.0) + entry[2] - entry[1]
+            self.threads[ident] = [stage, now, now]
+        _renice(stage)
+
+    def report(self):
+        """
+        Report CPU use since the last reset
+
+        "other" is process CPU time not reported by any stage: OpenCV and
+        TensorFlow pool threads, library threads and startup work.
+
+        Returns:
+            dict: Wall and process CPU seconds, and per stage the CPU
+                  seconds, cores used on average and share of process CPU
+        """
+        with self.lock:
+            started_wall, started_cpu = self.started
+            seconds = dict(self.finished)
+            for stage, first, last in self.threads.values():
+                seconds[stage] = seconds.get(stage, 0.0) + last - first
+
+        wall = max(1e-9, time.monotonic() - started_wall)
+        process = time.process_time() - started_cpu
+        seconds["other"] = max(0.0, process - sum(seconds.values()))
+
+        stages = {}
+        for stage, cpu in sorted(seconds.items(), key=lambda item: -item[1]):
+            stages[stage] = {
+                "cpu_s": cpu,
+                "cores": cpu / wall,
+                "share": cpu / process if process > 0 else 0.0
+            }
+        return {"wall_s": wall, "process_cpu_s": process, "budget": get_thread_budget().as_dict(),
+                "stages": stages}
+
+
+# Meter shared by every stage of the process
+STAGE_CPU = StageCpuMeter()
+
+
+def track_cpu(stage):
+    """Record the calling thread's CPU time under a pipeline stage (see StageCpuMeter)"""
+    STAGE_CPU.track(stage)
+
+
+def format_cpu_report(report):
+    """One line per stage describing a StageCpuMeter report"""
+    budget = report["budget"]
+    lines = [f"CPU by stage ({budget['profile']}, {budget['cores']} cores, "
+             f"{budget['inference_threads']} inference threads): "
+             f"{report['process_cpu_s'] / report['wall_s']:.2f} cores in total"]
+    for stage, usage in report["stages"].items():
+        lines.append(f"  {stage:<14} {usage['cores']:>5.2f} cores  {usage['share']:>6.1%}")
+    return lines
+
+
+# budget_mb: resident memory at which optional work is shed (0 = measure only)
+# grayscale: keep captured frames as grayscale uint8, the format inference uses
+# capture_size: camera mode requested instead of CAPTURE_WIDTH x CAPTURE_HEIGHT
+# cap_buffers: apply the limits from the start rather than only while shedding
+# malloc_arenas: glibc heap arenas shared by all threads (None keeps glibc's
+#                default of up to 8 per core, each holding on to freed memory)
+# gpu_memory_growth: let TensorFlow grow GPU memory as needed instead of
+#                    reserving nearly all of it when it starts
+# limits: in-memory transcript entries, suggestion turns in the prompt and
+#         conversation lines shown by the GUI
+MEMORY_PROFILES = {
+    "standard": {
+        "budget_mb": 0,
+        "grayscale": False,
+        "capture_size": None,
+        "cap_buffers": False,
+        "malloc_arenas": None,
+        "gpu_memory_growth": False,
+        "limits": {"transcript_entries": TRANSCRIPT_MEMORY_ENTRIES,
+                   "history_turns": PROMPT_HISTORY_TURNS,
+                   "transcript_lines": GUI_TRANSCRIPT_MAX_LINES}
+    },
+    "low-memory": {
+        "budget_mb": 512,
+        "grayscale": True,
+        "capture_size": (320, 240),
+        "cap_buffers": True,
+        "malloc_arenas": 2,
+        "gpu_memory_growth": True,
+        "limits": {"transcript_entries": 50, "history_turns": 4, "transcript_lines": 200}
+    }
+}
+
+# Shedding levels, from none to the most
+MEMORY_NORMAL = "normal"
+MEMORY_REDUCED = "reduced"
+MEMORY_CRITICAL = "critical"
+MEMORY_LEVELS = (MEMORY_NORMAL, MEMORY_REDUCED, MEMORY_CRITICAL)
+
+# Fractions of the budget at which shedding starts, escalates and relaxes
+_REDUCE_AT = 0.8
+_CRITICAL_AT = 1.0
+_RELAX_BELOW = 0.7
+
+# Per level: divisor of the limits and scale of the preview
+_SHEDDING = {
+    MEMORY_NORMAL: (1, 1.0),
+    MEMORY_REDUCED: (2, 0.5),
+    MEMORY_CRITICAL: (4, 0.25)
+}
+
+
+class MemoryBudget:
+    """Memory limits of a profile and the shedding applied near its budget"""
+
+    def __init__(self, profile=MEMORY_PROFILE, budget_mb=MEMORY_BUDGET_MB):
+        """
+        Initialize the budget
+
+        Args:
+            profile: One of MEMORY_PROFILES
+            budget_mb: Resident memory budget in MB (0 = the profile's budget)
+
+        Raises:
+            ValueError: If the profile is unknown
+        """
+        if profile not in MEMORY_PROFILES:
+            raise ValueError(f"Unknown memory profile: {profile} "
+                             f"(expected one of {', '.join(MEMORY_PROFILES)})")
+        settings = MEMORY_PROFILES[profile]
+        self.profile = profile
+        self.budget_mb = budget_mb or settings["budget_mb"]
+        self.grayscale = settings["grayscale"]
+        self.capture_size = settings["capture_size"]
+        self.cap_buffers = settings["cap_buffers"]
+        self.malloc_arenas = settings["malloc_arenas"]
+        self.gpu_memory_growth = settings["gpu_memory_growth"]
+        self.base_limits = dict(settings["limits"])
+
+    def limits(self, level=MEMORY_NORMAL):
+        """
+        Get the limits that apply at a shedding level
+
+        Args:
+            level: One of MEMORY_LEVELS
+
+        Returns:
+            dict: Limit per buffer (None keeps the component's own default)
+                  and "preview_scale", the preview size relative to normal
+        """
+        divisor, preview_scale = _SHEDDING[level]
+        if level == MEMORY_NORMAL and not self.cap_buffers:
+            limits = dict.fromkeys(self.base_limits)
+        else:
+            limits = {name: max(1, value // divisor) for name, value in self.base_limits.items()}
+        limits["preview_scale"] = preview_scale
+        return limits
+
+    def as_dict(self):
+        """Describe the budget (for logs and reports)"""
+        return {
+            "profile": self.profile,
+            "budget_mb": self.budget_mb,
+            "grayscale": self.grayscale,
+            "capture_size": self.capture_size,
+            "malloc_arenas": self.malloc_arenas,
+            "gpu_memory_growth": self.gpu_memory_growth,
+            "limits": self.base_limits
+        }
+
+
+# Memory budget applied to this process by apply_memory_budget()
+_applied_memory_budget = None
+
+# mallopt() parameter limiting the number of glibc malloc arenas
+_M_ARENA_MAX = -8
+
+
+def get_memory_budget():
+    """Get the memory budget applied to this process (the configured one if none was applied)"""
+    return _applied_memory_budget or MemoryBudget()
+
+
+def apply_memory_budget(budget=None):
+    """
+    Limit the heap arenas of the process (glibc only) and TensorFlow's GPU memory
+
+    glibc gives threads that allocate concurrently their own arenas, up to
+    8 per core, and each keeps the memory freed in it. With capture,
+    inference, transcription and API threads that retained heap adds up, so
+    the budget's malloc_arenas caps the count: eight threads churning
+    60 KB frame-sized buffers on one core kept 21 MB with glibc's default
+    and 9-11 MB with two arenas. Arenas already created are kept, so like
+    apply_thread_budget() this should run before the pipeline threads start.
+
+    With gpu_memory_growth, TensorFlow allocates GPU memory as it needs it
+    rather than mapping nearly all of it at start-up. It has no effect on
+    CPU-only installs or the TFLite runtimes, which do not reserve memory.
+
+    Args:
+        budget: MemoryBudget to apply (defaults to get_memory_budget())
+
+    Returns:
+        MemoryBudget: The applied budget
+    """
+    global _applied_memory_budget
+    budget = budget or get_memory_budget()
+
+    if budget.malloc_arenas and sys.platform.startswith("linux"):
+        try:
+            ctypes.CDLL("libc.so.6").mallopt(_M_ARENA_MAX, budget.malloc_arenas)
+        except (OSError, AttributeError):
+            pass
+
+    if budget.gpu_memory_growth:
+        os.environ.setdefault("TF_FORCE_GPU_ALLOW_GROWTH", "true")
+        tf = sys.modules.get("tensorflow")
+        if tf is not None:
+            try:
+                for gpu in tf.config.list_physical_devices("GPU"):
+                    tf.config.experimental.set_memory_growth(gpu, True)
+            except (RuntimeError, AttributeError):
+                # The GPUs are already initialized; their allocation mode stays
+                pass
+
+    _applied_memory_budget = budget
+    return budget
+
+
+def current_rss_mb():
+    """
+    Resident memory of this process
+
+    Returns:
+        float: Resident set size in MB (the peak on platforms without
+               psutil or /proc), or None if it cannot be measured
+    """
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss / 2 ** 20
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+
+def release_memory():
+    """Collect garbage and hand freed heap pages back to the OS (glibc only)"""
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        try:
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+
+class MemoryGovernor:
+    """Measures resident memory and picks the shedding level for a budget"""
+
+    def __init__(self, budget=None):
+        """
+        Initialize the governor
+
+        Args:
+            budget: MemoryBudget to keep to (defaults to get_memory_budget())
+        """
+        self.budget = budget or get_memory_budget()
+        self.level = MEMORY_NORMAL
+        self.rss_mb = None
+        self.peak_mb = 0.0
+
+    def check(self):
+        """
+        Measure resident memory and update the shedding level
+
+        The level rises as soon as memory crosses a threshold but only
+        drops one step at a time, once memory is well below the budget,
+        so it does not flap around a threshold.
+
+        Returns:
+            bool: True if the level changed
+        """
+        self.rss_mb = current_rss_mb()
+        if self.rss_mb is None:
+            return False
+        self.peak_mb = max(self.peak_mb, self.rss_mb)
+        if not self.budget.budget_mb:
+            return False
+
+        usage = self.rss_mb / self.budget.budget_mb
+        current = MEMORY_LEVELS.index(self.level)
+        if usage >= _CRITICAL_AT:
+            level = len(MEMORY_LEVELS) - 1
+        elif usage >= _REDUCE_AT:
+            level = max(current, 1)
+        elif usage < _RELAX_BELOW:
+            level = max(0, current - 1)
+        else:
+            level = current
+
+        changed = MEMORY_LEVELS[level] != self.level
+        self.level = MEMORY_LEVELS[level]
+        return changed
+
+    def status(self):
+        """
+        Describe the last measurement
+
+        Returns:
+            dict: rss_mb, peak_mb, budget_mb (0 = none), level and the
+                  limits that apply at the level
+        """
+        return {
+            "rss_mb": self.rss_mb,
+            "peak_mb": self.peak_mb,
+            "budget_mb": self.budget.budget_mb,
+            "level": self.level,
+            "limits": self.budget.limits(self.level)
+        }
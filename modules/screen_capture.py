@@ -0,0 +1,201 @@
+"""
+Screen Capture Module
+Captures a region of the screen, e.g. the video-call window, as a video source
+
+Online conversations happen in a video-call window, so the face to analyse
+is on the screen rather than in front of the webcam. ScreenCapture grabs
+only the selected region, once per emotion update (or at the preview rate
+SCREEN_CAPTURE_INTERVAL) rather than at the display's frame rate, and drops grabs whose content is
+unchanged so no detection or preview work is repeated for them. It offers the same
+interface as VideoCapture.
+
+Sources are written "screen" (the whole monitor SCREEN_CAPTURE_MONITOR)
+or "screen:x,y,w,h" (a region in desktop pixels). Without a physical
+display, run under a virtual framebuffer:
+
+    xvfb-run -s "-screen 0 1280x720x24" python3 main.py --headless --source screen:0,0,640,480
+"""
+import threading
+import time
+import zlib
+
+import cv2
+import numpy as np
+
+from modules.resources import track_cpu
+from modules.video_capture import VideoCapture, _DerivedFrames
+from config.settings import (
+    SCREEN_CAPTURE_INTERVAL, SCREEN_CAPTURE_MONITOR, EXPRESSION_UPDATE_INTERVAL
+)
+
+# Screen grabbing needs mss; cameras and video files do not
+try:
+    import mss
+    SCREEN_CAPTURE_AVAILABLE = True
+except ImportError:
+    SCREEN_CAPTURE_AVAILABLE = False
+
+SCREEN_SOURCE = "screen"
+
+
+def is_screen_source(source):
+    """Whether a --source value selects the screen"""
+    return isinstance(source, str) and (source == SCREEN_SOURCE
+                                        or source.startswith(SCREEN_SOURCE + ":"))
+
+
+def parse_screen_source(source):
+    """
+    Parse a screen source
+
+    Args:
+        source: "screen" or "screen:x,y,w,h"
+
+    Returns:
+        tuple: (x, y, width, height) of the region, or None for the whole monitor
+
+    Raises:
+        ValueError: If the region is malformed or empty
+    """
+    if source == SCREEN_SOURCE:
+        return None
+    try:
+        x, y, width, height = (int(value) for value in source.split(":", 1)[1].split(","))
+    except ValueError:
+        raise ValueError(f"Invalid screen source {source!r} (expected screen:x,y,w,h)")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Invalid screen source {source!r} (empty region)")
+    return x, y, width, height
+
+
+def frame_digest(pixels):
+    """
+    Checksum of a grabbed image, used to skip unchanged grabs
+
+    Args:
+        pixels: Raw pixel bytes (or any buffer)
+
+    Returns:
+        int: CRC-32 of the pixels
+    """
+    return zlib.crc32(pixels)
+
+
+def _open_screen():
+    """Open an mss screen grabber (mss.MSS on mss 10+, mss.mss before)"""
+    return (getattr(mss, "MSS", None) or mss.mss)()
+
+
+class ScreenCapture(VideoCapture):
+    """Captures a region of the screen behind the VideoCapture interface"""
+
+    def __init__(self, region=None, interval=SCREEN_CAPTURE_INTERVAL,
+                 monitor=SCREEN_CAPTURE_MONITOR, on_end=None, grayscale=False):
+        """
+        Initialize screen capture
+
+        Args:
+            region: (x, y, width, height) in desktop pixels, or None for the
+                    whole monitor
+            interval: Seconds between grabs, which sets the preview rate
+                      (0 = EXPRESSION_UPDATE_INTERVAL, for emotion updates only)
+            monitor: mss monitor index grabbed when there is no region
+                     (0 = all monitors, 1 = primary)
+            on_end: Accepted for VideoCapture compatibility; a screen never ends
+            grayscale: Keep grabs as grayscale uint8 (see VideoCapture)
+        """
+        source = SCREEN_SOURCE if region is None else f"{SCREEN_SOURCE}:{','.join(map(str, region))}"
+        super().__init__(source=source, on_end=on_end, grayscale=grayscale)
+        self.is_file = False
+        self.region = region
+        self.monitor = monitor
+        self.interval = interval or EXPRESSION_UPDATE_INTERVAL
+        self.stop_event = threading.Event()
+        self.last_digest = None
+        self.stats = {"grabs": 0, "unchanged": 0}
+
+    def _resolve_region(self, screen):
+        """Get the mss region to grab, checking it lies on the desktop"""
+        if self.region is None:
+            if not 0 <= self.monitor < len(screen.monitors):
+                raise ValueError(f"No monitor {self.monitor} "
+                                 f"({len(screen.monitors) - 1} monitors found)")
+            return dict(screen.monitors[self.monitor])
+
+        x, y, width, height = self.region
+        desktop = screen.monitors[0]
+        if (x < desktop["left"] or y < desktop["top"]
+                or x + width > desktop["left"] + desktop["width"]
+                or y + height > desktop["top"] + desktop["height"]):
+            raise ValueError(f"Region {self.region} is outside the desktop "
+                             f"({desktop['width']}x{desktop['height']})")
+        return {"left": x, "top": y, "width": width, "height": height}
+
+    def start(self):
+        """Start grabbing the screen in a separate thread"""
+        if self.is_running:
+            print("Video capture already running")
+            return
+
+        if not SCREEN_CAPTURE_AVAILABLE:
+            print("✗ Error: Screen capture needs mss (pip install mss)")
+            return False
+
+        try:
+            with _open_screen() as screen:
+                area = self._resolve_region(screen)
+        except Exception as e:
+            print(f"✗ Error: Could not capture the screen: {e}")
+            return False
+
+        self.stop_event.clear()
+        self.is_running = True
+        self.thread = threading.Thread(target=self._capture_loop, args=(area,), name="capture",
+                                       daemon=True)
+        self.thread.start()
+        print(f"✓ Screen capture started: {area['width']}x{area['height']} at "
+              f"({area['left']}, {area['top']}), every {self.interval:g}s")
+        return True
+
+    def _capture_loop(self, area):
+        """Grab the region every interval, keeping only grabs that changed"""
+        # mss grabbers must be used by the thread that opened them
+        with _open_screen() as screen:
+            while self.is_running:
+                track_cpu("capture")
+                started = time.monotonic()
+                try:
+                    shot = screen.grab(area)
+                except Exception as e:
+                    print(f"Failed to grab the screen: {e}")
+                else:
+                    self._store(shot)
+                self.stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _store(self, shot):
+        """Publish a grab as the current frame unless its content is unchanged"""
+        self.stats["grabs"] += 1
+        digest = frame_digest(shot.raw)
+        if digest == self.last_digest:
+            # Same frame object as before, so its detection and preview images stay cached
+            self.stats["unchanged"] += 1
+            return
+        self.last_digest = digest
+
+        frame = cv2.cvtColor(np.asarray(shot),
+                             cv2.COLOR_BGRA2GRAY if self.grayscale else cv2.COLOR_BGRA2BGR)
+        with self.lock:
+            self.current_frame = frame
+            self.derived = _DerivedFrames(frame)
+
+    def stop(self):
+        """Stop screen capture"""
+        self.is_running = False
+        self.stop_event.set()
+        super().stop()
+        print(f"✓ Screen capture stopped ({self.stats['grabs']} grabs, "
+              f"{self.stats['unchanged']} unchanged)")
+
+    def is_active(self):
+        """Check if screen capture is active"""
+        return self.is_running
@@ -0,0 +1,563 @@
+"""
+Multi-Session Server Module
+Serves many thin clients from one process with a shared model pool
+
+Clients connect to ws://HOST:PORT/ws, receive {"type": "session", "id": ...}
+with the id the server assigned, and send:
+    binary  b"F" + JPEG bytes                     video frame
+    binary  b"A" + 16-bit mono PCM (one phrase)   audio, at SERVER_AUDIO_SAMPLE_RATE
+    text    {"type": "transcript", "text": ..., "speaker": ...}
+    text    {"type": "profile", "age": ..., "autism_level": ...,
+             "communication_capabilities": ...}
+    text    {"type": "latency", "ms": ...}   bound on emotion inference latency
+    text    {"type": "suggest"}
+    text    {"type": "select", "index": ...}  another candidate of the last suggestion
+
+and receive JSON events of type "emotion", "transcript", "suggestion" (with
+the ranked "candidates") and "error". Session ids are always generated by
+the server, so a client can never attach to another session's stored
+transcript. GET /stats reports load and capacity in sessions per core.
+
+Every session keeps its own profile, transcript and conversation history,
+while all sessions share one pool of FacialExpressionRecognizer workers,
+one OpenAI client and one TranscriptStore. As in the desktop pipeline,
+transcripts are written through to the store, only the latest
+TRANSCRIPT_MEMORY_ENTRIES stay in memory and prompts hold the recent and
+relevant turns rather than the whole conversation.
+"""
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from modules.chatbot import ResponseGenerator, create_client
+from modules.frame_gate import FrameGate, INFER
+from modules.inference_scheduler import InferenceScheduler
+from modules.resources import (
+    STAGE_CPU, apply_thread_budget, current_rss_mb, get_thread_budget, track_cpu
+)
+from modules.transcription import format_transcript
+from modules.transcript_store import TranscriptStore
+from modules.video_capture import make_detection_frame
+from config.settings import (
+    EMOTIONS, EMOTICON_MAP, EXPRESSION_UPDATE_INTERVAL, GATE_ENABLED,
+    SERVER_HOST, SERVER_PORT, SERVER_MODEL_WORKERS, SERVER_SUGGESTION_WORKERS,
+    SERVER_AUDIO_SAMPLE_RATE, SERVER_MAX_FRAME_BYTES, SERVER_MICRO_BATCHING,
+    TRANSCRIPT_STORE, TRANSCRIPT_MEMORY_ENTRIES
+)
+
+# The server needs aiohttp; the desktop app does not
+try:
+    from aiohttp import web, WSMsgType
+    SERVER_AVAILABLE = True
+except ImportError:
+    SERVER_AVAILABLE = False
+
+# Speech recognition is optional; without it clients must send text transcripts
+try:
+    import speech_recognition as sr
+    AUDIO_TRANSCRIPTION_AVAILABLE = True
+except ImportError:
+    AUDIO_TRANSCRIPTION_AVAILABLE = False
+
+FRAME_MESSAGE = b"F"
+AUDIO_MESSAGE = b"A"
+
+
+_KIND_NAMES = {str: "a string", int: "an integer", float: "a number"}
+
+
+class MessageError(ValueError):
+    """A client message with missing or invalid fields"""
+
+
+def _field(message, name, kind, default=None):
+    """
+    Read a field of a client message, checking its type
+
+    Args:
+        message: Decoded JSON object
+        name: Field name
+        kind: Expected type: str, int or float (float accepts any finite number)
+        default: Value used when the field is missing (None makes it required)
+
+    Returns:
+        The field value
+
+    Raises:
+        MessageError: If the field is missing or has the wrong type
+    """
+    value = message.get(name, default)
+    if value is None:
+        raise MessageError(f"missing field {name!r}")
+    # bool is an int subclass, but true / false is never a valid number
+    if kind is float:
+        valid = (isinstance(value, (int, float)) and not isinstance(value, bool)
+                 and math.isfinite(value))
+    else:
+        valid = isinstance(value, kind) and not (kind is int and isinstance(value, bool))
+    if not valid:
+        raise MessageError(f"field {name!r} must be {_KIND_NAMES[kind]}")
+    return float(value) if kind is float else value
+
+
+class ModelPool:
+    """
+    A fixed set of worker threads, each owning one FacialExpressionRecognizer
+
+    With micro-batching, workers only decode, gate and find faces (their
+    recognizers load no classifier); the face crops of all sessions are
+    classified together by one classifier behind an InferenceScheduler.
+    """
+
+    def __init__(self, workers=SERVER_MODEL_WORKERS, micro_batching=SERVER_MICRO_BATCHING):
+        """
+        Initialize the pool
+
+        Args:
+            workers: Number of recognizer workers (0 uses the thread budget's model workers)
+            micro_batching: Batch face classification across sessions
+        """
+        budget = get_thread_budget()
+        self.workers = workers or budget.model_workers
+        # Workers run inference side by side, so each gets a share of the inference threads
+        apply_thread_budget(budget.for_workers(self.workers))
+        self.scheduler = None
+        if micro_batching:
+            # Only the classifier is needed here; the workers detect the faces
+            from modules.facial_expression import create_emotion_classifier
+            classifier = create_emotion_classifier()
+            # Batches fill up to INFERENCE_MAX_BATCH or until the oldest face's wait runs out
+            self.scheduler = InferenceScheduler(classifier.classify)
+            self.scheduler.start()
+
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers,
+                                           thread_name_prefix="model-pool")
+        self.lock = threading.Lock()
+        self.inferences = 0
+        self.inference_seconds = 0.0
+
+    def _recognizer(self):
+        """Get (building on first use) the current worker's recognizer"""
+        recognizer = getattr(self.local, "recognizer", None)
+        if recognizer is None:
+            from modules.facial_expression import FacialExpressionRecognizer
+            recognizer = FacialExpressionRecognizer(scheduler=self.scheduler)
+            self.local.recognizer = recognizer
+        return recognizer
+
+    def warm_up(self):
+        """Build every worker's recognizer before the first client arrives"""
+        barrier = threading.Barrier(self.workers)
+
+        def build():
+            self._recognizer()
+            # Hold each worker until all have started so every thread gets one
+            barrier.wait()
+
+        futures = [self.executor.submit(build) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def _detect(self, jpeg_bytes, frame_gate, stream_id):
+        """Worker: decode a JPEG frame, gate it and detect the first face's scores"""
+        track_cpu("emotion")
+        # Decode straight to grayscale; detection never needs the color image
+        frame = cv2.imdecode(np.frombuffer(jpeg_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if frame is None:
+            raise ValueError("Could not decode frame")
+        frame = make_detection_frame(frame)
+
+        if frame_gate is not None and frame_gate.check(frame)[0] != INFER:
+            return True, None
+
+        recognizer = self._recognizer()
+        recognizer.stream_id = stream_id
+
+        started = time.perf_counter()
+        scores = recognizer.detect_scores(frame)
+        elapsed = time.perf_counter() - started
+
+        with self.lock:
+            self.inferences += 1
+            self.inference_seconds += elapsed
+        return False, scores
+
+    async def detect(self, jpeg_bytes, frame_gate=None, stream_id=None):
+        """
+        Detect emotion scores for a JPEG frame on a pool worker
+
+        Args:
+            jpeg_bytes: JPEG-encoded frame
+            frame_gate: Optional FrameGate of the frame's session; it must not
+                        be used concurrently
+            stream_id: Session the frame belongs to (for per-stream latency)
+
+        Returns:
+            tuple: (gated_out, scores dict or None if skipped or no face)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._detect, jpeg_bytes,
+                                          frame_gate, stream_id)
+
+    def get_stats(self):
+        """Get inference counters"""
+        with self.lock:
+            inferences = self.inferences
+            seconds = self.inference_seconds
+        stats = {
+            "workers": self.workers,
+            "inferences": inferences,
+            "mean_inference_ms": 1000 * seconds / inferences if inferences else None
+        }
+        if self.scheduler is not None:
+            stats["micro_batching"] = self.scheduler.get_stats()
+        return stats
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        self.executor.shutdown(wait=True)
+        if self.scheduler is not None:
+            self.scheduler.stop()
+
+
+class ServerSession:
+    """State of one connected client"""
+
+    def __init__(self, session_id, websocket, client, transcript_store=None):
+        self.id = session_id
+        self.websocket = websocket
+        self.transcript_store = transcript_store
+        self.response_generator = ResponseGenerator(client=client,
+                                                    transcript_store=transcript_store,
+                                                    session_id=session_id)
+        self.frame_gate = FrameGate() if GATE_ENABLED else None
+        self.transcript = []  # Latest TRANSCRIPT_MEMORY_ENTRIES entries
+        self.current_emotion = "neutral"
+        self.current_scores = None
+        self.pending_frame = None
+        self.frame_available = asyncio.Event()
+        # Held while a suggestion is generated; its conversation history is
+        # only changed under this lock
+        self.suggestion_lock = asyncio.Lock()
+        # Background tasks; referenced here so they are not collected mid-run
+        self.tasks = set()
+        self.created = time.time()
+
+    def spawn(self, coroutine):
+        """
+        Run a coroutine as a task owned by this session
+
+        Args:
+            coroutine: Coroutine to run
+
+        Returns:
+            asyncio.Task: The task (cancelled by cancel_tasks())
+        """
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"✗ Session {self.id} task failed: {task.exception()!r}")
+
+    def cancel_tasks(self):
+        """Cancel every task still running for this session"""
+        for task in list(self.tasks):
+            task.cancel()
+
+    def add_entry(self, entry):
+        """Keep a transcript entry in memory (the server writes it to the store)"""
+        if len(self.transcript) >= TRANSCRIPT_MEMORY_ENTRIES:
+            del self.transcript[:len(self.transcript) - TRANSCRIPT_MEMORY_ENTRIES + 1]
+        self.transcript.append(entry)
+
+    def get_prompt_transcript(self):
+        """Transcript for a suggestion prompt (recent and relevant turns with a store)"""
+        if self.transcript_store is not None:
+            return self.response_generator.get_context_transcript()
+        return format_transcript(self.transcript)
+
+    async def send(self, message):
+        """Send a JSON event to the client, ignoring closed connections"""
+        if not self.websocket.closed:
+            await self.websocket.send_str(json.dumps(message))
+
+
+class SessionServer:
+    """asyncio HTTP/WebSocket server for many concurrent sessions"""
+
+    def __init__(self, model_workers=SERVER_MODEL_WORKERS,
+                 suggestion_workers=SERVER_SUGGESTION_WORKERS,
+                 emotion_interval=EXPRESSION_UPDATE_INTERVAL):
+        """
+        Initialize the server
+
+        Args:
+            model_workers: Number of emotion recognizer workers
+            suggestion_workers: Number of concurrent suggestion / speech API calls
+            emotion_interval: Minimum seconds between emotion updates per session
+        """
+        if not SERVER_AVAILABLE:
+            raise RuntimeError("Server mode requires aiohttp (pip install aiohttp)")
+
+        self.model_pool = ModelPool(model_workers)
+        self.api_executor = ThreadPoolExecutor(max_workers=suggestion_workers,
+                                               thread_name_prefix="api")
+        self.client = create_client()
+        self.transcript_store = TranscriptStore() if TRANSCRIPT_STORE else None
+        # SQLite writes (and their FTS updates) block, so they stay off the event
+        # loop; one thread keeps each session's entries in order
+        self.store_executor = ThreadPoolExecutor(max_workers=1,
+                                                 thread_name_prefix="transcript-store")
+        self.emotion_interval = emotion_interval
+        self.sessions = {}
+        self.started = time.time()
+
+        self.app = web.Application(client_max_size=SERVER_MAX_FRAME_BYTES)
+        self.app.add_routes([
+            web.get("/health", self.handle_health),
+            web.get("/stats", self.handle_stats),
+            web.get("/ws", self.handle_websocket)
+        ])
+        self.app.on_shutdown.append(self._on_shutdown)
+
+    async def handle_health(self, request):
+        return web.json_response({"status": "ok"})
+
+    async def handle_stats(self, request):
+        return web.json_response(self.get_stats())
+
+    def get_stats(self):
+        """
+        Report load and estimated capacity
+
+        Capacity assumes each session needs one inference per emotion
+        interval and uses the measured mean inference time.
+        """
+        cores = os.cpu_count() or 1
+        model_stats = self.model_pool.get_stats()
+        stats = {
+            "uptime_s": time.time() - self.started,
+            "cpu_cores": cores,
+            "active_sessions": len(self.sessions),
+            "sessions_per_core": len(self.sessions) / cores,
+            "emotion_interval_s": self.emotion_interval,
+            "model_pool": model_stats,
+            "cpu": STAGE_CPU.report(),
+            "memory_rss_mb": current_rss_mb(),
+            "estimated_capacity_sessions": None,
+            "estimated_capacity_sessions_per_core": None
+        }
+
+        mean_ms = model_stats["mean_inference_ms"]
+        if mean_ms:
+            # Workers beyond the core count add no inference throughput
+            parallelism = min(model_stats["workers"], cores)
+            inferences_per_second = parallelism * 1000.0 / mean_ms
+            capacity = int(inferences_per_second * self.emotion_interval)
+            stats["estimated_capacity_sessions"] = capacity
+            stats["estimated_capacity_sessions_per_core"] = capacity / cores
+        return stats
+
+    async def handle_websocket(self, request):
+        """Run one client session for the lifetime of its WebSocket"""
+        websocket = web.WebSocketResponse(max_msg_size=SERVER_MAX_FRAME_BYTES)
+        await websocket.prepare(request)
+
+        # Never taken from the client: the store would hand a reused id its old transcript
+        session_id = uuid.uuid4().hex
+        session = ServerSession(session_id, websocket, self.client, self.transcript_store)
+        if self.transcript_store is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                self.store_executor, self.transcript_store.start_session, session_id)
+        self.sessions[session_id] = session
+        session.spawn(self._emotion_loop(session))
+        print(f"✓ Session {session_id} connected ({len(self.sessions)} active)")
+
+        try:
+            await session.send({"type": "session", "id": session_id})
+            async for message in websocket:
+                if message.type == WSMsgType.BINARY:
+                    await self._handle_binary(session, message.data)
+                elif message.type == WSMsgType.TEXT:
+                    await self._handle_text(session, message.data)
+                elif message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            session.cancel_tasks()
+            self.sessions.pop(session_id, None)
+            if self.model_pool.scheduler is not None:
+                self.model_pool.scheduler.remove_stream(session_id)
+            print(f"✓ Session {session_id} disconnected ({len(self.sessions)} active)")
+
+        return websocket
+
+    async def _handle_binary(self, session, data):
+        kind, payload = data[:1], data[1:]
+        if kind == FRAME_MESSAGE:
+            # Only the newest frame matters; older ones are replaced
+            session.pending_frame = payload
+            session.frame_available.set()
+        elif kind == AUDIO_MESSAGE:
+            session.spawn(self._transcribe_audio(session, payload))
+        else:
+            await session.send({"type": "error", "message": "Unknown binary message"})
+
+    async def _handle_text(self, session, data):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            await session.send({"type": "error", "message": "Invalid JSON"})
+            return
+        if not isinstance(message, dict):
+            await session.send({"type": "error", "message": "Messages must be JSON objects"})
+            return
+
+        # A bad message is reported to its client; the connection stays open
+        try:
+            await self._dispatch_text(session, message)
+        except MessageError as e:
+            await session.send({"type": "error",
+                                "message": f"Invalid {message.get('type')} message: {e}"})
+
+    async def _dispatch_text(self, session, message):
+        kind = message.get("type")
+        if kind == "transcript":
+            await self._add_transcript(session, _field(message, "text", str, ""),
+                                       _field(message, "speaker", str, "User"))
+        elif kind == "profile":
+            session.response_generator.set_child_profile(
+                _field(message, "age", str, "not specified"),
+                _field(message, "autism_level", str, "not specified"),
+                _field(message, "communication_capabilities", str, "not specified")
+            )
+        elif kind == "latency":
+            # Per-session bound on emotion inference latency
+            latency_ms = _field(message, "ms", float)
+            if latency_ms <= 0:
+                raise MessageError("field 'ms' must be positive")
+            if self.model_pool.scheduler is not None:
+                self.model_pool.scheduler.set_stream_latency(session.id, latency_ms)
+        elif kind == "suggest":
+            session.spawn(self._suggest(session))
+        elif kind == "select":
+            # Only the chosen candidate stays in the conversation history
+            index = _field(message, "index", int)
+            if session.suggestion_lock.locked():
+                raise MessageError("a new suggestion is being generated")
+            if session.response_generator.select_candidate(index) is None:
+                raise MessageError(f"no candidate {index} in the last suggestion")
+        else:
+            await session.send({"type": "error", "message": f"Unknown message type: {kind}"})
+
+    async def _emotion_loop(self, session):
+        """Run at most one inference per emotion interval on the newest frame"""
+        while True:
+            await session.frame_available.wait()
+            session.frame_available.clear()
+            jpeg_bytes, session.pending_frame = session.pending_frame, None
+            next_update = time.monotonic() + self.emotion_interval
+
+            try:
+                gated_out, scores = await self.model_pool.detect(jpeg_bytes, session.frame_gate,
+                                                                 session.id)
+            except Exception as e:
+                await session.send({"type": "error", "message": f"Emotion detection failed: {e}"})
+                continue
+
+            if gated_out:
+                # Unchanged or unreliable frame: try the next one without waiting
+                continue
+
+            if scores:
+                session.current_emotion = max(scores, key=scores.get)
+                session.current_scores = scores
+                await session.send({
+                    "type": "emotion",
+                    "emotion": session.current_emotion,
+                    "emoticon": EMOTICON_MAP.get(session.current_emotion, "😐"),
+                    "scores": [scores.get(emotion, 0.0) for emotion in EMOTIONS]
+                })
+
+            await asyncio.sleep(max(0.0, next_update - time.monotonic()))
+
+    async def _add_transcript(self, session, text, speaker):
+        text = text.strip()
+        if not text:
+            return
+        entry = {
+            "timestamp": datetime.now().strftime("%H:%M:%S"),
+            "speaker": speaker,
+            "text": text
+        }
+        if self.transcript_store is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                self.store_executor, self.transcript_store.add_entry, session.id, entry)
+        session.add_entry(entry)
+        await session.send({"type": "transcript", "entry": entry})
+
+    async def _transcribe_audio(self, session, pcm_bytes):
+        if not AUDIO_TRANSCRIPTION_AVAILABLE:
+            await session.send({"type": "error",
+                                "message": "Audio transcription is not available on this server"})
+            return
+
+        def recognize():
+            audio = sr.AudioData(pcm_bytes, SERVER_AUDIO_SAMPLE_RATE, 2)
+            try:
+                return sr.Recognizer().recognize_google(audio)
+            except sr.UnknownValueError:
+                return ""
+
+        loop = asyncio.get_running_loop()
+        try:
+            text = await loop.run_in_executor(self.api_executor, recognize)
+        except Exception as e:
+            await session.send({"type": "error", "message": f"Transcription failed: {e}"})
+            return
+        await self._add_transcript(session, text, "User")
+
+    async def _suggest(self, session):
+        # Suggestions of one session run one at a time, in the order requested
+        async with session.suggestion_lock:
+            loop = asyncio.get_running_loop()
+
+            def suggest():
+                transcript = session.get_prompt_transcript() or "No conversation detected yet."
+                return session.response_generator.generate_candidates(
+                    transcript, session.current_emotion, session.current_scores)
+
+            candidates = await loop.run_in_executor(self.api_executor, suggest)
+        await session.send({"type": "suggestion", "response": candidates[0],
+                            "candidates": candidates, "emotion": session.current_emotion})
+
+    async def _on_shutdown(self, app):
+        for session in list(self.sessions.values()):
+            await session.websocket.close()
+
+    def run(self, host=SERVER_HOST, port=SERVER_PORT):
+        """Warm up the model pool and serve until interrupted"""
+        print(f"Loading {self.model_pool.workers} emotion recognizer workers...")
+        self.model_pool.warm_up()
+        print(f"✓ Serving sessions on ws://{host}:{port}/ws (stats: http://{host}:{port}/stats)")
+        try:
+            web.run_app(self.app, host=host, port=port, print=None)
+        finally:
+            self.model_pool.shutdown()
+            self.store_executor.shutdown(wait=True)
+            if self.transcript_store is not None:
+                self.transcript_store.close()
+            self.api_executor.shutdown(wait=False)
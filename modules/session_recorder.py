@@ -0,0 +1,402 @@
+"""
+Session Recording Module
+Writes a compact append-only session file and replays it with memory mapping
+
+File layout (little-endian):
+    header:  magic "KSR1", version (u16), emotion count (u16),
+             emotion names length (u16), comma-separated emotion names
+    records: type (u8), timestamp (f64), payload length (u32), payload
+
+Payloads:
+    EMOTION     emotion index (u8) + one float32 score per emotion
+    TRANSCRIPT  UTF-8 JSON transcript entry (decoded into record["entry"])
+    SUGGESTION  UTF-8 JSON {"event": "requested"|"ready", ...}
+    FRAME       JPEG-encoded downscaled frame
+"""
+import bisect
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from modules.resources import track_cpu
+from config.settings import (
+    EMOTIONS, SESSION_RECORDING_DIR, RECORD_FRAME_WIDTH, RECORD_JPEG_QUALITY, RECORD_QUEUE_SIZE
+)
+
+MAGIC = b"KSR1"
+VERSION = 1
+
+# Record types
+EMOTION = 1
+TRANSCRIPT = 2
+SUGGESTION = 3
+FRAME = 4
+
+RECORD_TYPE_NAMES = {
+    EMOTION: "emotion",
+    TRANSCRIPT: "transcript",
+    SUGGESTION: "suggestion",
+    FRAME: "frame"
+}
+
+_HEADER = struct.Struct("<4sHHH")
+_RECORD = struct.Struct("<BdI")
+_EMOTION_INDEX = struct.Struct("<B")
+
+# Sentinel used to stop the writer thread
+_STOP = object()
+
+
+def new_session_path(directory=SESSION_RECORDING_DIR):
+    """
+    Build a timestamped path for a new session recording
+
+    Args:
+        directory: Directory that holds the recordings (created if missing)
+
+    Returns:
+        str: Path of the new recording file
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = datetime.now().strftime("session-%Y%m%d-%H%M%S.ksr")
+    return os.path.join(directory, name)
+
+
+class SessionRecorder:
+    """
+    Records session events to disk from a background writer thread
+
+    Callers only enqueue records, so recording never blocks capture or
+    inference. Frames are dropped (and counted) when the queue is full;
+    other records wait for space since they are small and rare.
+    """
+
+    def __init__(self, path, record_frames=False, frame_width=RECORD_FRAME_WIDTH,
+                 jpeg_quality=RECORD_JPEG_QUALITY, queue_size=RECORD_QUEUE_SIZE):
+        """
+        Initialize the recorder
+
+        Args:
+            path: Path of the session file to write
+            record_frames: Whether frames passed to record_frame() are stored
+            frame_width: Width frames are downscaled to before encoding
+            jpeg_quality: JPEG quality (0-100) for stored frames
+            queue_size: Maximum number of records waiting to be written
+        """
+        self.path = path
+        self.record_frames = record_frames
+        self.frame_width = frame_width
+        self.jpeg_quality = jpeg_quality
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.file = None
+        self.is_running = False
+        self.records_written = 0
+        self.frames_dropped = 0
+
+    def start(self):
+        """Open the session file and start the writer thread"""
+        if self.is_running:
+            return True
+
+        try:
+            self.file = open(self.path, "wb")
+            names = ",".join(EMOTIONS).encode("utf-8")
+            self.file.write(_HEADER.pack(MAGIC, VERSION, len(EMOTIONS), len(names)))
+            self.file.write(names)
+        except OSError as e:
+            print(f"✗ Error opening session recording {self.path}: {e}")
+            self.file = None
+            return False
+
+        self.is_running = True
+        self.thread = threading.Thread(target=self._writer_loop, name="session-recorder",
+                                       daemon=True)
+        self.thread.start()
+        print(f"✓ Recording session to {self.path}")
+        return True
+
+    def _writer_loop(self):
+        """Encode and append queued records until stopped"""
+        while True:
+            track_cpu("recorder")
+            item = self.queue.get()
+            if item is _STOP:
+                break
+
+            record_type, timestamp, payload = item
+            try:
+                if record_type == FRAME:
+                    payload = self._encode_frame(payload)
+                    if payload is None:
+                        continue
+                self.file.write(_RECORD.pack(record_type, timestamp, len(payload)))
+                self.file.write(payload)
+                self.records_written += 1
+
+                # Flush whenever the writer catches up so a crash loses little
+                if self.queue.empty():
+                    self.file.flush()
+            except Exception as e:
+                print(f"Error writing session record: {e}")
+
+    def _encode_frame(self, frame):
+        """Downscale and JPEG-encode a frame"""
+        height, width = frame.shape[:2]
+        if width > self.frame_width:
+            size = (self.frame_width, max(1, int(height * self.frame_width / width)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return encoded.tobytes() if ok else None
+
+    def _enqueue(self, record_type, payload, timestamp=None):
+        if not self.is_running:
+            return
+        self.queue.put((record_type, timestamp or time.time(), payload))
+
+    def record_emotion(self, emotion, scores=None, timestamp=None):
+        """
+        Record an emotion result
+
+        Args:
+            emotion: Detected emotion name
+            scores: Scores ordered as config.settings.EMOTIONS (None if unknown)
+            timestamp: Unix timestamp of the result (defaults to now)
+        """
+        index = EMOTIONS.index(emotion) if emotion in EMOTIONS else EMOTIONS.index("neutral")
+        if scores is None:
+            scores = [float("nan")] * len(EMOTIONS)
+        payload = _EMOTION_INDEX.pack(index) + np.asarray(scores, dtype="<f4").tobytes()
+        self._enqueue(EMOTION, payload, timestamp)
+
+    def record_transcript(self, entry, timestamp=None):
+        """Record a transcript entry dictionary"""
+        self._enqueue(TRANSCRIPT, json.dumps(entry).encode("utf-8"), timestamp)
+
+    def record_suggestion(self, event, timestamp=None, **data):
+        """
+        Record a suggestion event
+
+        Args:
+            event: "requested", "ready" or "selected"
+            timestamp: Unix timestamp of the event (defaults to now)
+            **data: Extra fields, e.g. response and emotion
+        """
+        data["event"] = event
+        self._enqueue(SUGGESTION, json.dumps(data).encode("utf-8"), timestamp)
+
+    def record_frame(self, frame, timestamp=None):
+        """
+        Record a video frame without blocking
+
+        Args:
+            frame: OpenCV frame (BGR or grayscale); it must not be modified afterwards
+            timestamp: Unix timestamp of the frame (defaults to now)
+
+        Returns:
+            bool: True if the frame was queued
+        """
+        if not self.is_running or not self.record_frames:
+            return False
+        try:
+            self.queue.put_nowait((FRAME, timestamp or time.time(), frame))
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+    def stop(self):
+        """Write all queued records and close the file"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.file.close()
+        self.file = None
+        print(f"✓ Session recording saved ({self.records_written} records, "
+              f"{self.frames_dropped} frames dropped)")
+
+
+class SessionReader:
+    """Random-access reader for session files, backed by a memory map"""
+
+    def __init__(self, path):
+        """
+        Open a session file and index its records
+
+        Args:
+            path: Path of the session file
+
+        Raises:
+            ValueError: If the file is not a session recording, is empty or
+                        has a truncated or corrupt header
+        """
+        self.path = path
+        self.data = None
+        self.file = open(path, "rb")
+
+        # mmap cannot map an empty file, and the header must be complete to unpack
+        size = os.fstat(self.file.fileno()).st_size
+        if size < _HEADER.size:
+            self.close()
+            raise ValueError(f"Session recording is empty or truncated ({size} bytes): {path}")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, emotion_count, names_length = _HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not a session recording: {path}")
+        if version > VERSION:
+            self.close()
+            raise ValueError(f"Unsupported session recording version {version}")
+
+        names_start = _HEADER.size
+        if names_start + names_length > size:
+            self.close()
+            raise ValueError(f"Session recording header is truncated: {path}")
+        try:
+            self.emotions = bytes(self.data[names_start:names_start + names_length]).decode("utf-8").split(",")
+        except UnicodeDecodeError:
+            self.emotions = []
+        if len(self.emotions) != emotion_count:
+            self.close()
+            raise ValueError(f"Corrupt session recording header: {path}")
+
+        self.types = []
+        self.timestamps = []
+        self.offsets = []
+        self.lengths = []
+        self._build_index(names_start + names_length)
+
+    def _build_index(self, offset):
+        """Scan the record headers; a truncated final record is ignored"""
+        size = len(self.data)
+        while offset + _RECORD.size <= size:
+            record_type, timestamp, length = _RECORD.unpack_from(self.data, offset)
+            start = offset + _RECORD.size
+            if start + length > size:
+                break
+            self.types.append(record_type)
+            self.timestamps.append(timestamp)
+            self.offsets.append(start)
+            self.lengths.append(length)
+            offset = start + length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        return self.read(index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def payload(self, index):
+        """
+        Get the raw payload of a record
+
+        Returns:
+            bytes: A copy of the payload, so it stays valid after close()
+        """
+        start = self.offsets[index]
+        return self.data[start:start + self.lengths[index]]
+
+    def _view(self, index):
+        """
+        Zero-copy view of a record's payload, for decoding only
+
+        The map cannot be closed while a view of it exists, so a view must
+        not outlive the call that decodes it.
+        """
+        start = self.offsets[index]
+        return memoryview(self.data)[start:start + self.lengths[index]]
+
+    def read(self, index):
+        """
+        Decode a record
+
+        Args:
+            index: Record index
+
+        Returns:
+            dict: Record with "type", "timestamp" and type-specific fields
+        """
+        record_type = self.types[index]
+        record = {
+            "type": RECORD_TYPE_NAMES.get(record_type, "unknown"),
+            "timestamp": self.timestamps[index]
+        }
+        payload = self._view(index)
+
+        if record_type == EMOTION:
+            emotion_index = payload[0]
+            scores = np.frombuffer(payload[_EMOTION_INDEX.size:], dtype="<f4")
+            record["emotion"] = self.emotions[emotion_index]
+            record["scores"] = dict(zip(self.emotions, scores.tolist()))
+        elif record_type == TRANSCRIPT:
+            record["entry"] = json.loads(bytes(payload).decode("utf-8"))
+        elif record_type == SUGGESTION:
+            record.update(json.loads(bytes(payload).decode("utf-8")))
+        elif record_type == FRAME:
+            record["frame"] = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8),
+                                           cv2.IMREAD_COLOR)
+        return record
+
+    def indices(self, record_type=None):
+        """Get the indices of all records, optionally of a single type"""
+        if record_type is None:
+            return list(range(len(self)))
+        return [i for i, t in enumerate(self.types) if t == record_type]
+
+    def records(self, record_type=None):
+        """Iterate over decoded records, optionally of a single type"""
+        for index in self.indices(record_type):
+            yield self.read(index)
+
+    def find(self, timestamp):
+        """
+        Find the last record at or before a timestamp
+
+        Args:
+            timestamp: Unix timestamp
+
+        Returns:
+            int: Record index, or -1 if every record is later
+        """
+        return bisect.bisect_right(self.timestamps, timestamp) - 1
+
+    def emotion_matrix(self):
+        """
+        Get all emotion scores as arrays
+
+        Returns:
+            tuple: (timestamps array of shape (n,), scores array of shape
+                   (n, len(self.emotions)))
+        """
+        indices = self.indices(EMOTION)
+        timestamps = np.array([self.timestamps[i] for i in indices], dtype=np.float64)
+        scores = np.empty((len(indices), len(self.emotions)), dtype=np.float32)
+        for row, index in enumerate(indices):
+            scores[row] = np.frombuffer(self._view(index)[_EMOTION_INDEX.size:], dtype="<f4")
+        return timestamps, scores
+
+    def close(self):
+        """Release the memory map and file"""
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,247 @@
+"""
+Transcript Store Module
+Keeps transcripts in a local SQLite database with a full-text index
+
+Entries are written through as they are transcribed, keyed by session, so
+long sessions do not have to be held in memory and nothing is lost on stop.
+An FTS5 index over the entry text lets prompts include the older turns that
+are relevant to the latest utterance (ranked by BM25) next to the most
+recent ones.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from config.settings import TRANSCRIPT_DB_PATH, TRANSCRIPT_RETENTION_DAYS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    time REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    speaker TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_session ON entries(session_id, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    text, content='entries', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Words too common to say anything about relevance
+_STOPWORDS = frozenset("""
+a an and are as at be but by can could did do does for from had has have he her him his
+how i if in is it its just me my no not of on or our she so that the their them then
+there they this to too up us was we were what when where which who why will with would
+yeah yes you your
+""".split())
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def match_query(text):
+    """
+    Build an FTS5 query matching any meaningful word of an utterance
+
+    Args:
+        text: Utterance to search for
+
+    Returns:
+        str: FTS5 MATCH expression, or "" if the text has no usable words
+    """
+    words = []
+    for word in _WORD.findall(text.lower()):
+        if len(word) > 1 and word not in _STOPWORDS and word not in words:
+            words.append(word)
+    # Quoting keeps user text from being parsed as FTS5 operators
+    return " OR ".join(f'"{word}"' for word in words)
+
+
+def _entry(row):
+    return {"timestamp": row[1], "speaker": row[2], "text": row[3]}
+
+
+class TranscriptStore:
+    """SQLite-backed transcript storage shared by the threads of a process"""
+
+    def __init__(self, path=TRANSCRIPT_DB_PATH, retention_days=TRANSCRIPT_RETENTION_DAYS):
+        """
+        Open (or create) the transcript database
+
+        Args:
+            path: Database file path, or ":memory:" (the default; nothing is
+                  kept after the process ends)
+            retention_days: Sessions of a database file older than this are
+                            deleted when it is opened (0 keeps them)
+        """
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(_SCHEMA)
+            self.connection.commit()
+
+        if path != ":memory:" and retention_days > 0:
+            self.purge(time.time() - retention_days * 86400)
+
+    def start_session(self, session_id=None):
+        """
+        Register a new session
+
+        Args:
+            session_id: Identifier to use (a random one by default)
+
+        Returns:
+            str: The session identifier
+        """
+        session_id = session_id or uuid.uuid4().hex
+        with self.lock:
+            self.connection.execute("INSERT OR IGNORE INTO sessions (id, started) VALUES (?, ?)",
+                                    (session_id, time.time()))
+            self.connection.commit()
+        return session_id
+
+    def add_entry(self, session_id, entry):
+        """
+        Write a transcript entry
+
+        Args:
+            session_id: Session the entry belongs to
+            entry: Dictionary with "timestamp", "speaker" and "text"
+
+        Returns:
+            int: Row id of the stored entry
+        """
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT INTO entries (session_id, time, timestamp, speaker, text) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, time.time(), entry["timestamp"], entry["speaker"], entry["text"])
+            )
+            self.connection.commit()
+            return cursor.lastrowid
+
+    def count(self, session_id):
+        """Get the number of entries stored for a session"""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM entries WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def entries(self, session_id):
+        """Get every entry of a session in order"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, timestamp, speaker, text FROM entries WHERE session_id = ? ORDER BY id",
+                (session_id,)
+            ).fetchall()
+        return [_entry(row) for row in rows]
+
+    def recent(self, session_id, limit):
+        """
+        Get the latest entries of a session
+
+        Args:
+            session_id: Session to read
+            limit: Maximum number of entries
+
+        Returns:
+            list: Entries in chronological order
+        """
+        with self.lock:
+            rows = self._recent_rows(session_id, limit)
+        return [_entry(row) for row in rows]
+
+    def _recent_rows(self, session_id, limit):
+        rows = self.connection.execute(
+            "SELECT id, timestamp, speaker, text FROM entries WHERE session_id = ? "
+            "ORDER BY id DESC LIMIT ?", (session_id, limit)
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    def context(self, session_id, recent=10, relevant=5, query=None):
+        """
+        Get the entries worth putting in a prompt
+
+        Args:
+            session_id: Session to read
+            recent: Number of latest entries always included
+            relevant: Number of older entries included by relevance
+            query: Text to rank older entries by (defaults to the latest entry)
+
+        Returns:
+            tuple: (relevant older entries, recent entries), each in
+                   chronological order
+        """
+        with self.lock:
+            recent_rows = self._recent_rows(session_id, recent)
+            if not recent_rows or relevant <= 0:
+                return [], [_entry(row) for row in recent_rows]
+
+            expression = match_query(query if query is not None else recent_rows[-1][3])
+            relevant_rows = []
+            if expression:
+                # bm25() is lower for better matches; only look before the recent window
+                relevant_rows = self.connection.execute(
+                    "SELECT e.id, e.timestamp, e.speaker, e.text FROM entries_fts "
+                    "JOIN entries e ON e.id = entries_fts.rowid "
+                    "WHERE entries_fts MATCH ? AND e.session_id = ? AND e.id < ? "
+                    "ORDER BY bm25(entries_fts) LIMIT ?",
+                    (expression, session_id, recent_rows[0][0], relevant)
+                ).fetchall()
+                relevant_rows.sort()
+
+        return [_entry(row) for row in relevant_rows], [_entry(row) for row in recent_rows]
+
+    def delete_session(self, session_id):
+        """Remove a session and all of its entries"""
+        with self.lock:
+            self.connection.execute("DELETE FROM entries WHERE session_id = ?", (session_id,))
+            self.connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self.connection.commit()
+
+    def purge(self, started_before):
+        """
+        Delete every session started before a time, with its entries
+
+        Args:
+            started_before: Unix timestamp
+
+        Returns:
+            int: Number of sessions deleted
+        """
+        with self.lock:
+            stale = "SELECT id FROM sessions WHERE started < ?"
+            self.connection.execute(f"DELETE FROM entries WHERE session_id IN ({stale})",
+                                    (started_before,))
+            deleted = self.connection.execute("DELETE FROM sessions WHERE started < ?",
+                                              (started_before,)).rowcount
+            self.connection.commit()
+        return deleted
+
+    def close(self):
+        """Close the database"""
+        with self.lock:
+            self.connection.close()
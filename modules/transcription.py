@@ -5,6 +5,8 @@ Transcribes speech to text for conversation tracking
 import threading
 import queue
 from datetime import datetime
+from modules.resources import track_cpu
+from config.settings import TRANSCRIPT_MEMORY_ENTRIES
 
 # Try to import speech recognition, but make it optional
 try:
@@ -21,11 +23,38 @@ except ImportError:
     print("⚠️  Speech recognition not available (SpeechRecognition not installed)")
 
 
+def format_transcript(entries):
+    """
+    Format transcript entries as "[time] speaker: text" lines
+
+    Args:
+        entries: List of transcript entry dictionaries
+
+    Returns:
+        str: Formatted transcript
+    """
+    return "\n".join(
+        f"[{entry['timestamp']}] {entry['speaker']}: {entry['text']}" for entry in entries
+    )
+
+
 class TranscriptionService:
     """Handles speech-to-text transcription"""
 
-    def __init__(self):
-        """Initialize the transcription service"""
+    def __init__(self, on_entry=None, store=None, session_id=None,
+                 max_entries=TRANSCRIPT_MEMORY_ENTRIES):
+        """
+        Initialize the transcription service
+
+        Args:
+            on_entry: Optional callback called with each new transcript entry.
+                      When given, entries are delivered to it instead of
+                      transcript_queue.
+            store: Optional TranscriptStore every entry is written through to
+            session_id: Session the entries are stored under
+            max_entries: With a store, only this many latest entries are kept
+                         in memory (the store keeps all of them)
+        """
         if SPEECH_RECOGNITION_AVAILABLE:
             self.recognizer = sr.Recognizer()
         else:
@@ -34,7 +63,13 @@ class TranscriptionService:
         self.is_running = False
         self.is_available = SPEECH_RECOGNITION_AVAILABLE  # Track if transcription is available
         self.transcript = []
+        self.transcript_lock = threading.Lock()  # The transcription thread appends while budgets trim
         self.transcript_queue = queue.Queue()
+        self.on_entry = on_entry
+        self.store = store
+        self.session_id = session_id
+        self.max_entries = max_entries
+        self.memory_limit = None  # Set by a memory budget; applies with or without a store
         self.thread = None
 
     def start(self):
@@ -54,7 +89,8 @@ class TranscriptionService:
                 self.recognizer.adjust_for_ambient_noise(source, duration=2)
 
             self.is_running = True
-            self.thread = threading.Thread(target=self._transcription_loop, daemon=True)
+            self.thread = threading.Thread(target=self._transcription_loop, name="transcription",
+                                           daemon=True)
             self.thread.start()
             print("✓ Transcription service started")
             return True
@@ -67,6 +103,7 @@ class TranscriptionService:
         """Internal loop to continuously transcribe audio"""
         with self.microphone as source:
             while self.is_running:
+                track_cpu("transcription")
                 try:
                     # Listen for audio
                     audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=10)
@@ -83,8 +120,11 @@ class TranscriptionService:
                             "text": text
                         }
 
-                        self.transcript.append(entry)
-                        self.transcript_queue.put(entry)
+                        self.add_entry(entry)
+                        if self.on_entry is not None:
+                            self.on_entry(entry)
+                        else:
+                            self.transcript_queue.put(entry)
                         print(f"[{timestamp}] Transcribed: {text}")
 
                     except sr.UnknownValueError:
@@ -100,6 +140,42 @@ class TranscriptionService:
                     if self.is_running:
                         print(f"Transcription error: {e}")
 
+    def add_entry(self, entry):
+        """
+        Add a transcript entry, writing it through to the store if there is one
+
+        Args:
+            entry: Dictionary with "timestamp", "speaker" and "text"
+        """
+        if self.store is not None:
+            try:
+                self.store.add_entry(self.session_id, entry)
+            except Exception as e:
+                print(f"Error storing transcript entry: {e}")
+        # The store has the full transcript, so memory keeps only the latest
+        # entries; a memory budget caps them even without a store
+        limits = (self.memory_limit, self.max_entries if self.store is not None else None)
+        limit = min((limit for limit in limits if limit), default=None)
+        with self.transcript_lock:
+            if limit and len(self.transcript) >= limit:
+                del self.transcript[:len(self.transcript) - limit + 1]
+            self.transcript.append(entry)
+
+    def limit_memory(self, max_entries):
+        """
+        Cap the entries kept in memory, dropping the oldest ones now
+
+        Without a store the in-memory transcript is the only copy, so
+        capping it also shortens the transcript sent with suggestions.
+
+        Args:
+            max_entries: Entries to keep (None restores the default behaviour)
+        """
+        with self.transcript_lock:
+            self.memory_limit = max_entries
+            if max_entries and len(self.transcript) > max_entries:
+                del self.transcript[:len(self.transcript) - max_entries]
+
     def get_transcript(self):
         """
         Get the full conversation transcript
@@ -107,14 +183,11 @@ class TranscriptionService:
         Returns:
             str: Formatted transcript of the conversation
         """
-        if not self.transcript:
-            return ""
-
-        formatted = []
-        for entry in self.transcript:
-            formatted.append(f"[{entry['timestamp']}] {entry['speaker']}: {entry['text']}")
-
-        return "\n".join(formatted)
+        if self.store is not None:
+            return format_transcript(self.store.entries(self.session_id))
+        with self.transcript_lock:
+            entries = list(self.transcript)
+        return format_transcript(entries)
 
     def get_recent_transcript(self, num_entries=10):
         """
@@ -126,17 +199,14 @@ class TranscriptionService:
         Returns:
             str: Formatted recent transcript
         """
-        recent = self.transcript[-num_entries:] if self.transcript else []
-
-        formatted = []
-        for entry in recent:
-            formatted.append(f"[{entry['timestamp']}] {entry['speaker']}: {entry['text']}")
-
-        return "\n".join(formatted)
+        with self.transcript_lock:
+            recent = self.transcript[-num_entries:] if self.transcript else []
+        return format_transcript(recent)
 
     def clear_transcript(self):
         """Clear the transcript"""
-        self.transcript = []
+        with self.transcript_lock:
+            self.transcript = []
         # Clear the queue
         while not self.transcript_queue.empty():
             try:
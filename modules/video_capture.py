@@ -5,22 +5,103 @@ Captures video from webcam or other video sources
 import cv2
 import threading
 import time
+from modules.resources import track_cpu
+from config.settings import (
+    CAPTURE_WIDTH, CAPTURE_HEIGHT, CAPTURE_FPS, CAPTURE_FOURCC, CAPTURE_BUFFER_SIZE,
+    DETECTION_WIDTH, PREVIEW_WIDTH, PREVIEW_HEIGHT
+)
+
+
+def _shrink(image, size):
+    """
+    Downscale an image to size (width, height)
+
+    OpenCV's area filter is only fast for exact halving, so the image is
+    halved with it while it is at least twice the target size, and the
+    remaining (< 2x) step is bilinear, which does not alias at that ratio.
+    """
+    width, height = size
+    while image.shape[1] >= 2 * width and image.shape[0] >= 2 * height:
+        image = cv2.resize(image, (image.shape[1] // 2, image.shape[0] // 2),
+                           interpolation=cv2.INTER_AREA)
+    if (image.shape[1], image.shape[0]) == (width, height):
+        return image
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def make_detection_frame(frame, width=DETECTION_WIDTH):
+    """
+    Build the downscaled grayscale image used for face detection
+
+    Args:
+        frame: OpenCV frame (BGR or already grayscale)
+        width: Width of the detection image (never upscaled)
+
+    Returns:
+        numpy.ndarray: Grayscale uint8 image
+    """
+    # Convert first: resizing one channel is much cheaper than resizing three
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    height, frame_width = frame.shape
+    if frame_width > width:
+        frame = _shrink(frame, (width, max(1, int(height * width / frame_width))))
+    return frame
+
+
+def make_preview_frame(frame, size=(PREVIEW_WIDTH, PREVIEW_HEIGHT)):
+    """
+    Build the RGB image shown in the video preview
+
+    Args:
+        frame: OpenCV frame (BGR or grayscale)
+        size: (width, height) of the preview
+
+    Returns:
+        numpy.ndarray: RGB uint8 image
+    """
+    frame = _shrink(frame, size)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB if frame.ndim == 3 else cv2.COLOR_GRAY2RGB)
+
+
+class _DerivedFrames:
+    """Detection and preview images of one captured frame, built on first use"""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.detection = None
+        self.preview = None
 
 
 class VideoCapture:
     """Handles video capture from camera"""
 
-    def __init__(self, source=0):
+    def __init__(self, source=0, realtime=True, on_end=None, grayscale=False,
+                 capture_size=None):
         """
         Initialize video capture
 
         Args:
             source: Video source (0 for default camera, or video file path)
+            realtime: Play video files back at their native frame rate
+            on_end: Optional callback called when a video file runs out of frames
+            grayscale: Keep frames as grayscale uint8 (a third of the memory;
+                       detection uses grayscale anyway, the preview loses colour)
+            capture_size: Camera mode (width, height) to request instead of
+                          CAPTURE_WIDTH x CAPTURE_HEIGHT
         """
         self.source = source
+        self.is_file = isinstance(source, str)
+        self.realtime = realtime
+        self.on_end = on_end
+        self.grayscale = grayscale
+        self.capture_size = capture_size or (CAPTURE_WIDTH, CAPTURE_HEIGHT)
+        self.preview_scale = 1.0  # Lowered by the memory governor to shed preview work
         self.capture = None
         self.current_frame = None
+        self.derived = None
         self.is_running = False
+        self.is_finished = False
         self.lock = threading.Lock()
         self.thread = None
 
@@ -36,19 +117,65 @@ class VideoCapture:
             print(f"✗ Error: Could not open video source {self.source}")
             return False
 
+        if not self.is_file:
+            self._configure_camera()
+
         self.is_running = True
-        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
         self.thread.start()
         print(f"✓ Video capture started from source {self.source}")
         return True
 
+    def _configure_camera(self):
+        """Request the configured capture format instead of the driver defaults"""
+        if CAPTURE_FOURCC:
+            # FOURCC must be set before the resolution on some backends
+            self.capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*CAPTURE_FOURCC))
+        width, height = self.capture_size
+        if width and height:
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if CAPTURE_FPS:
+            self.capture.set(cv2.CAP_PROP_FPS, CAPTURE_FPS)
+        if CAPTURE_BUFFER_SIZE:
+            # A small driver queue keeps frames fresh instead of seconds old
+            self.capture.set(cv2.CAP_PROP_BUFFERSIZE, CAPTURE_BUFFER_SIZE)
+
+        # Drivers may pick the nearest supported mode; report what we got
+        width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        fourcc = int(self.capture.get(cv2.CAP_PROP_FOURCC))
+        fourcc = "".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip("\x00") or "?"
+        print(f"✓ Camera format: {width}x{height} @ {fps:.0f} fps ({fourcc})")
+
     def _capture_loop(self):
         """Internal loop to continuously capture frames"""
+        frame_period = 0.0
+        if self.is_file and self.realtime:
+            fps = self.capture.get(cv2.CAP_PROP_FPS)
+            frame_period = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        next_frame_time = time.monotonic()
+
         while self.is_running:
+            track_cpu("capture")
             ret, frame = self.capture.read()
             if ret:
+                if self.grayscale:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
                 with self.lock:
                     self.current_frame = frame
+                    self.derived = _DerivedFrames(frame)
+                if frame_period:
+                    # Pace file playback so downstream cadences match a live camera
+                    next_frame_time += frame_period
+                    time.sleep(max(0.0, next_frame_time - time.monotonic()))
+            elif self.is_file:
+                print(f"✓ End of video {self.source}")
+                self.is_finished = True
+                self.is_running = False
+                if self.on_end is not None:
+                    self.on_end()
             else:
                 print("Failed to read frame")
                 time.sleep(0.1)
@@ -65,10 +192,46 @@ class VideoCapture:
                 return self.current_frame.copy()
             return None
 
+    def get_detection_frame(self):
+        """
+        Get the downscaled grayscale image of the current frame
+
+        Built at most once per captured frame; treat it as read-only.
+
+        Returns:
+            numpy.ndarray: Grayscale detection image, or None if not available
+        """
+        with self.lock:
+            derived = self.derived
+        if derived is None:
+            return None
+        if derived.detection is None:
+            derived.detection = make_detection_frame(derived.frame)
+        return derived.detection
+
+    def get_preview_frame(self):
+        """
+        Get the RGB preview image of the current frame
+
+        Built at most once per captured frame; treat it as read-only.
+
+        Returns:
+            numpy.ndarray: RGB preview image, or None if not available
+        """
+        with self.lock:
+            derived = self.derived
+        if derived is None:
+            return None
+        if derived.preview is None:
+            scale = self.preview_scale
+            derived.preview = make_preview_frame(
+                derived.frame, (max(1, int(PREVIEW_WIDTH * scale)), max(1, int(PREVIEW_HEIGHT * scale))))
+        return derived.preview
+
     def stop(self):
         """Stop video capture"""
         self.is_running = False
-        if self.thread is not None:
+        if self.thread is not None and self.thread is not threading.current_thread():
             self.thread.join(timeout=2.0)
 
         if self.capture is not None:
@@ -0,0 +1,53 @@
+"""Tests for the cache-friendly prompt layout in modules.chatbot"""
+from modules.chatbot import ResponseGenerator, SUGGESTION_REQUEST
+from tests.test_chatbot_ranking import FakeClient
+
+
+def make_generator(history_turns=4):
+    generator = ResponseGenerator(client=FakeClient(["Hi there!"]))
+    generator.history_turns = history_turns
+    return generator
+
+
+def test_system_prompt_is_a_stable_prefix():
+    first = make_generator().build_messages("[10:00:00] Child: hi", "happiness",
+                                            {"happiness": 0.6, "surprise": 0.4})
+    second = make_generator().build_messages("", "sadness")
+    assert first[0] == second[0]
+    # The expression and transcript only appear in the trailing message
+    assert "happiness" not in first[0]["content"]
+    assert "surprise 40%" in first[-1]["content"]
+    assert "[10:00:00] Child: hi" in first[-1]["content"]
+    assert first[-1]["content"].endswith(SUGGESTION_REQUEST)
+
+
+def test_earlier_turns_follow_the_system_prompt():
+    generator = make_generator()
+    generator.generate_candidates("", "neutral")
+    messages = generator.build_messages("", "happiness")
+    assert [message["role"] for message in messages] == ["system", "user", "assistant", "user"]
+    assert messages[1:3] == generator.conversation_history
+
+
+def test_history_is_trimmed_by_half_when_full():
+    generator = make_generator(history_turns=4)
+    lengths = []
+    for index in range(7):
+        generator._add_to_history(f"suggestion {index}")
+        lengths.append(len(generator.conversation_history) // 2)
+    # Trimming to half at once keeps the prefix stable for the next turns
+    assert lengths == [1, 2, 3, 4, 2, 3, 4]
+    assert [message["content"] for message in generator.conversation_history[1::2]] == [
+        "suggestion 3", "suggestion 4", "suggestion 5", "suggestion 6"]
+    assert generator.conversation_history[0]["role"] == "user"
+
+
+def test_prefix_reuse_is_measured():
+    generator = make_generator()
+    generator.generate_candidates("", "neutral")
+    generator.generate_candidates("", "happiness")
+    stats = generator.get_stats()
+    assert stats["requests"] == 2
+    # The second request repeats the system prompt and the first turn
+    assert 0 < stats["reused_prefix_chars"] < stats["prompt_chars"]
+    assert 0 < stats["prefix_reuse_ratio"] < 1
@@ -0,0 +1,73 @@
+"""Tests for suggestion candidate ranking in modules.chatbot"""
+from types import SimpleNamespace
+
+import pytest
+
+from modules.chatbot import (
+    ResponseGenerator, FALLBACK_RESPONSE, rank_candidates, reading_grade, score_candidate
+)
+
+
+class FakeClient:
+    """OpenAI client stand-in returning fixed choices"""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        if isinstance(self.replies, Exception):
+            raise self.replies
+        choices = [SimpleNamespace(message=SimpleNamespace(content=reply)) for reply in self.replies]
+        return SimpleNamespace(choices=choices, usage=None)
+
+
+def test_reading_grade():
+    assert reading_grade("") == 0.0
+    assert reading_grade("I like it.") < reading_grade(
+        "Unquestionably, extraordinary circumstances necessitate considerable deliberation.")
+
+
+def test_short_simple_replies_score_higher():
+    short = "Do you want to play?"
+    long = ("That is an extraordinarily interesting observation, and I would genuinely "
+            "appreciate hearing considerably more about your particular experiences today.")
+    assert score_candidate(short, "neutral") > score_candidate(long, "neutral")
+
+
+def test_replies_fitting_the_expression_rank_first():
+    candidates = ["That is awesome, so fun!", "I'm sorry. Are you okay?"]
+    assert rank_candidates(candidates, "sadness")[0] == "I'm sorry. Are you okay?"
+    assert rank_candidates(candidates, "happiness")[0] == "That is awesome, so fun!"
+
+
+def test_ties_keep_api_order():
+    candidates = ["Tell me more.", "Go on then."]
+    assert rank_candidates(candidates, "unknown") == candidates
+
+
+def test_duplicates_and_empty_candidates_are_dropped():
+    assert rank_candidates(["Hi!", " Hi! ", "", None, "   "], "neutral") == ["Hi!"]
+    assert rank_candidates([], "neutral") == []
+
+
+def test_generate_candidates_ranks_and_records_the_best():
+    generator = ResponseGenerator(client=FakeClient(["That is awesome!", "I'm sorry. Are you okay?"]))
+    candidates = generator.generate_candidates("Child: I lost my toy", "sadness")
+    assert candidates == ["I'm sorry. Are you okay?", "That is awesome!"]
+    assert generator.conversation_history[-1]["content"] == candidates[0]
+
+
+def test_select_candidate_replaces_the_history_entry():
+    generator = ResponseGenerator(client=FakeClient(["Wow, really?", "What happened next?"]))
+    candidates = generator.generate_candidates("Child: guess what", "surprise")
+    assert generator.select_candidate(1) == candidates[1]
+    assert generator.conversation_history[-1]["content"] == candidates[1]
+    assert generator.select_candidate(2) is None
+    assert generator.select_candidate(-1) is None
+
+
+def test_failed_request_returns_the_fallback():
+    generator = ResponseGenerator(client=FakeClient(ValueError("boom")))
+    assert generator.generate_candidates("", "neutral") == [FALLBACK_RESPONSE]
+    assert generator.select_candidate(0) is None
@@ -0,0 +1,105 @@
+"""Tests for the emotion model metadata cache in modules.emotion_model"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from modules import emotion_model
+
+
+class FakeInterpreter:
+    """TFLite interpreter stand-in scoring each face by its mean"""
+
+    def __init__(self, model_content, num_threads=None):
+        self.shape = [1, 64, 64, 1]
+        self.tensor = None
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array(self.shape), "dtype": np.float32}]
+
+    def get_output_details(self):
+        return [{"index": 1, "dtype": np.float32}]
+
+    def resize_tensor_input(self, index, shape, strict=False):
+        self.shape = list(shape)
+
+    def allocate_tensors(self):
+        pass
+
+    def set_tensor(self, index, tensor):
+        self.tensor = tensor
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        means = self.tensor.reshape(len(self.tensor), -1).mean(axis=1)
+        return np.repeat(means[:, np.newaxis], len(emotion_model.FER_LABELS), axis=1)
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    """Install a fake FER model and runtime; yields (model path, cache directory)"""
+    path = tmp_path / "emotion_model.tflite"
+    path.write_bytes(b"model v1")
+    monkeypatch.setattr(emotion_model, "fer_model_path", lambda: str(path))
+    monkeypatch.setattr(emotion_model, "_fer_version", lambda: "22.5.1")
+    monkeypatch.setattr(emotion_model, "load_interpreter_class", lambda: (FakeInterpreter, "fake"))
+    monkeypatch.setattr(emotion_model, "_content", None)
+    return path, tmp_path / "cache"
+
+
+def load(cache_dir, monkeypatch):
+    """Load a classifier as a new process would, counting the cache builds"""
+    builds = []
+    build_cache = emotion_model.build_cache
+
+    def counting_build(content, cache_dir):
+        builds.append(content)
+        return build_cache(content, cache_dir)
+
+    monkeypatch.setattr(emotion_model, "build_cache", counting_build)
+    monkeypatch.setattr(emotion_model, "_content", None)
+    classifier = emotion_model.load_emotion_classifier(str(cache_dir))
+    return classifier, builds
+
+
+def test_cache_miss_probes_the_model(model, monkeypatch):
+    path, cache_dir = model
+    classifier, builds = load(cache_dir, monkeypatch)
+    assert builds == [b"model v1"]
+    metadata = json.loads((cache_dir / emotion_model.METADATA_FILE).read_text())
+    assert metadata["batching"] is True
+    assert metadata["input_shape"] == [64, 64, 1]
+    assert metadata["runtime"] == "fake"
+    # Only metadata is cached; the model is loaded where FER installed it
+    assert os.listdir(cache_dir) == [emotion_model.METADATA_FILE]
+
+    faces = np.stack([np.full((64, 64), value, dtype=np.float32) for value in (-0.5, 0.0, 0.5)])
+    np.testing.assert_allclose(classifier.classify(faces)[:, 0], [-0.5, 0.0, 0.5])
+
+
+def test_cache_hit_reuses_the_metadata(model, monkeypatch):
+    path, cache_dir = model
+    load(cache_dir, monkeypatch)
+    _, builds = load(cache_dir, monkeypatch)
+    assert builds == []
+
+
+def test_changed_model_fails_the_checksum_and_is_probed_again(model, monkeypatch):
+    path, cache_dir = model
+    load(cache_dir, monkeypatch)
+    path.write_bytes(b"model v2")
+    _, builds = load(cache_dir, monkeypatch)
+    assert builds == [b"model v2"]
+
+
+def test_fer_upgrade_or_corrupt_metadata_rebuilds(model, monkeypatch):
+    path, cache_dir = model
+    load(cache_dir, monkeypatch)
+    monkeypatch.setattr(emotion_model, "_fer_version", lambda: "23.0.0")
+    assert load(cache_dir, monkeypatch)[1] == [b"model v1"]
+
+    (cache_dir / emotion_model.METADATA_FILE).write_text("{not json")
+    assert load(cache_dir, monkeypatch)[1] == [b"model v1"]
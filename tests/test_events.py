@@ -0,0 +1,60 @@
+"""Tests for lane delivery and shutdown in modules.events"""
+import threading
+
+from modules.events import EventBus, TRANSCRIPT_ENTRY
+
+
+def blocked_bus(received):
+    """A bus whose "recorder" lane is busy until the returned event is set"""
+    bus = EventBus()
+    release = threading.Event()
+    started = threading.Event()
+
+    def handle(event):
+        if event.data["index"] == 0:
+            started.set()
+            release.wait(2.0)
+        received.append(event.data["index"])
+
+    bus.subscribe(TRANSCRIPT_ENTRY, handle, lane="recorder")
+    bus.start()
+    for index in range(5):
+        bus.publish(TRANSCRIPT_ENTRY, index=index)
+    assert started.wait(2.0)
+    return bus, release
+
+
+def test_stop_with_drain_delivers_queued_events():
+    received = []
+    bus, release = blocked_bus(received)
+    threading.Timer(0.05, release.set).start()
+    assert bus.stop(timeout=2.0, drain=True)
+    assert received == [0, 1, 2, 3, 4]
+
+
+def test_stop_without_drain_drops_queued_events():
+    received = []
+    bus, release = blocked_bus(received)
+    threading.Timer(0.05, release.set).start()
+    assert bus.stop(timeout=2.0)
+    # The running handler finishes; the backlog is dropped
+    assert received == [0]
+
+
+def test_stop_reports_a_lane_that_does_not_finish():
+    received = []
+    bus, release = blocked_bus(received)
+    try:
+        assert bus.stop(timeout=0.05) is False
+    finally:
+        release.set()
+
+
+def test_events_are_not_delivered_after_stop():
+    received = []
+    bus = EventBus()
+    bus.subscribe(TRANSCRIPT_ENTRY, lambda event: received.append(event), lane="recorder")
+    bus.start()
+    assert bus.stop()
+    bus.publish(TRANSCRIPT_ENTRY, index=0)
+    assert received == []
@@ -0,0 +1,61 @@
+"""Tests for modules.frame_gate"""
+import numpy as np
+
+from modules.frame_gate import FrameGate, INFER, SKIP, DEFER
+
+
+def textured_frame(seed=0, brightness=128):
+    """Sharp grayscale noise around a mean brightness"""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(-60, 61, size=(240, 320))
+    return np.clip(brightness + noise, 0, 255).astype(np.uint8)
+
+
+def test_first_frame_is_inferred():
+    gate = FrameGate()
+    assert gate.check(textured_frame()) == (INFER, "first frame")
+
+
+def test_unchanged_frame_is_skipped():
+    gate = FrameGate(max_skip_seconds=60)
+    frame = textured_frame()
+    gate.check(frame)
+    assert gate.check(frame.copy()) == (SKIP, "unchanged")
+
+
+def test_changed_frame_is_inferred():
+    gate = FrameGate(max_skip_seconds=60)
+    gate.check(textured_frame(seed=0))
+    assert gate.check(textured_frame(seed=1)) == (INFER, "changed")
+
+
+def test_unchanged_frame_is_inferred_once_stale():
+    gate = FrameGate(max_skip_seconds=0)
+    frame = textured_frame()
+    gate.check(frame)
+    assert gate.check(frame)[0] == INFER
+
+
+def test_unreliable_frames_are_deferred():
+    gate = FrameGate()
+    assert gate.check(np.full((240, 320), 5, dtype=np.uint8)) == (DEFER, "too dark")
+    assert gate.check(np.full((240, 320), 250, dtype=np.uint8)) == (DEFER, "overexposed")
+    assert gate.check(np.full((240, 320), 128, dtype=np.uint8)) == (DEFER, "blurred")
+    # Deferred frames never become the reference
+    assert gate.reference is None
+
+
+def test_color_frames_are_accepted():
+    gate = FrameGate()
+    frame = np.dstack([textured_frame()] * 3)
+    assert gate.check(frame)[0] == INFER
+    assert gate.reference.ndim == 2
+
+
+def test_reset_forces_inference():
+    gate = FrameGate(max_skip_seconds=60)
+    frame = textured_frame()
+    gate.check(frame)
+    gate.reset()
+    assert gate.check(frame) == (INFER, "first frame")
+    assert gate.get_stats() == {INFER: 2, SKIP: 0, DEFER: 0}
@@ -0,0 +1,97 @@
+"""Tests for modules.inference_scheduler"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from modules.inference_scheduler import InferenceScheduler
+
+
+class RecordingClassifier:
+    """Returns each face's marker value as its scores and records the batches"""
+
+    def __init__(self, block=None):
+        self.batches = []
+        self.block = block
+
+    def __call__(self, faces):
+        if self.block is not None:
+            self.block.wait(5)
+        self.batches.append([int(face[0, 0]) for face in faces])
+        return np.repeat(faces[:, :1, 0], 7, axis=1)
+
+
+def face(marker):
+    return np.full((64, 64), marker, dtype=np.float32)
+
+
+@pytest.fixture
+def scheduler_factory():
+    schedulers = []
+
+    def create(classifier, **kwargs):
+        scheduler = InferenceScheduler(classifier, **kwargs)
+        scheduler.start()
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield create
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def test_results_match_their_requests(scheduler_factory):
+    scheduler = scheduler_factory(RecordingClassifier(), max_batch_size=4, max_wait_ms=20)
+    futures = [scheduler.submit(face(marker)) for marker in range(4)]
+    assert [int(future.result(2)[0]) for future in futures] == [0, 1, 2, 3]
+
+
+def test_batches_are_filled_earliest_deadline_first(scheduler_factory):
+    # Hold the first batch so the next requests queue up behind it
+    release = threading.Event()
+    classifier = RecordingClassifier(block=release)
+    scheduler = scheduler_factory(classifier, max_batch_size=2, max_wait_ms=1, latency_ms=1000)
+    scheduler.set_stream_latency("tight", 50)
+    scheduler.set_stream_latency("loose", 5000)
+
+    first = scheduler.submit(face(0), "loose")
+    time.sleep(0.05)
+    loose = [scheduler.submit(face(marker), "loose") for marker in (1, 2)]
+    tight = [scheduler.submit(face(marker), "tight") for marker in (3, 4)]
+    release.set()
+    for future in [first] + loose + tight:
+        future.result(2)
+
+    # The tight stream's requests were submitted last but dispatched first
+    assert classifier.batches == [[0], [3, 4], [1, 2]]
+
+
+def test_full_batch_is_dispatched_without_waiting(scheduler_factory):
+    classifier = RecordingClassifier()
+    scheduler = scheduler_factory(classifier, max_batch_size=2, max_wait_ms=5000,
+                                  latency_ms=10000)
+    started = time.monotonic()
+    futures = [scheduler.submit(face(marker)) for marker in (1, 2)]
+    for future in futures:
+        future.result(2)
+    assert time.monotonic() - started < 1
+    assert classifier.batches == [[1, 2]]
+
+
+def test_stream_statistics(scheduler_factory):
+    scheduler = scheduler_factory(RecordingClassifier(), max_batch_size=1, max_wait_ms=1)
+    scheduler.classify(face(1), "a")
+    scheduler.classify(face(2), "b")
+    scheduler.remove_stream("b")
+
+    stats = scheduler.get_stats()
+    assert stats["requests"] == 2 and stats["batches"] == 2
+    assert set(stats["streams"]) == {"a"}
+    assert stats["streams"]["a"]["requests"] == 1
+
+
+def test_requests_fail_once_stopped():
+    scheduler = InferenceScheduler(RecordingClassifier())
+    with pytest.raises(RuntimeError):
+        scheduler.submit(face(1)).result(1)
@@ -0,0 +1,144 @@
+"""Tests for the memory budget and governor in modules.resources"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from modules import pipeline, resources
+from modules.chatbot import ResponseGenerator
+from modules.events import EventBus
+from modules.resources import (
+    MemoryBudget, MemoryGovernor, MEMORY_NORMAL, MEMORY_REDUCED, MEMORY_CRITICAL
+)
+from modules.transcription import TranscriptionService
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    """Set the resident memory the governor measures, in MB"""
+    measured = {"mb": 0.0}
+    monkeypatch.setattr(resources, "current_rss_mb", lambda: measured["mb"])
+
+    def set_rss(mb):
+        measured["mb"] = mb
+    return set_rss
+
+
+def levels(governor, set_rss, readings):
+    result = []
+    for mb in readings:
+        set_rss(mb)
+        governor.check()
+        result.append(governor.level)
+    return result
+
+
+def test_levels_rise_with_usage(rss):
+    governor = MemoryGovernor(MemoryBudget("standard", budget_mb=100))
+    assert levels(governor, rss, [50, 80, 99, 100]) == [
+        MEMORY_NORMAL, MEMORY_REDUCED, MEMORY_REDUCED, MEMORY_CRITICAL]
+
+
+def test_levels_relax_one_step_at_a_time_below_the_threshold(rss):
+    governor = MemoryGovernor(MemoryBudget("standard", budget_mb=100))
+    assert levels(governor, rss, [120, 75, 69, 69]) == [
+        MEMORY_CRITICAL, MEMORY_CRITICAL, MEMORY_REDUCED, MEMORY_NORMAL]
+
+
+def test_check_reports_level_changes(rss):
+    governor = MemoryGovernor(MemoryBudget("standard", budget_mb=100))
+    rss(90)
+    assert governor.check() is True
+    assert governor.check() is False
+
+
+def test_no_budget_only_measures(rss):
+    governor = MemoryGovernor(MemoryBudget("standard", budget_mb=0))
+    assert levels(governor, rss, [10_000, 20_000]) == [MEMORY_NORMAL, MEMORY_NORMAL]
+    assert governor.status()["peak_mb"] == 20_000
+
+
+def test_unmeasurable_memory_keeps_the_level(monkeypatch):
+    monkeypatch.setattr(resources, "current_rss_mb", lambda: None)
+    governor = MemoryGovernor(MemoryBudget("standard", budget_mb=100))
+    assert governor.check() is False
+    assert governor.level == MEMORY_NORMAL
+
+
+def test_limits_shrink_with_the_level():
+    budget = MemoryBudget("low-memory")
+    normal = budget.limits(MEMORY_NORMAL)
+    reduced = budget.limits(MEMORY_REDUCED)
+    critical = budget.limits(MEMORY_CRITICAL)
+    assert normal["transcript_entries"] == 50
+    assert reduced["transcript_entries"] == 25
+    assert critical["transcript_entries"] == 12
+    assert (normal["preview_scale"], reduced["preview_scale"], critical["preview_scale"]) == (
+        1.0, 0.5, 0.25)
+
+
+def test_standard_profile_caps_only_while_shedding():
+    budget = MemoryBudget("standard", budget_mb=100)
+    assert budget.limits(MEMORY_NORMAL)["transcript_entries"] is None
+    assert budget.limits(MEMORY_REDUCED)["transcript_entries"] is not None
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError, match="Unknown memory profile"):
+        MemoryBudget("tiny")
+
+
+def test_pipeline_sheds_and_restores_buffers(rss, monkeypatch):
+    monkeypatch.setattr(pipeline, "release_memory", lambda: None)
+    bus = EventBus()
+    bus.start()
+    engine = SimpleNamespace(
+        memory_governor=MemoryGovernor(MemoryBudget("low-memory", budget_mb=100)),
+        event_bus=bus,
+        transcription_service=TranscriptionService(),
+        response_generator=ResponseGenerator(client=object()),
+        video_capture=SimpleNamespace(preview_scale=1.0)
+    )
+    engine._apply_memory_limits = lambda limits: pipeline.PipelineEngine._apply_memory_limits(
+        engine, limits)
+    for index in range(60):
+        engine.transcription_service.add_entry({"timestamp": "", "speaker": "Child", "text": str(index)})
+    for index in range(4):
+        engine.response_generator._add_to_history(f"suggestion {index}")
+
+    def check(mb):
+        rss(mb)
+        pipeline.PipelineEngine._check_memory(engine)
+        # Wait for the suggestion lane to apply its part
+        applied = threading.Event()
+        bus.call_later(0, applied.set, lane="suggestion")
+        assert applied.wait(2.0)
+
+    try:
+        check(100)
+        assert engine.memory_governor.level == MEMORY_CRITICAL
+        assert len(engine.transcription_service.transcript) == 12
+        assert engine.response_generator.history_turns == 1
+        assert [message["role"] for message in engine.response_generator.conversation_history] == [
+            "user", "assistant"]
+        assert engine.video_capture.preview_scale == 0.25
+
+        check(60)
+        check(60)
+        assert engine.memory_governor.level == MEMORY_NORMAL
+        assert engine.transcription_service.memory_limit == 50
+        assert engine.response_generator.history_turns == 4
+        assert engine.video_capture.preview_scale == 1.0
+    finally:
+        bus.stop()
+
+
+def test_history_limit_keeps_whole_turns():
+    generator = ResponseGenerator(client=object())
+    generator.conversation_history = [
+        {"role": "assistant", "content": "a"},
+        {"role": "user", "content": "b"},
+        {"role": "assistant", "content": "c"},
+    ]
+    generator.limit_history(2)
+    assert [message["content"] for message in generator.conversation_history] == ["b", "c"]
@@ -0,0 +1,39 @@
+"""Tests for unchanged-grab skipping in modules.screen_capture"""
+import numpy as np
+
+from modules.screen_capture import ScreenCapture
+
+
+class FakeShot:
+    """mss screenshot stand-in: BGRA pixels exposed as raw bytes and as an array"""
+
+    def __init__(self, value):
+        self.pixels = np.full((4, 6, 4), value, dtype=np.uint8)
+        self.raw = self.pixels.tobytes()
+
+    def __array__(self, dtype=None, copy=None):
+        return self.pixels
+
+
+def test_unchanged_grabs_keep_the_current_frame():
+    capture = ScreenCapture(region=(0, 0, 6, 4))
+    capture._store(FakeShot(10))
+    frame = capture.current_frame
+    derived = capture.derived
+
+    capture._store(FakeShot(10))
+    assert capture.current_frame is frame
+    assert capture.derived is derived
+    assert capture.stats == {"grabs": 2, "unchanged": 1}
+
+    capture._store(FakeShot(20))
+    assert capture.current_frame is not frame
+    assert capture.current_frame.shape == (4, 6, 3)
+    assert capture.stats == {"grabs": 3, "unchanged": 1}
+
+
+def test_grayscale_grabs_are_converted_once():
+    capture = ScreenCapture(region=(0, 0, 6, 4), grayscale=True)
+    capture._store(FakeShot(30))
+    assert capture.current_frame.shape == (4, 6)
+    assert capture.current_frame.dtype == np.uint8
@@ -0,0 +1,82 @@
+"""Tests for client message validation in modules.server"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from modules.server import MessageError, ServerSession, SessionServer, _field
+
+
+class FakeWebSocket:
+    """WebSocket stand-in collecting the JSON messages sent to the client"""
+
+    closed = False
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_str(self, data):
+        self.sent.append(json.loads(data))
+
+
+def make_server():
+    """A SessionServer without models, executors or a store"""
+    server = SessionServer.__new__(SessionServer)
+    server.transcript_store = None
+    server.model_pool = SimpleNamespace(scheduler=None)
+    return server
+
+
+def handle(server, *messages):
+    """Send text messages to a new session and return what the client received"""
+    async def run():
+        session = ServerSession("test", FakeWebSocket(), client=object())
+        for message in messages:
+            await server._handle_text(session, message)
+        return session
+    session = asyncio.run(run())
+    return session, session.websocket.sent
+
+
+def test_field_checks_types():
+    message = {"text": "hi", "index": 2, "ms": 150, "flag": True, "nan": float("nan")}
+    assert _field(message, "text", str) == "hi"
+    assert _field(message, "index", int) == 2
+    assert _field(message, "ms", float) == 150.0
+    assert _field(message, "speaker", str, "User") == "User"
+
+    with pytest.raises(MessageError, match="missing field 'speaker'"):
+        _field(message, "speaker", str)
+    with pytest.raises(MessageError, match="'text' must be an integer"):
+        _field(message, "text", int)
+    with pytest.raises(MessageError, match="'flag' must be an integer"):
+        _field(message, "flag", int)
+    with pytest.raises(MessageError, match="'flag' must be a number"):
+        _field(message, "flag", float)
+    with pytest.raises(MessageError, match="'nan' must be a number"):
+        _field(message, "nan", float)
+
+
+@pytest.mark.parametrize("data, error", [
+    ("{not json", "Invalid JSON"),
+    ("[1, 2]", "Messages must be JSON objects"),
+    ('{"type": "dance"}', "Unknown message type: dance"),
+    ('{"type": "transcript", "text": 5}', "Invalid transcript message: field 'text' must be a string"),
+    ('{"type": "latency"}', "Invalid latency message: missing field 'ms'"),
+    ('{"type": "latency", "ms": -5}', "Invalid latency message: field 'ms' must be positive"),
+    ('{"type": "select", "index": "0"}', "Invalid select message: field 'index' must be an integer"),
+    ('{"type": "select", "index": 0}', "Invalid select message: no candidate 0 in the last suggestion"),
+])
+def test_malformed_messages_are_reported(data, error):
+    _, sent = handle(make_server(), data)
+    assert sent == [{"type": "error", "message": error}]
+
+
+def test_session_continues_after_a_malformed_message():
+    session, sent = handle(make_server(), "{not json",
+                           '{"type": "transcript", "text": " hello ", "speaker": "Child"}')
+    assert sent[0]["type"] == "error"
+    assert sent[1]["type"] == "transcript"
+    assert sent[1]["entry"]["text"] == "hello"
+    assert [entry["text"] for entry in session.transcript] == ["hello"]
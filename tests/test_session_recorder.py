@@ -0,0 +1,101 @@
+"""Tests for modules.session_recorder"""
+import numpy as np
+import pytest
+
+from modules.session_recorder import (
+    SessionRecorder, SessionReader, EMOTION, TRANSCRIPT, FRAME, MAGIC, _HEADER
+)
+from config.settings import EMOTIONS
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """A recording with one record of every type, timestamps 1.0 to 5.0"""
+    path = str(tmp_path / "session.ksr")
+    recorder = SessionRecorder(path, record_frames=True, frame_width=64)
+    assert recorder.start()
+    scores = [i / 10 for i in range(len(EMOTIONS))]
+    recorder.record_emotion("happiness", scores, timestamp=1.0)
+    recorder.record_transcript({"timestamp": "10:00:00", "speaker": "Child", "text": "hi"},
+                               timestamp=2.0)
+    recorder.record_suggestion("ready", timestamp=3.0, response="Say hello back")
+    assert recorder.record_frame(np.full((48, 128, 3), 90, dtype=np.uint8), timestamp=4.0)
+    recorder.record_emotion("unknown", timestamp=5.0)
+    recorder.stop()
+    return path, scores
+
+
+def test_round_trip(recording):
+    path, scores = recording
+    with SessionReader(path) as reader:
+        assert reader.emotions == EMOTIONS
+        assert len(reader) == 5
+        assert reader.timestamps == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+        emotion = reader[0]
+        assert emotion["type"] == "emotion" and emotion["emotion"] == "happiness"
+        assert [emotion["scores"][name] for name in EMOTIONS] == pytest.approx(scores)
+
+        assert reader[1]["entry"] == {"timestamp": "10:00:00", "speaker": "Child", "text": "hi"}
+        assert reader[2]["event"] == "ready" and reader[2]["response"] == "Say hello back"
+
+        # Frames are downscaled to frame_width before encoding
+        frame = reader[3]["frame"]
+        assert frame.shape == (24, 64, 3)
+        assert abs(int(frame.mean()) - 90) <= 2
+
+        # Unknown emotions are stored as neutral with unknown scores
+        assert reader[4]["emotion"] == "neutral"
+        assert np.isnan(list(reader[4]["scores"].values())).all()
+
+
+def test_index_queries(recording):
+    path, _ = recording
+    with SessionReader(path) as reader:
+        assert reader.indices(EMOTION) == [0, 4]
+        assert [record["type"] for record in reader.records(TRANSCRIPT)] == ["transcript"]
+        assert reader.indices(FRAME) == [3]
+        assert reader.find(0.5) == -1
+        assert reader.find(3.5) == 2
+        assert reader.find(9.0) == 4
+
+        timestamps, matrix = reader.emotion_matrix()
+        assert timestamps.tolist() == [1.0, 5.0]
+        assert matrix.shape == (2, len(EMOTIONS))
+
+
+def test_truncated_final_record_is_ignored(recording, tmp_path):
+    path, _ = recording
+    truncated = tmp_path / "truncated.ksr"
+    data = open(path, "rb").read()
+    truncated.write_bytes(data[:-3])
+    with SessionReader(str(truncated)) as reader:
+        assert len(reader) == 4
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"", "empty or truncated"),
+    (MAGIC, "empty or truncated"),
+    (b"XXXX" + bytes(_HEADER.size - 4), "Not a session recording"),
+    (_HEADER.pack(MAGIC, 1, len(EMOTIONS), 500) + b"happiness", "header is truncated"),
+    (_HEADER.pack(MAGIC, 1, 3, 9) + b"happiness", "Corrupt session recording header"),
+])
+def test_invalid_files_raise_clear_errors(tmp_path, data, message):
+    path = tmp_path / "bad.ksr"
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match=message):
+        SessionReader(str(path))
+
+
+def test_payloads_and_records_outlive_the_reader(recording):
+    path, _ = recording
+    reader = SessionReader(path)
+    payload = reader.payload(1)
+    records = list(reader.records())
+    timestamps, scores = reader.emotion_matrix()
+    reader.close()
+
+    assert isinstance(payload, bytes)
+    assert b'"speaker": "Child"' in payload
+    assert records[3]["frame"].shape[1] == 64
+    assert scores.shape == (2, len(EMOTIONS))
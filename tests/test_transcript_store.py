@@ -0,0 +1,114 @@
+"""Tests for modules.transcript_store"""
+import pytest
+
+from modules.transcript_store import TranscriptStore, match_query
+
+
+def entry(text, speaker="Child"):
+    return {"timestamp": "10:00:00", "speaker": speaker, "text": text}
+
+
+@pytest.fixture
+def store():
+    store = TranscriptStore(":memory:")
+    yield store
+    store.close()
+
+
+def fill(store, texts, session_id="s1"):
+    store.start_session(session_id)
+    for text in texts:
+        store.add_entry(session_id, entry(text))
+    return session_id
+
+
+def texts(entries):
+    return [e["text"] for e in entries]
+
+
+def test_match_query_drops_stopwords_and_quotes_words():
+    assert match_query("Do you like my dog Rex?") == '"like" OR "dog" OR "rex"'
+    assert match_query("yes, and you?") == ""
+    # FTS5 operators in user text stay plain words
+    assert match_query('NEAR("a" OR b)') == '"near"'
+
+
+def test_context_returns_recent_entries_in_order(store):
+    session_id = fill(store, [f"turn {i}" for i in range(6)])
+    earlier, latest = store.context(session_id, recent=3, relevant=0)
+    assert earlier == []
+    assert texts(latest) == ["turn 3", "turn 4", "turn 5"]
+
+
+def test_context_adds_relevant_older_entries(store):
+    session_id = fill(store, [
+        "My dog is called Rex",
+        "I had pasta for lunch",
+        "We played football at school",
+        "The weather is nice",
+        "I drew a picture",
+        "Can Rex come to the park?",
+    ])
+    earlier, latest = store.context(session_id, recent=2, relevant=3)
+    assert texts(latest) == ["I drew a picture", "Can Rex come to the park?"]
+    assert texts(earlier) == ["My dog is called Rex"]
+
+
+def test_context_matches_word_stems(store):
+    session_id = fill(store, ["He was playing with blocks", "Lunch time", "I like to play"])
+    earlier, _ = store.context(session_id, recent=1, relevant=5)
+    assert texts(earlier) == ["He was playing with blocks"]
+
+
+def test_context_uses_explicit_query_and_keeps_order(store):
+    session_id = fill(store, ["cats are soft", "dogs bark", "cats purr", "hello", "bye"])
+    earlier, _ = store.context(session_id, recent=2, relevant=5, query="cats")
+    assert texts(earlier) == ["cats are soft", "cats purr"]
+
+
+def test_context_is_limited_to_the_session(store):
+    fill(store, ["Rex is my dog"], session_id="other")
+    session_id = fill(store, ["hello", "where is Rex"])
+    earlier, latest = store.context(session_id, recent=1, relevant=5)
+    assert earlier == []
+    assert texts(latest) == ["where is Rex"]
+
+
+def test_context_of_empty_session(store):
+    store.start_session("empty")
+    assert store.context("empty") == ([], [])
+
+
+def test_delete_session(store):
+    session_id = fill(store, ["one", "two"])
+    assert store.count(session_id) == 2
+    store.delete_session(session_id)
+    assert store.entries(session_id) == []
+
+
+def test_purge_deletes_old_sessions_and_their_entries(store):
+    old = fill(store, ["old news"], session_id="old")
+    store.connection.execute("UPDATE sessions SET started = 0 WHERE id = ?", (old,))
+    new = fill(store, ["new news"], session_id="new")
+    assert store.purge(1000) == 1
+    assert store.entries(old) == []
+    assert texts(store.entries(new)) == ["new news"]
+    # The full-text index forgets the purged entries too
+    matches = store.connection.execute(
+        "SELECT COUNT(*) FROM entries_fts WHERE entries_fts MATCH 'old'").fetchone()[0]
+    assert matches == 0
+
+
+def test_database_file_applies_retention_when_opened(tmp_path):
+    path = str(tmp_path / "transcripts.db")
+    store = TranscriptStore(path, retention_days=0)
+    fill(store, ["kept"], session_id="s1")
+    store.connection.execute("UPDATE sessions SET started = 0")
+    store.connection.commit()
+    store.close()
+
+    store = TranscriptStore(path, retention_days=1)
+    try:
+        assert store.entries("s1") == []
+    finally:
+        store.close()